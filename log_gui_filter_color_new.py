@@ -16,10 +16,27 @@
 
 import tkinter as tk
 from tkinter import filedialog, scrolledtext, messagebox, ttk, simpledialog
+import tkinter.font as tkfont
 import re
 import json
 import os
-from datetime import datetime
+import mmap
+import sys
+import math
+import struct
+import zlib
+import gzip
+import bz2
+import lzma
+import hashlib
+import heapq
+from collections import deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate, compress, islice
+from datetime import datetime, timedelta
 
 # 尝试导入拖拽支持库
 try:
@@ -32,6 +49,7 @@ except ImportError:
     print("⚠️ tkinterdnd2 拖拽库不可用")
 import os
 import threading
+import queue
 import time
 from datetime import datetime
 
@@ -193,6 +211,3201 @@ THEMES = {
     }
 }
 
+# 行尾换行符匹配（用于构建行偏移表）
+_NEWLINE_RE = re.compile(b'\n')
+
+# 后台加载时每次建立索引的数据块大小
+INDEX_CHUNK_SIZE = 16 * 1024 * 1024
+
+# 每行一个匹配：捕获行内第一个 [ssss.mmm] 相对时间戳及紧随其后的 [Cxx] 通道标签（没有则为空）
+_LINE_FIELDS_RE = re.compile(rb'^(?:[^\n]*?\[(\d+\.\d+)\](?:\[(C\d+)\])?)?[^\n]*', re.M)
+# 其它时间戳格式的文件单独提取通道标签
+_LINE_CHANNEL_RE = re.compile(rb'^(?:[^\n]*?\[(C\d+)\])?[^\n]*', re.M)
+
+# 行索引旁路缓存配置
+INDEX_CACHE_DIR = "index_cache"
+INDEX_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 缓存目录总大小上限
+INDEX_CACHE_VERSION = 3
+
+# 压缩日志：扩展名 -> 在已打开的原始文件对象上流式解压的标准库读取器
+COMPRESSED_LOG_READERS = {
+    '.gz': lambda raw: gzip.GzipFile(fileobj=raw, mode='rb'),
+    '.bz2': lambda raw: bz2.BZ2File(raw, 'rb'),
+    '.xz': lambda raw: lzma.LZMAFile(raw, 'rb'),
+}
+# 多文件会话：并行加载的线程数，同时保持 mmap 映射的文件总大小上限（超出时按最近使用淘汰）
+SESSION_LOAD_WORKERS = 4
+SESSION_MAX_MAPPED_BYTES = 4 * 1024 * 1024 * 1024
+
+# 解压结果缓存目录、总大小上限，以及流式解压每次读取的字节数
+DECOMPRESS_CACHE_DIR = os.path.join(INDEX_CACHE_DIR, "decompressed")
+DECOMPRESS_CACHE_MAX_BYTES = 8 * 1024 * 1024 * 1024
+DECOMPRESS_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class LineIndexedFile:
+    """基于 mmap 的只读日志文件后端
+
+    文件内容不再整体读入为字符串列表，只保存每行起始位置的字节偏移表
+    (array('Q'))，行内容在被访问时才按需解码。对外提供与 readlines()
+    结果相近的序列接口（len / 下标 / 切片 / 迭代），原有代码可以直接使用。
+    压缩日志映射的是解压缓存中的文件，source_path 为用户打开的原始文件。
+    """
+
+    def __init__(self, file_path, encoding='utf-8', build_index=True, source_path=None):
+        self.file_path = file_path
+        self.source_path = source_path or file_path
+        self.encoding = encoding
+        self._file = open(file_path, 'rb')
+        self.file_size = os.fstat(self._file.fileno()).st_size
+        if self.file_size > 0:
+            self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._buffer = b''  # 空文件无法 mmap
+        # offsets[i] 为第 i 行(0-based)的起始偏移，末尾额外保存文件结束位置
+        self.offsets = array('Q', [0])
+        self.indexed_bytes = 0  # 已建立索引的字节数（后台加载时逐块增长）
+        if build_index:
+            while not self.index_complete:
+                self.index_next_chunk()
+
+    @property
+    def index_complete(self):
+        return self.indexed_bytes >= self.file_size
+
+    def index_next_chunk(self, chunk_size=INDEX_CHUNK_SIZE):
+        """为下一个数据块建立行偏移，块边界对齐到换行符；返回新增的行数"""
+        start = self.indexed_bytes
+        end = min(self.file_size, start + chunk_size)
+        if end < self.file_size:
+            newline_pos = self._buffer.rfind(b'\n', start, end)
+            if newline_pos < 0:
+                # 超长行：继续向后寻找换行符
+                newline_pos = self._buffer.find(b'\n', end)
+                end = self.file_size if newline_pos < 0 else newline_pos + 1
+            else:
+                end = newline_pos + 1
+        before = len(self.offsets)
+        self.offsets.extend(m.end() for m in _NEWLINE_RE.finditer(self._buffer, start, end))
+        if end >= self.file_size and self.offsets[-1] != self.file_size:
+            self.offsets.append(self.file_size)  # 最后一行没有换行符
+        self.indexed_bytes = end
+        return len(self.offsets) - before
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.get_line(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("行号超出范围")
+        return self.get_line(index)
+
+    def __iter__(self):
+        return self.iter_lines()
+
+    def get_raw_line(self, index):
+        """返回第 index 行(0-based)的原始字节，不含行尾换行符"""
+        raw = self._buffer[self.offsets[index]:self.offsets[index + 1]]
+        return raw.rstrip(b'\r\n')
+
+    def get_line(self, index):
+        """返回第 index 行(0-based)解码后的文本，不含行尾换行符"""
+        return self.get_raw_line(index).decode(self.encoding, errors='ignore')
+
+    def iter_lines(self, start=0, end=None):
+        """按顺序逐行解码 [start, end) 范围内的行"""
+        if end is None or end > len(self):
+            end = len(self)
+        buffer = self._buffer
+        offsets = self.offsets
+        encoding = self.encoding
+        for i in range(max(0, start), end):
+            yield buffer[offsets[i]:offsets[i + 1]].rstrip(b'\r\n').decode(encoding, errors='ignore')
+
+    def refresh(self):
+        """跟随模式：文件增长后重新映射，只为追加的字节建立行偏移
+        返回需要重新解析的第一行(0-based)：没有增长时等于 len(self)；原来的最后一行
+        没有换行符（还没写完）时从这一行开始。文件被截断或被替换（日志轮转）时返回 None
+        """
+        try:
+            current = os.stat(self.file_path)
+        except OSError:
+            return None
+        opened = os.fstat(self._file.fileno())
+        if (current.st_ino, current.st_dev) != (opened.st_ino, opened.st_dev) or opened.st_size < self.file_size:
+            return None
+        first_line = len(self)
+        if opened.st_size == self.file_size:
+            return first_line
+        old_buffer = self._buffer
+        self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.file_size and old_buffer[self.file_size - 1:self.file_size] != b'\n':
+            self.offsets.pop()
+            self.indexed_bytes = self.offsets[-1]
+            first_line -= 1
+        # 旧的映射可能仍被结果视图之外的对象引用，交给垃圾回收关闭
+        self.file_size = len(self._buffer)
+        while not self.index_complete:
+            self.index_next_chunk()
+        return first_line
+
+    def adopt_index(self, offsets):
+        """直接采用外部（如索引缓存）提供的完整行偏移表"""
+        self.offsets = offsets
+        self.indexed_bytes = self.file_size
+
+    def fingerprint(self, sample_size=64 * 1024):
+        """文件身份信息：大小、修改时间以及首/中/尾采样内容的哈希"""
+        digest = hashlib.sha1()
+        size = self.file_size
+        for pos in sorted({0, max(0, size // 2 - sample_size // 2), max(0, size - sample_size)}):
+            digest.update(self._buffer[pos:pos + sample_size])
+        return {
+            'size': size,
+            'mtime_ns': os.fstat(self._file.fileno()).st_mtime_ns,
+            'sample_hash': digest.hexdigest(),
+        }
+
+    def identity(self):
+        """廉价的文件身份信息 (绝对路径, 大小, 修改时间)，用于结果缓存的键"""
+        stat = os.stat(self.file_path) if self._file.closed else os.fstat(self._file.fileno())
+        return (os.path.abspath(self.file_path), self.file_size, stat.st_mtime_ns)
+
+    def line_index_at(self, byte_pos):
+        """返回包含指定字节偏移的行索引(0-based)"""
+        return bisect_right(self.offsets, byte_pos) - 1
+
+    def find_lines_containing(self, needle, start=0, end=None):
+        """在原始字节 [start, end) 范围内查找包含 needle 的行，按行号升序逐个返回(0-based)"""
+        buffer = self._buffer
+        if end is None:
+            end = self.indexed_bytes
+        pos = buffer.find(needle, start, end)
+        while pos >= 0:
+            idx = self.line_index_at(pos)
+            yield idx
+            # 同一行内的其它出现位置不再重复返回
+            pos = buffer.find(needle, self.offsets[idx + 1], end)
+
+    def close(self):
+        """释放 mmap 与文件句柄"""
+        try:
+            if isinstance(self._buffer, mmap.mmap):
+                self._buffer.close()
+            self._file.close()
+        except Exception as e:
+            print(f"关闭文件失败: {e}")
+
+    @property
+    def is_open(self):
+        return not self._file.closed
+
+    def reopen(self):
+        """重新映射已 close() 的文件，行偏移表保持不变；文件变短时抛出 ValueError"""
+        file = open(self.file_path, 'rb')
+        if os.fstat(file.fileno()).st_size < self.file_size:
+            file.close()
+            raise ValueError(f"文件已被截断: {self.file_path}")
+        self._file = file
+        self._buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if self.file_size > 0 else b''
+
+
+# 正则中的反向引用（合并多个模式后分组编号会变化，不能合并）
+_BACKREFERENCE_RE = re.compile(r'\\[1-9]|\(\?P=')
+# 字节路径不区分大小写时每次转为小写的数据块大小
+BYTE_SCAN_CHUNK_BYTES = 4 * 1024 * 1024
+# 在字节上与在文本上含义不同的正则写法：. 和取反字符类按字节而非字符匹配，\w \d \s \b
+# 只认 ASCII，^ $ 依赖去掉首尾空白的行，(?...) 可能带内联标志。含这些写法的正则不走字节路径
+_BYTE_UNSAFE_REGEX_RE = re.compile(r'\\[wWdDsSbBAZ]|[.^$]|\[\^|\(\?')
+
+
+def _is_utf8(encoding):
+    return encoding.lower().replace('-', '').replace('_', '') == 'utf8'
+
+
+class KeywordMatcher:
+    """预编译的多关键字匹配器
+
+    把关键字列表、大小写选项和 AND/OR 逻辑一次性编译为单个判断函数 matches(line)：
+    - OR：所有关键字合并为一个非捕获交替正则，每行只做一次 search
+    - AND + 正则：合并为一串前瞻断言 (?=.*?k1)(?=.*?k2)...，每行只做一次 match
+    - AND + 普通文本：按关键字长度降序逐个判断子串，尽早短路
+    不区分大小写的普通文本模式先把行转为小写再与小写关键字比较，避免 IGNORECASE 的开销。
+    合并正则不使用命名分组（捕获分组会让 re 失去字面量前缀优化），需要知道具体命中
+    哪些关键字时（计数、高亮）再用 matching_keywords() 逐个判断。
+
+    对 UTF-8 文件，scan_file 优先在 mmap 原始字节上用编码后的关键字查找（见 scan_bytes），
+    只解码命中的行。不区分大小写时字节路径只做 ASCII 大小写折叠，因此关键字含非 ASCII
+    字符时仍走逐行解码的文本路径；正则只有 ASCII 且不含 _BYTE_UNSAFE_REGEX_RE 中的写法时
+    才走字节路径。
+    """
+
+    def __init__(self, keywords, case_sensitive=False, use_regex=False, logic="OR"):
+        self.keywords = list(keywords)
+        self.case_sensitive = case_sensitive
+        self.use_regex = use_regex
+        self.logic = logic
+        self.engine = MATCH_ENGINE_REGEX
+        # 不区分大小写的普通文本：行和关键字都转为小写后比较
+        self.fold_case = not case_sensitive and not use_regex
+        # 正则可能使用 ^ / $ 等锚点，需要在去掉首尾空白的行上匹配（与原逻辑一致）
+        self.needs_strip = use_regex
+
+        flags = re.IGNORECASE if (use_regex and not case_sensitive) else 0
+        needles = [k.lower() for k in self.keywords] if self.fold_case else self.keywords
+        parts = needles if use_regex else [re.escape(k) for k in needles]
+        self._needles = needles
+        # 扫描范围限制（见 restrict_lines）：0-based 半开行区间、逐行过滤函数及其描述
+        self.line_bounds = (0, None)
+        self.line_filter = None
+        self.scope_key = None
+        # 单个关键字的正则；正则语法错误在这里以 re.error 抛出
+        self.keyword_patterns = [re.compile(part, flags) for part in parts]
+        self.matches = self._build_match_function(parts, flags)
+        self._byte_search, self._byte_verify = self._build_byte_search(parts)
+        self._highlight_patterns = None
+
+    def _build_match_function(self, parts, flags):
+        fold_case = self.fold_case
+        if not self.use_regex and self.logic == "AND":
+            ordered = sorted(self._needles, key=len, reverse=True)
+
+            def match_all_literals(line):
+                if fold_case:
+                    line = line.lower()
+                for needle in ordered:
+                    if needle not in line:
+                        return False
+                return True
+            return match_all_literals
+
+        combined = None
+        if not any(_BACKREFERENCE_RE.search(part) for part in parts):
+            try:
+                if self.logic == "AND":
+                    combined = re.compile(''.join(f'(?=.*?(?:{part}))' for part in parts),
+                                          flags | re.DOTALL).match
+                else:
+                    combined = re.compile('|'.join(f'(?:{part})' for part in parts), flags).search
+            except re.error:
+                combined = None  # 例如重复的命名分组、非开头的内联标志，退回逐个匹配
+
+        if combined is None:
+            searches = [pattern.search for pattern in self.keyword_patterns]
+            test = all if self.logic == "AND" else any
+
+            def match_each(line):
+                return test(search(line) for search in searches)
+            return match_each
+
+        if fold_case:
+            return lambda line: combined(line.lower()) is not None
+        return lambda line: combined(line) is not None
+
+    def _build_byte_search(self, parts):
+        """编译字节路径：(search(buffer, pos, end) 查找候选行, verify(行字节) 或 None)
+        不能安全地在字节上匹配时返回 (None, None)
+        """
+        self._byte_fold = False
+        if not self.case_sensitive and not all(k.isascii() for k in self._needles):
+            return None, None  # 非 ASCII 字符的大小写折叠只能在解码后的文本上做
+        if self.use_regex and any(not part.isascii() or _BYTE_UNSAFE_REGEX_RE.search(part) for part in parts):
+            return None, None
+        if any(_BACKREFERENCE_RE.search(part) for part in parts):
+            return None, None
+        # 不区分大小写：普通文本在转为小写的数据块上查找小写关键字（bytes.lower 只转换 ASCII），
+        # 正则使用 IGNORECASE（bytes 正则同样只折叠 ASCII）
+        self._byte_fold = self.fold_case
+        flags = re.IGNORECASE if self.use_regex and not self.case_sensitive else 0
+        try:
+            byte_parts = [part.encode('utf-8') for part in parts]
+            if self.logic != "AND" or len(byte_parts) == 1:
+                combined = re.compile(b'|'.join(b'(?:' + part + b')' for part in byte_parts), flags)
+                return combined.search, None
+            # AND：用一个关键字定位候选行（普通文本取最长的），其余在行内验证
+            if self.use_regex:
+                patterns = [re.compile(part, flags) for part in byte_parts]
+                return patterns[0].search, lambda line: all(p.search(line) for p in patterns)
+            driver = max(byte_parts, key=len)
+            needles = [k.encode('utf-8') for k in self._needles]
+            return re.compile(driver).search, lambda line: all(n in line for n in needles)
+        except re.error:
+            return None, None
+
+    @property
+    def byte_searchable(self):
+        return self._byte_search is not None
+
+    def scan_bytes(self, buffer, start, end, first_line=0, offsets=None):
+        """在原始字节 [start, end)（start 为行首，first_line 为该行的 0-based 行号）中查找
+        命中行，返回行号(1-based) array('Q')。不区分大小写的普通文本按 BYTE_SCAN_CHUNK_BYTES
+        分块，每块先用 bytes.lower()（只转换 ASCII）转为小写再查找
+        """
+        line_numbers = array('Q')
+        if not self._byte_fold:
+            self._scan_byte_block(buffer, start, end, 0, first_line, offsets, line_numbers)
+            return line_numbers
+        while start < end:
+            stop = min(start + BYTE_SCAN_CHUNK_BYTES, end)
+            if stop < end:
+                newline_pos = buffer.find(b'\n', stop, end)
+                stop = end if newline_pos < 0 else newline_pos + 1
+            block = buffer[start:stop].lower()
+            self._scan_byte_block(block, 0, len(block), start, first_line, offsets, line_numbers)
+            first_line += block.count(b'\n')
+            start = stop
+        return line_numbers
+
+    def _scan_byte_block(self, data, start, end, base, first_line, offsets, line_numbers):
+        """scan_bytes 的内层循环：data 的位置 0 对应文件偏移 base。有行偏移表 offsets 时
+        二分查找命中所在的行，否则累加两次命中之间的换行符个数
+        """
+        search = self._byte_search
+        verify = self._byte_verify
+        line_idx = first_line
+        line_start = start
+        while line_start < end:
+            match = search(data, line_start, end)
+            if match is None:
+                break
+            hit = match.start()
+            if offsets is not None:
+                line_idx = bisect_right(offsets, base + hit) - 1
+                line_start = offsets[line_idx] - base
+                line_end = offsets[line_idx + 1] - base
+            else:
+                newline_count = data[line_start:hit].count(b'\n')
+                if newline_count:
+                    line_idx += newline_count
+                    line_start = data.rfind(b'\n', line_start, hit) + 1
+                line_end = data.find(b'\n', hit, end)
+                line_end = end if line_end < 0 else line_end + 1
+            if verify is None or verify(data[line_start:line_end]):
+                line_numbers.append(line_idx + 1)
+            # 同一行内的其它命中不再重复处理
+            line_idx += 1
+            line_start = line_end
+
+    def matching_keywords(self, line):
+        """返回该行命中的关键字下标列表"""
+        if self.fold_case:
+            line = line.lower()
+        return [i for i, pattern in enumerate(self.keyword_patterns) if pattern.search(line)]
+
+    def _highlight_sources(self):
+        """高亮用的正则源码，每个关键字一个（决定高亮颜色的顺序）"""
+        return [k if self.use_regex else re.escape(k) for k in self.keywords if k]
+
+    @property
+    def highlight_patterns(self):
+        """高亮用的编译正则：直接在显示的原始文本上 finditer，不区分大小写时用 IGNORECASE，
+        因此正则模式下高亮的正是正则匹配的内容
+        """
+        if self._highlight_patterns is None:
+            flags = 0 if self.case_sensitive else re.IGNORECASE
+            self._highlight_patterns = [re.compile(source, flags) for source in self._highlight_sources()]
+        return self._highlight_patterns
+
+    @property
+    def spec(self):
+        """可序列化的匹配器描述，供子进程用 create_keyword_matcher(*spec) 重建"""
+        return (self.keywords, self.case_sensitive, self.use_regex, self.logic, self.engine)
+
+    @property
+    def cache_key(self):
+        """结果只取决于这些查询参数：关键字顺序与重复无关，不区分大小写的普通文本忽略关键字大小写"""
+        keywords = self._needles if self.fold_case else self.keywords
+        return (tuple(sorted(set(keywords))), self.case_sensitive, self.use_regex, self.logic, self.scope_key)
+
+    def restrict_lines(self, lo, hi, line_filter=None, scope_key=None):
+        """只扫描 [lo, hi) 行（与已有范围取交集），命中行再经 line_filter(line_idx) 过滤
+        scope_key 描述这一限制，参与结果缓存的键
+        """
+        old_lo, old_hi = self.line_bounds
+        self.line_bounds = (max(lo, old_lo), hi if old_hi is None else min(hi, old_hi))
+        self.line_filter = line_filter
+        self.scope_key = scope_key
+
+    def scan_file(self, log_file, start=0, end=None):
+        """扫描文件的 [start, end) 行（受 restrict_lines 的限制），返回值同 scan()"""
+        lo, hi = self.line_bounds
+        start = max(start, lo)
+        if hi is not None:
+            end = hi if end is None else min(end, hi)
+        if end is not None and end <= start:
+            return []
+        if self._byte_search is not None and isinstance(log_file, LineIndexedFile) and _is_utf8(log_file.encoding):
+            end = len(log_file) if end is None else min(end, len(log_file))
+            if end <= start:
+                return []
+            offsets = log_file.offsets
+            get_line = log_file.get_line
+            line_numbers = self.scan_bytes(log_file._buffer, offsets[start], offsets[end], start, offsets)
+            results = [(line_num, get_line(line_num - 1).strip()) for line_num in line_numbers]
+        else:
+            results = self.scan(log_file.iter_lines(start, end), start)
+        if self.line_filter is not None:
+            keep = self.line_filter
+            results = [result for result in results if keep(result[0] - 1)]
+        return results
+
+    def scan_line_numbers(self, lines, start_index=0):
+        """逐行匹配，只返回命中行的行号(1-based) array('Q')"""
+        matches = self.matches
+        line_numbers = array('Q')
+        if self.needs_strip:
+            for i, line in enumerate(lines, start_index + 1):
+                if matches(line.strip()):
+                    line_numbers.append(i)
+        else:
+            for i, line in enumerate(lines, start_index + 1):
+                if matches(line):
+                    line_numbers.append(i)
+        return line_numbers
+
+    def scan(self, lines, start_index=0):
+        """逐行匹配，返回 [(行号(1-based), 去除首尾空白的行内容), ...]"""
+        matches = self.matches
+        results = []
+        if self.needs_strip:
+            for i, line in enumerate(lines, start_index):
+                line = line.strip()
+                if matches(line):
+                    results.append((i + 1, line))
+        else:
+            for i, line in enumerate(lines, start_index):
+                if matches(line):
+                    results.append((i + 1, line.strip()))
+        return results
+
+    def filter_results(self, results):
+        """在已有结果 [(行号, 去除首尾空白的行内容), ...] 中再次筛选（用于细化查询）"""
+        matches = self.matches
+        return [result for result in results if matches(result[1])]
+
+
+# 关键字匹配引擎
+MATCH_ENGINE_REGEX = "regex"
+MATCH_ENGINE_AHO_CORASICK = "aho_corasick"
+
+
+class AhoCorasickAutomaton:
+    """纯 Python 实现的 Aho-Corasick 多模式字符串自动机
+
+    构建时把失败链接展开为完整的状态转移表 (DFA)，扫描时每个字符只做一次字典查找。
+    hits(text) 对文本只扫描一遍，返回命中关键字的位掩码（第 i 位对应第 i 个关键字）。
+    """
+
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        goto = [{}]
+        output = [0]
+        for i, keyword in enumerate(self.keywords):
+            state = 0
+            for ch in keyword:
+                next_state = goto[state].get(ch)
+                if next_state is None:
+                    goto.append({})
+                    output.append(0)
+                    next_state = len(goto) - 1
+                    goto[state][ch] = next_state
+                state = next_state
+            output[state] |= 1 << i
+
+        # 按 BFS 顺序计算失败链接，并把失败状态的转移与输出合并进来
+        fail = [0] * len(goto)
+        delta = [None] * len(goto)
+        delta[0] = dict(goto[0])
+        queue = deque()
+        for state in goto[0].values():
+            delta[state] = dict(delta[0])
+            delta[state].update(goto[state])
+            queue.append(state)
+        while queue:
+            state = queue.popleft()
+            for ch, child in goto[state].items():
+                fail[child] = delta[fail[state]].get(ch, 0)
+                transitions = dict(delta[fail[child]])
+                transitions.update(goto[child])
+                delta[child] = transitions
+                output[child] |= output[fail[child]]
+                queue.append(child)
+
+        self._delta = delta
+        self._output = output
+        self.full_mask = (1 << len(self.keywords)) - 1
+
+    @property
+    def state_count(self):
+        return len(self._delta)
+
+    def hits(self, text):
+        """扫描一遍文本，返回命中关键字的位掩码"""
+        delta = self._delta
+        output = self._output
+        state = 0
+        mask = 0
+        for ch in text:
+            state = delta[state].get(ch, 0)
+            mask |= output[state]
+        return mask
+
+
+class AhoCorasickMatcher(KeywordMatcher):
+    """基于 Aho-Corasick 自动机的普通文本匹配器
+
+    每行只扫描一遍即可得到命中的全部关键字，AND/OR 判断和每个关键字的命中行数
+    都来自同一次扫描（scan() 结束后见 keyword_hit_counts）。
+    """
+
+    def __init__(self, keywords, case_sensitive=False, logic="OR"):
+        super().__init__(keywords, case_sensitive, False, logic)
+        self.engine = MATCH_ENGINE_AHO_CORASICK
+        self._byte_search = None  # 每个关键字的命中行数来自逐行扫描，不走字节路径
+        self.automaton = AhoCorasickAutomaton(self._needles)
+        self.keyword_hit_counts = [0] * len(self.keywords)
+        hits = self.automaton.hits
+        full_mask = self.automaton.full_mask
+        fold_case = self.fold_case
+        if logic == "AND":
+            self.matches = lambda line: hits(line.lower() if fold_case else line) == full_mask
+        else:
+            self.matches = lambda line: hits(line.lower() if fold_case else line) != 0
+
+    def matching_keywords(self, line):
+        mask = self.automaton.hits(line.lower() if self.fold_case else line)
+        return [i for i in range(len(self.keywords)) if mask >> i & 1]
+
+    def _scan_masks(self, lines, start_index, on_match, line_filter=None):
+        hits = self.automaton.hits
+        required = self.automaton.full_mask if self.logic == "AND" else None
+        fold_case = self.fold_case
+        mask_counts = {}
+        for i, line in enumerate(lines, start_index):
+            mask = hits(line.lower() if fold_case else line)
+            if not mask:
+                continue
+            if line_filter is not None and not line_filter(i):
+                continue  # 时间窗口之外的行不计入各关键字的命中行数
+            mask_counts[mask] = mask_counts.get(mask, 0) + 1
+            if required is None or mask == required:
+                on_match(i, line)
+        # 由命中组合的计数展开得到每个关键字的命中行数
+        self.keyword_hit_counts = [sum(count for mask, count in mask_counts.items() if mask >> k & 1)
+                                   for k in range(len(self.keywords))]
+
+    def scan_line_numbers(self, lines, start_index=0):
+        line_numbers = array('Q')
+        self._scan_masks(lines, start_index, lambda i, line: line_numbers.append(i + 1), self.line_filter)
+        return line_numbers
+
+    def scan(self, lines, start_index=0):
+        results = []
+        self._scan_masks(lines, start_index, lambda i, line: results.append((i + 1, line.strip())),
+                         self.line_filter)
+        return results
+
+    def filter_results(self, results):
+        # 细化查询的范围与上次相同，results 已经过时间窗口筛选
+        filtered = []
+        self._scan_masks((line for _, line in results), 0,
+                         lambda i, line: filtered.append(results[i]))
+        return filtered
+
+
+# 查询表达式模式（logic_var 的第三种取值）
+QUERY_LOGIC_EXPR = "EXPR"
+
+# 估计各谓词选择率时采样的行数
+QUERY_PLAN_SAMPLE_LINES = 2000
+
+
+class QuerySyntaxError(ValueError):
+    """查询表达式语法错误"""
+
+
+def _quote_query_text(text):
+    return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+class QueryNode:
+    """查询表达式语法树节点
+
+    compile() 返回判断函数 fn(line_idx, text)，text 为去除首尾空白（不区分大小写时
+    再转为小写）的行内容，line_idx 为 0-based 行号。cost 为估计的单行求值开销，
+    pass_rate 为采样估计的通过率（未采样时为 None）。
+    """
+
+    cost = 1.0
+    pass_rate = None
+
+    def compile(self, case_sensitive, timestamps):
+        raise NotImplementedError
+
+    def canonical(self):
+        """规范化的表达式文本，可被 parse_query 重新解析为等价的语法树"""
+        raise NotImplementedError
+
+    def literals(self):
+        """肯定出现的字面量（用于三元组索引和关键字计数）"""
+        return []
+
+    def highlight_patterns(self):
+        """高亮用的正则源码（NOT 之下的条件不高亮）"""
+        return []
+
+    def line_bounds(self):
+        """该节点为真时行号必然所在的范围 (lo, hi)，0-based 半开区间；hi 为 None 表示不限"""
+        return 0, None
+
+    def index_blocks(self, index, case_sensitive):
+        """三元组索引中的候选数据块集合；无法缩小范围返回 None"""
+        return None
+
+    def plan(self, sample, case_sensitive, timestamps):
+        """在采样行上估计通过率，并按此调整子节点顺序；返回通过率"""
+        fn = self.compile(case_sensitive, timestamps)
+        self.pass_rate = sum(1 for i, text in sample if fn(i, text)) / len(sample) if sample else 0.5
+        return self.pass_rate
+
+
+class QueryLiteral(QueryNode):
+    cost = 4.0
+
+    def __init__(self, text):
+        self.text = text
+
+    def compile(self, case_sensitive, timestamps):
+        needle = self.text if case_sensitive else self.text.lower()
+        return lambda i, text: needle in text
+
+    def canonical(self):
+        return _quote_query_text(self.text)
+
+    def literals(self):
+        return [self.text]
+
+    def highlight_patterns(self):
+        return [re.escape(self.text)] if self.text else []
+
+    def index_blocks(self, index, case_sensitive):
+        return index._literal_blocks(self.text if case_sensitive else self.text.lower())
+
+
+class QueryRegex(QueryNode):
+    cost = 16.0
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+
+    def compile(self, case_sensitive, timestamps):
+        search = re.compile(self.pattern, 0 if case_sensitive else re.IGNORECASE).search
+        return lambda i, text: search(text) is not None
+
+    def canonical(self):
+        return 're:' + _quote_query_text(self.pattern)
+
+    def highlight_patterns(self):
+        return [self.pattern]
+
+    def index_blocks(self, index, case_sensitive):
+        blocks = None
+        for literal in extract_regex_literals(self.pattern):
+            literal_blocks = index._literal_blocks(literal)
+            if literal_blocks is not None:
+                blocks = literal_blocks if blocks is None else blocks & literal_blocks
+        if blocks is not None and not case_sensitive:
+            # IGNORECASE 的 Unicode 大小写等价无法由字节三元组保证
+            blocks.update(index.non_ascii_blocks)
+        return blocks
+
+
+class QueryLineRange(QueryNode):
+    """line:A-B —— 第 A 到第 B 行（1-based，含两端，任一端可省略）"""
+
+    cost = 1.0
+
+    def __init__(self, lo, hi):
+        self.lo = lo  # 0-based，含
+        self.hi = hi  # 0-based，不含；None 表示到文件末尾
+
+    @classmethod
+    def parse(cls, spec):
+        first, sep, last = spec.partition('-')
+        try:
+            lo = int(first) - 1 if first else 0
+            if not sep:
+                hi = lo + 1
+            else:
+                hi = int(last) if last else None
+        except ValueError:
+            raise QuerySyntaxError(f"无效的行号范围: line:{spec}")
+        return cls(max(0, lo), hi)
+
+    def compile(self, case_sensitive, timestamps):
+        lo = self.lo
+        hi = self.hi if self.hi is not None else float('inf')
+        return lambda i, text: lo <= i < hi
+
+    def canonical(self):
+        return f"line:{self.lo + 1}-{'' if self.hi is None else self.hi}"
+
+    def line_bounds(self):
+        return self.lo, self.hi
+
+    def index_blocks(self, index, case_sensitive):
+        hi = index.line_count if self.hi is None else min(self.hi, index.line_count)
+        return set(range(self.lo // index.block_lines, -(-hi // index.block_lines)))
+
+
+class QueryTimeRange(QueryNode):
+    """time:A-B —— 行内相对时间戳 [ssss.mmm] 在 A 到 B 秒之间（含两端，任一端可省略）"""
+
+    cost = 2.0
+
+    def __init__(self, lo, hi):
+        self.lo = lo
+        self.hi = hi
+
+    @classmethod
+    def parse(cls, spec):
+        first, sep, last = spec.partition('-')
+        if not sep:
+            raise QuerySyntaxError(f"时间范围需要写成 time:起始-结束: time:{spec}")
+        try:
+            lo = float(first) if first else -math.inf
+            hi = float(last) if last else math.inf
+        except ValueError:
+            raise QuerySyntaxError(f"无效的时间范围: time:{spec}")
+        return cls(lo, hi)
+
+    def compile(self, case_sensitive, timestamps):
+        lo, hi = self.lo, self.hi
+        count = len(timestamps)
+
+        def in_time_range(i, text):
+            # 没有时间戳的行为 NaN，比较结果为 False
+            return 0 <= i < count and lo <= timestamps[i] <= hi
+        return in_time_range
+
+    def canonical(self):
+        lo = '' if self.lo == -math.inf else repr(self.lo)
+        hi = '' if self.hi == math.inf else repr(self.hi)
+        return f"time:{lo}-{hi}"
+
+
+class QueryNot(QueryNode):
+    def __init__(self, child):
+        self.child = child
+        self.cost = child.cost + 0.5
+
+    def compile(self, case_sensitive, timestamps):
+        fn = self.child.compile(case_sensitive, timestamps)
+        return lambda i, text: not fn(i, text)
+
+    def canonical(self):
+        inner = self.child.canonical()
+        return f"NOT ({inner})" if isinstance(self.child, (QueryAnd, QueryOr)) else f"NOT {inner}"
+
+    def plan(self, sample, case_sensitive, timestamps):
+        self.child.plan(sample, case_sensitive, timestamps)
+        self.cost = self.child.cost + 0.5
+        return super().plan(sample, case_sensitive, timestamps)
+
+
+class QueryAnd(QueryNode):
+    def __init__(self, children):
+        self.children = children
+        self.cost = sum(child.cost for child in children)
+
+    def compile(self, case_sensitive, timestamps):
+        fns = [child.compile(case_sensitive, timestamps) for child in self.children]
+        if len(fns) == 2:
+            first, second = fns
+            return lambda i, text: first(i, text) and second(i, text)
+
+        def all_match(i, text):
+            for fn in fns:
+                if not fn(i, text):
+                    return False
+            return True
+        return all_match
+
+    def canonical(self):
+        return ' AND '.join(f"({child.canonical()})" if isinstance(child, QueryOr) else child.canonical()
+                            for child in self.children)
+
+    def literals(self):
+        return [literal for child in self.children for literal in child.literals()]
+
+    def highlight_patterns(self):
+        return [source for child in self.children for source in child.highlight_patterns()]
+
+    def line_bounds(self):
+        lo, hi = 0, None
+        for child in self.children:
+            child_lo, child_hi = child.line_bounds()
+            lo = max(lo, child_lo)
+            if child_hi is not None:
+                hi = child_hi if hi is None else min(hi, child_hi)
+        return lo, hi
+
+    def index_blocks(self, index, case_sensitive):
+        blocks = None
+        for child in self.children:
+            child_blocks = child.index_blocks(index, case_sensitive)
+            if child_blocks is not None:
+                blocks = child_blocks if blocks is None else blocks & child_blocks
+        return blocks
+
+    def plan(self, sample, case_sensitive, timestamps):
+        for child in self.children:
+            child.plan(sample, case_sensitive, timestamps)
+        # 开销低且最能排除行的谓词先求值：按 开销 / 淘汰率 升序
+        self.children.sort(key=lambda child: child.cost / max(1.0 - child.pass_rate, 1e-3))
+        # 短路求值的期望开销
+        cost, reach = 0.0, 1.0
+        for child in self.children:
+            cost += reach * child.cost
+            reach *= child.pass_rate
+        self.cost = cost
+        return super().plan(sample, case_sensitive, timestamps)
+
+
+class QueryOr(QueryNode):
+    def __init__(self, children):
+        self.children = children
+        self.cost = sum(child.cost for child in children)
+
+    def compile(self, case_sensitive, timestamps):
+        fns = [child.compile(case_sensitive, timestamps) for child in self.children]
+        if len(fns) == 2:
+            first, second = fns
+            return lambda i, text: first(i, text) or second(i, text)
+
+        def any_match(i, text):
+            for fn in fns:
+                if fn(i, text):
+                    return True
+            return False
+        return any_match
+
+    def canonical(self):
+        return ' OR '.join(child.canonical() for child in self.children)
+
+    def literals(self):
+        return [literal for child in self.children for literal in child.literals()]
+
+    def highlight_patterns(self):
+        return [source for child in self.children for source in child.highlight_patterns()]
+
+    def line_bounds(self):
+        bounds = [child.line_bounds() for child in self.children]
+        lo = min(child_lo for child_lo, _ in bounds)
+        his = [child_hi for _, child_hi in bounds]
+        return lo, (None if None in his else max(his))
+
+    def index_blocks(self, index, case_sensitive):
+        blocks = set()
+        for child in self.children:
+            child_blocks = child.index_blocks(index, case_sensitive)
+            if child_blocks is None:
+                return None
+            blocks |= child_blocks
+        return blocks
+
+    def plan(self, sample, case_sensitive, timestamps):
+        for child in self.children:
+            child.plan(sample, case_sensitive, timestamps)
+        # 开销低且最可能命中的谓词先求值：按 开销 / 命中率 升序
+        self.children.sort(key=lambda child: child.cost / max(child.pass_rate, 1e-3))
+        cost, reach = 0.0, 1.0
+        for child in self.children:
+            cost += reach * child.cost
+            reach *= 1.0 - child.pass_rate
+        self.cost = cost
+        return super().plan(sample, case_sensitive, timestamps)
+
+
+def _read_quoted(text, i):
+    """i 指向开头的引号，返回 (内容, 结束引号之后的位置)；支持 \\" 与 \\\\ 转义"""
+    chars = []
+    i += 1
+    while i < len(text):
+        c = text[i]
+        if c == '\\' and i + 1 < len(text) and text[i + 1] in '"\\':
+            chars.append(text[i + 1])
+            i += 2
+            continue
+        if c == '"':
+            return ''.join(chars), i + 1
+        chars.append(c)
+        i += 1
+    raise QuerySyntaxError("引号没有闭合")
+
+
+def _tokenize_query(text):
+    """把查询文本切分为 [(类型, 值), ...]，类型为 'op' / '(' / ')' / 'term'"""
+    tokens = []
+    i = 0
+    n = len(text)
+    while i < n:
+        c = text[i]
+        if c.isspace():
+            i += 1
+        elif c in '()':
+            tokens.append((c, c))
+            i += 1
+        elif c == '"':
+            value, i = _read_quoted(text, i)
+            tokens.append(('term', QueryLiteral(value)))
+        elif text.startswith('re:', i):
+            i += 3
+            if i < n and text[i] == '"':
+                pattern, i = _read_quoted(text, i)
+            else:
+                # 未加引号的正则到空白为止，但允许其中出现配对的括号
+                j, depth = i, 0
+                while j < n and not text[j].isspace():
+                    if text[j] == '\\':
+                        j += 2
+                        continue
+                    if text[j] == '(':
+                        depth += 1
+                    elif text[j] == ')':
+                        if depth == 0:
+                            break
+                        depth -= 1
+                    j += 1
+                pattern, i = text[i:j], j
+            if not pattern:
+                raise QuerySyntaxError("re: 之后缺少正则表达式")
+            tokens.append(('term', QueryRegex(pattern)))
+        else:
+            j = i
+            while j < n and not text[j].isspace() and text[j] not in '()"':
+                j += 1
+            word, i = text[i:j], j
+            if word in ('AND', 'OR', 'NOT'):
+                tokens.append(('op', word))
+            elif word.startswith('line:'):
+                tokens.append(('term', QueryLineRange.parse(word[5:])))
+            elif word.startswith('time:'):
+                tokens.append(('term', QueryTimeRange.parse(word[5:])))
+            else:
+                tokens.append(('term', QueryLiteral(word)))
+    return tokens
+
+
+def parse_query(text):
+    """解析查询表达式，返回语法树根节点
+
+    语法：NOT 优先级最高，其次 AND（相邻的条件之间可省略 AND），最后 OR；
+    括号分组；"带空格的文本" 为字面量；re:模式 为正则；line:A-B 为行号范围；
+    time:A-B 为相对时间戳范围（秒）。运算符必须大写。
+    """
+    tokens = _tokenize_query(text)
+    pos = 0
+
+    def peek():
+        return tokens[pos] if pos < len(tokens) else (None, None)
+
+    def parse_or():
+        nonlocal pos
+        nodes = [parse_and()]
+        while peek() == ('op', 'OR'):
+            pos += 1
+            nodes.append(parse_and())
+        return _flatten(QueryOr, nodes)
+
+    def parse_and():
+        nonlocal pos
+        nodes = [parse_not()]
+        while True:
+            kind, value = peek()
+            if (kind, value) == ('op', 'AND'):
+                pos += 1
+            elif not (kind in ('term', '(') or (kind, value) == ('op', 'NOT')):
+                break
+            nodes.append(parse_not())
+        return _flatten(QueryAnd, nodes)
+
+    def parse_not():
+        nonlocal pos
+        if peek() == ('op', 'NOT'):
+            pos += 1
+            return QueryNot(parse_not())
+        return parse_primary()
+
+    def parse_primary():
+        nonlocal pos
+        kind, value = peek()
+        if kind is None:
+            raise QuerySyntaxError("表达式不完整")
+        pos += 1
+        if kind == 'term':
+            return value
+        if kind == '(':
+            node = parse_or()
+            if peek()[0] != ')':
+                raise QuerySyntaxError("缺少右括号 )")
+            pos += 1
+            return node
+        raise QuerySyntaxError(f"意外的 {value}")
+
+    if not tokens:
+        raise QuerySyntaxError("查询表达式为空")
+    root = parse_or()
+    if pos < len(tokens):
+        raise QuerySyntaxError("多余的右括号 )")
+    return root
+
+
+def _flatten(node_type, nodes):
+    """合并嵌套的同类 AND/OR 节点；只有一个子节点时直接返回它"""
+    flat = []
+    for node in nodes:
+        flat.extend(node.children if isinstance(node, node_type) else [node])
+    return flat[0] if len(flat) == 1 else node_type(flat)
+
+
+class QueryMatcher(KeywordMatcher):
+    """查询表达式匹配器
+
+    把 parse_query 得到的语法树编译为单个判断函数；optimize() 在文件的采样行上
+    估计各谓词的通过率，按开销与选择率重排 AND/OR 子节点（低开销、高淘汰率的
+    条件先求值并短路）。顶层的 line: 条件直接限定扫描的行范围。
+    keywords 为表达式中肯定出现的字面量，供高亮使用。
+    """
+
+    def __init__(self, query, case_sensitive=False, timestamps=None):
+        self.root = parse_query(query)
+        super().__init__(self.root.literals(), case_sensitive, False, QUERY_LOGIC_EXPR)
+        self.query = query
+        self.query_key = self.root.canonical()  # 采样重排之前的规范形式，用作缓存键
+        self.timestamps = timestamps if timestamps is not None else array('d')
+        self.uses_time = 'time:' in self.query_key
+        self.line_bounds = self.root.line_bounds()
+        self._byte_search = None  # 表达式按行求值（含 NOT / 行号 / 时间条件），走文本路径
+        self._compile_plan()
+
+    def _build_match_function(self, parts, flags):
+        return None  # 由 _compile_plan 生成
+
+    def _compile_plan(self):
+        # 正则语法错误在这里以 re.error 抛出
+        evaluate = self.root.compile(self.case_sensitive, self.timestamps)
+        self.evaluate = evaluate
+        if self.case_sensitive:
+            self.prepare = str.strip
+        else:
+            self.prepare = lambda line: line.strip().lower()
+        # 不含行号/时间条件时也可以只凭行内容判断
+        prepare = self.prepare
+        self.matches = lambda line: evaluate(-1, prepare(line))
+
+    def optimize(self, log_file, sample_size=QUERY_PLAN_SAMPLE_LINES):
+        """在扫描范围内均匀采样若干行，按估计的开销与选择率重排查询计划"""
+        lo, hi = self.line_bounds
+        hi = len(log_file) if hi is None else min(hi, len(log_file))
+        step = max(1, (hi - lo) // sample_size)
+        sample = [(i, self.prepare(log_file.get_line(i))) for i in range(lo, hi, step)][:sample_size]
+        if sample:
+            self.root.plan(sample, self.case_sensitive, self.timestamps)
+            self._compile_plan()
+
+    @property
+    def plan_text(self):
+        """按求值顺序排列的查询计划"""
+        return self.root.canonical()
+
+    @property
+    def spec(self):
+        return (self.plan_text, self.case_sensitive, False, QUERY_LOGIC_EXPR, self.engine)
+
+    @property
+    def cache_key(self):
+        return (self.query_key, self.case_sensitive, False, QUERY_LOGIC_EXPR, self.scope_key)
+
+    def scan_line_numbers(self, lines, start_index=0):
+        evaluate = self.evaluate
+        prepare = self.prepare
+        return array('Q', (i + 1 for i, line in enumerate(lines, start_index) if evaluate(i, prepare(line))))
+
+    def scan(self, lines, start_index=0):
+        evaluate = self.evaluate
+        prepare = self.prepare
+        results = []
+        for i, line in enumerate(lines, start_index):
+            if evaluate(i, prepare(line)):
+                results.append((i + 1, line.strip()))
+        return results
+
+    def _highlight_sources(self):
+        # 包括 re: 条件，高亮显示正则实际匹配的部分
+        return self.root.highlight_patterns()
+
+    def filter_results(self, results):
+        evaluate = self.evaluate
+        prepare = self.prepare
+        return [result for result in results if evaluate(result[0] - 1, prepare(result[1]))]
+
+
+def create_keyword_matcher(keywords, case_sensitive=False, use_regex=False, logic="OR",
+                           engine=MATCH_ENGINE_REGEX):
+    """按选择的引擎创建关键字匹配器；正则模式始终使用编译正则引擎
+    logic 为 QUERY_LOGIC_EXPR 时 keywords 是查询表达式文本
+    """
+    if logic == QUERY_LOGIC_EXPR:
+        return QueryMatcher(keywords, case_sensitive)
+    if engine == MATCH_ENGINE_AHO_CORASICK and not use_regex:
+        return AhoCorasickMatcher(keywords, case_sensitive, logic)
+    return KeywordMatcher(keywords, case_sensitive, use_regex, logic)
+
+
+def compute_highlight_spans(patterns, lines, first_line=1):
+    """计算高亮区间：对要显示的每行文本用各正则 finditer
+
+    返回 {正则序号: [起, 止, 起, 止, ...]}，元素为 Tk 文本索引 "行.列"，
+    可以直接作为一次 tag_add 调用的参数。空匹配跳过。
+    """
+    spans = {}
+    for pattern_idx, pattern in enumerate(patterns):
+        finditer = pattern.finditer
+        indices = []
+        for line_no, line in enumerate(lines, first_line):
+            for match in finditer(line):
+                start, end = match.span()
+                if end > start:
+                    indices.append(f"{line_no}.{start}")
+                    indices.append(f"{line_no}.{end}")
+        if indices:
+            spans[pattern_idx] = indices
+    return spans
+
+
+def is_query_refinement(old_spec, new_spec):
+    """判断新查询是否是旧查询的严格细化（新结果必然是旧结果的子集）
+
+    spec 为 KeywordMatcher.spec。只处理普通文本查询且选项不变的情况：
+    - AND：每个旧关键字都包含在某个新关键字中（追加条件或加长关键字）
+    - OR：每个新关键字都包含某个旧关键字（删除候选或加长关键字）
+    AC 自动机的 AND 模式需要全文件的各关键字计数，不做细化。
+    """
+    if old_spec is None or old_spec == new_spec:
+        return False
+    old_keywords, case_sensitive, use_regex, logic, _ = old_spec
+    new_keywords, new_case_sensitive, new_use_regex, new_logic, new_engine = new_spec
+    if (use_regex or new_use_regex or case_sensitive != new_case_sensitive or logic != new_logic or
+            logic == QUERY_LOGIC_EXPR or
+            (logic == "AND" and new_engine == MATCH_ENGINE_AHO_CORASICK)):
+        return False
+    if not case_sensitive:
+        old_keywords = [k.lower() for k in old_keywords]
+        new_keywords = [k.lower() for k in new_keywords]
+    if logic == "AND":
+        return all(any(old in new for new in new_keywords) for old in old_keywords)
+    return all(any(old in new for old in old_keywords) for new in new_keywords)
+
+
+# 边输入边搜索：停止输入多久后开始搜索、最少字符数
+LIVE_SEARCH_DEBOUNCE_MS = 300
+LIVE_SEARCH_MIN_CHARS = 2
+
+# 跟随模式：文件有增长时的轮询间隔；没有增长时间隔逐次加倍，直到上限
+FOLLOW_POLL_MS = 500
+FOLLOW_IDLE_POLL_MAX_MS = 4000
+
+# 流式搜索：后台线程每批扫描的行数，界面轮询结果队列的间隔
+SEARCH_BATCH_LINES = 20000
+SEARCH_POLL_MS = 50
+
+# 上下文窗口：选中时目标行前后各渲染的行数、滚动到边缘时每次补充的行数、
+# 最多同时保留的行数（超出时从另一端裁掉），以及触发补充的滚动位置比例
+CONTEXT_WINDOW_LINES = 150
+CONTEXT_PAGE_LINES = 200
+CONTEXT_MAX_RENDERED_LINES = 1500
+CONTEXT_EDGE_FRACTION = 0.1
+# 已格式化的上下文行缓存上限（行数），空闲时为相邻结果预先格式化的每步行数
+CONTEXT_LINE_CACHE_LINES = 20000
+CONTEXT_PREFETCH_STEP_LINES = 100
+
+
+# 并行搜索：单个任务处理的最大字节数，以及启用并行的最小文件大小
+PARALLEL_TASK_BYTES = 32 * 1024 * 1024
+PARALLEL_MIN_FILE_BYTES = 8 * 1024 * 1024
+
+
+def _parallel_search_task(file_path, byte_start, byte_end, first_line, matcher_spec, encoding):
+    """子进程任务：用 mmap 读取 [byte_start, byte_end) 范围（已对齐到行首），
+    返回 (命中行号 array('Q'), 各关键字命中行数或 None)
+    """
+    matcher = create_keyword_matcher(*matcher_spec)
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        if matcher.byte_searchable and _is_utf8(encoding):
+            return matcher.scan_bytes(buffer, byte_start, byte_end, first_line), None
+        text = buffer[byte_start:byte_end].decode(encoding, errors='ignore')
+    lines = text.split('\n')
+    if text.endswith('\n'):
+        lines.pop()  # 末尾换行产生的空串不是一行
+    line_numbers = matcher.scan_line_numbers(lines, first_line)
+    return line_numbers, getattr(matcher, 'keyword_hit_counts', None)
+
+
+def parallel_search(log_file, matcher, executor, task_count, line_count=None):
+    """把文件按行边界切分为若干字节范围，在进程池中并行匹配
+
+    子进程各自 mmap 同一个文件（共享页缓存，不传递行内容），只返回命中的行号；
+    结果按范围顺序拼接，与顺序扫描完全一致。与 scan_file 相同，只切分 matcher.line_bounds
+    限定的行范围，命中行再经 line_filter 过滤。
+    返回 (命中行号 array('Q'), 各关键字命中行数或 None)
+    """
+    if line_count is None:
+        line_count = len(log_file)
+    lo, hi = matcher.line_bounds
+    first_line = min(max(0, lo), line_count)
+    if hi is not None:
+        line_count = min(line_count, hi)
+    if line_count <= first_line:
+        return array('Q'), None
+    offsets = log_file.offsets
+    total_bytes = offsets[line_count] - offsets[first_line]
+    task_count = max(1, task_count, -(-total_bytes // PARALLEL_TASK_BYTES))
+    span = line_count - first_line
+    bounds = sorted({first_line + span * k // task_count for k in range(task_count + 1)})
+    futures = [
+        executor.submit(_parallel_search_task, log_file.file_path, offsets[start], offsets[end],
+                        start, matcher.spec, log_file.encoding)
+        for start, end in zip(bounds, bounds[1:])
+    ]
+    line_numbers = array('Q')
+    keyword_counts = None
+    for future in futures:
+        numbers, counts = future.result()
+        line_numbers.extend(numbers)
+        if counts is not None:
+            keyword_counts = counts if keyword_counts is None else [a + b for a, b in zip(keyword_counts, counts)]
+    if matcher.line_filter is not None:
+        keep = matcher.line_filter
+        line_numbers = array('Q', (n for n in line_numbers if keep(n - 1)))
+    return line_numbers, keyword_counts
+
+
+def benchmark_match_engines(lines, keywords, case_sensitive=False, logic="OR", log_file=None):
+    """对同一批行比较原始逐关键字循环、编译正则与 AC 自动机的耗时
+    给出 log_file（lines 为其开头的行）时再比较直接扫描原始字节的路径
+    返回 [(引擎名称, 耗时秒, 匹配行数), ...]
+    """
+    def legacy_loop():
+        # 与改造前 filter_logs 的普通文本分支相同的写法
+        results = []
+        for i, line in enumerate(lines):
+            line_content = line.strip()
+            search_line = line_content if case_sensitive else line_content.lower()
+            search_keywords = keywords if case_sensitive else [k.lower() for k in keywords]
+            if logic == "AND":
+                found = all(k in search_line for k in search_keywords)
+            else:
+                found = any(k in search_line for k in search_keywords)
+            if found:
+                results.append((i + 1, line_content))
+        return results
+
+    runners = [
+        ("原始逐关键字循环", legacy_loop),
+        ("编译正则", lambda: KeywordMatcher(keywords, case_sensitive, False, logic).scan(lines)),
+        ("AC自动机", lambda: AhoCorasickMatcher(keywords, case_sensitive, logic).scan(lines)),
+    ]
+    if isinstance(log_file, LineIndexedFile) and KeywordMatcher(keywords, case_sensitive, False, logic).byte_searchable:
+        runners.append(("字节级扫描", lambda: KeywordMatcher(keywords, case_sensitive, False, logic)
+                        .scan_file(log_file, 0, len(lines))))
+    report = []
+    for name, runner in runners:
+        start = time.perf_counter()
+        results = runner()
+        report.append((name, time.perf_counter() - start, len(results)))
+    return report
+
+
+class ChannelIndex:
+    """[Cxx] 通道标签索引
+
+    每行一个字节的通道代码 (array('B'))，0 表示该行没有通道标签，其余代码对应
+    names 中的标签名（超过 254 种标签时其余都归入最后一个代码"其它"）。
+    各通道行数用 bytes.count 直接统计；包含/排除筛选通过 bytes.translate 一次
+    生成逐行 0/1 掩码，再与关键字结果求交；按通道取行号的倒排表按需生成并缓存。
+    """
+
+    NO_CHANNEL = "(无通道)"
+    OTHER_CHANNELS = "其它"
+    MAX_CODES = 255
+
+    def __init__(self, names=None, codes=None):
+        self.names = list(names) if names else [self.NO_CHANNEL]
+        self.codes = codes if codes is not None else array('B')
+        self._code_by_tag = {name.encode('ascii'): code for code, name in enumerate(self.names) if code}
+        self._code_by_tag[b''] = 0
+        self._postings = {}
+
+    def _new_code(self, tag):
+        if len(self.names) >= self.MAX_CODES:
+            if self.names[-1] != self.OTHER_CHANNELS:
+                self.names.append(self.OTHER_CHANNELS)
+            code = len(self.names) - 1
+        else:
+            self.names.append(tag.decode('ascii'))
+            code = len(self.names) - 1
+        self._code_by_tag[tag] = code
+        return code
+
+    def extend(self, tags):
+        """追加若干行的通道标签（bytes，空表示没有标签）"""
+        lookup = self._code_by_tag
+        new_code = self._new_code
+        self.codes.extend([lookup[tag] if tag in lookup else new_code(tag) for tag in tags])
+        self._postings.clear()
+
+    def truncate(self, line_count):
+        """只保留前 line_count 行（跟随模式下重新解析未写完的最后一行）"""
+        del self.codes[line_count:]
+        self._postings.clear()
+
+    def __len__(self):
+        return len(self.codes)
+
+    def channel_of(self, line_idx):
+        return self.names[self.codes[line_idx]] if line_idx < len(self.codes) else self.NO_CHANNEL
+
+    def line_counts(self):
+        """{通道名: 行数}，按通道名排序，没有行的通道不列出"""
+        data = self.codes.tobytes()
+        counts = {name: data.count(bytes([code])) for code, name in enumerate(self.names)}
+        return {name: counts[name] for name in sorted(counts) if counts[name]}
+
+    def lines_for(self, name):
+        """倒排表：该通道的全部行索引(0-based) array('I')"""
+        code = self.names.index(name)
+        lines = self._postings.get(code)
+        if lines is None:
+            lines = array('I', (m.start() for m in re.finditer(re.escape(bytes([code])), self.codes.tobytes())))
+            self._postings[code] = lines
+        return lines
+
+    def mask(self, include=(), exclude=()):
+        """逐行掩码 bytes：通过筛选的行为 1。include 非空时只保留其中的通道，再去掉 exclude"""
+        include_codes = {code for code, name in enumerate(self.names) if name in include}
+        exclude_codes = {code for code, name in enumerate(self.names) if name in exclude}
+        table = bytes((1 if (not include_codes or code in include_codes) and code not in exclude_codes else 0)
+                      for code in range(256))
+        return self.codes.tobytes().translate(table)
+
+
+class MatchResults:
+    """搜索结果序列：只保存命中行号 array('I')，行内容在访问时才从文件后端读取解码
+
+    元素为 (行号(1-based), 去除首尾空白的行内容)，可直接替代原先的结果列表；
+    结果视图只读取可见的几十行，20 万条结果也只占 800KB。
+    """
+
+    __slots__ = ('log_file', 'line_numbers')
+
+    def __init__(self, log_file, line_numbers=()):
+        self.log_file = log_file
+        self.line_numbers = array('I', line_numbers)
+
+    @classmethod
+    def from_results(cls, log_file, results):
+        """由 [(行号, 行内容), ...] 结果列表构建（已是 MatchResults 时原样返回）"""
+        if isinstance(results, cls):
+            return results
+        return cls(log_file, (line_num for line_num, _ in results))
+
+    def extend(self, results):
+        self.line_numbers.extend(line_num for line_num, _ in results)
+
+    def truncate(self, line_count):
+        """去掉第 line_count 行之后的结果（行号升序），返回去掉的条数"""
+        keep = bisect_right(self.line_numbers, line_count)
+        removed = len(self.line_numbers) - keep
+        del self.line_numbers[keep:]
+        return removed
+
+    def __len__(self):
+        return len(self.line_numbers)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self.line_numbers)))]
+        line_num = self.line_numbers[index]
+        return line_num, self.log_file.get_line(line_num - 1).strip()
+
+    def __iter__(self):
+        get_line = self.log_file.get_line
+        for line_num in self.line_numbers:
+            yield line_num, get_line(line_num - 1).strip()
+
+
+# 搜索结果缓存占用内存上限
+SEARCH_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+class SearchResultCache:
+    """搜索结果 LRU 缓存
+
+    键为文件身份（路径、大小、修改时间、已索引行数）加规范化后的查询（关键字、
+    大小写、正则、AND/OR），值为命中行号 array('I') 以及 AC 自动机统计的各关键字
+    命中行数。按占用内存淘汰最久未使用的条目。
+    """
+
+    ENTRY_OVERHEAD = 256  # 每个条目键与容器的大致开销（字节）
+
+    def __init__(self, max_bytes=SEARCH_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (line_numbers, keyword_counts, size)
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(matcher, keyword):
+        # 不区分大小写的普通文本查询忽略关键字大小写
+        return keyword.lower() if matcher.fold_case else keyword
+
+    @staticmethod
+    def file_key(log_file):
+        """结果对应的文件状态：(文件身份, 已索引行数)；后台搜索在扫描开始时记录"""
+        return log_file.identity(), len(log_file)
+
+    def _key(self, log_file, matcher, file_key=None):
+        return (file_key or self.file_key(log_file)) + matcher.cache_key
+
+    def lookup(self, log_file, matcher):
+        """返回 (行号 array('I'), 各关键字命中行数列表或 None)，未命中返回 None
+
+        AC 自动机匹配器需要各关键字命中行数，缓存条目中没有时视为未命中。
+        """
+        key = self._key(log_file, matcher)
+        entry = self._entries.get(key)
+        needs_counts = isinstance(matcher, AhoCorasickMatcher)
+        if entry is None or (needs_counts and entry[1] is None):
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        counts = None
+        if needs_counts:
+            counts = [entry[1][self._normalize(matcher, k)] for k in matcher.keywords]
+        return entry[0], counts
+
+    def store(self, log_file, matcher, line_numbers, file_key=None):
+        """保存一次搜索的结果，超过内存上限时淘汰最久未使用的条目
+        file_key 为扫描开始时记录的 file_key()，省略时取文件当前状态
+        """
+        line_numbers = array('I', line_numbers)
+        size = len(line_numbers) * line_numbers.itemsize + self.ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return  # 单个结果超过上限，不缓存
+        keyword_counts = None
+        if isinstance(matcher, AhoCorasickMatcher):
+            keyword_counts = {self._normalize(matcher, k): c
+                              for k, c in zip(matcher.keywords, matcher.keyword_hit_counts)}
+        key = self._key(log_file, matcher, file_key)
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.total_bytes -= old[2]
+        self._entries[key] = (line_numbers, keyword_counts, size)
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes:
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self.total_bytes -= evicted_size
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SearchWorker(threading.Thread):
+    """后台搜索线程
+
+    按 SEARCH_BATCH_LINES 行一批扫描（受匹配器 restrict_lines 范围限制），每批的
+    命中结果放入 results_queue，由界面用 root.after 轮询取出并追加显示。
+    cancel() 后在当前批次结束时停止，已送出的结果保持有效。
+    """
+
+    def __init__(self, log_file, matcher, batch_lines=SEARCH_BATCH_LINES):
+        super().__init__(daemon=True)
+        self.log_file = log_file
+        self.matcher = matcher
+        self.batch_lines = batch_lines
+        lo, hi = matcher.line_bounds
+        self.start_line = lo
+        self.end_line = len(log_file) if hi is None else min(hi, len(log_file))
+        self.results_queue = queue.Queue()
+        self.lines_scanned = 0
+        self.keyword_counts = None  # AC 自动机各关键字命中行数（逐批累加）
+        self.cancel_event = threading.Event()
+        self.start_time = time.perf_counter()
+        self.elapsed = 0.0
+        self.finished = False
+        self.error = None
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def run(self):
+        try:
+            matcher = self.matcher
+            for start in range(self.start_line, self.end_line, self.batch_lines):
+                if self.cancel_event.is_set():
+                    break
+                end = min(start + self.batch_lines, self.end_line)
+                batch = matcher.scan_file(self.log_file, start, end)
+                counts = getattr(matcher, 'keyword_hit_counts', None)
+                if counts is not None:
+                    self.keyword_counts = counts if self.keyword_counts is None else \
+                        [a + b for a, b in zip(self.keyword_counts, counts)]
+                if batch:
+                    self.results_queue.put(batch)
+                self.lines_scanned = end - self.start_line
+        except Exception as e:
+            self.error = e
+        finally:
+            self.elapsed = time.perf_counter() - self.start_time
+            self.finished = True
+
+    def progress(self):
+        """返回 (已扫描行数, 需扫描行数, 行/秒)"""
+        elapsed = max(time.perf_counter() - self.start_time, 1e-6)
+        return self.lines_scanned, self.end_line - self.start_line, self.lines_scanned / elapsed
+
+
+class IndexCache:
+    """行索引旁路缓存
+
+    为每个日志文件保存行偏移表、逐行解析出的相对时间戳与通道代码、TIME[0] 基准列表以及
+    检测出的时间戳格式，
+    再次打开同一文件时直接读取，免去重新扫描。缓存以文件路径命名，读取时用
+    文件大小、修改时间和采样内容哈希校验；缓存目录总大小超过上限时按最近
+    使用时间淘汰最旧的条目。
+    """
+
+    MAGIC = b'LFIDX\n'
+
+    def __init__(self, cache_dir=INDEX_CACHE_DIR, max_bytes=INDEX_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _cache_path(self, file_path):
+        key = hashlib.sha1(os.path.abspath(file_path).encode('utf-8', errors='ignore')).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.lfidx")
+
+    def load(self, log_file):
+        """读取并校验缓存，命中返回 (offsets, timestamps, baselines, channel_index, 时间戳格式名)，否则返回 None"""
+        cache_path = self._cache_path(log_file.file_path)
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            with open(cache_path, 'rb') as f:
+                if f.read(len(self.MAGIC)) != self.MAGIC:
+                    return None
+                header_len, = struct.unpack('<Q', f.read(8))
+                header = json.loads(f.read(header_len).decode('utf-8'))
+                if (header.get('version') != INDEX_CACHE_VERSION or
+                        header.get('byteorder') != sys.byteorder or
+                        header.get('fingerprint') != log_file.fingerprint()):
+                    return None
+                arrays = {}
+                for name, typecode, length in header['arrays']:
+                    values = array(typecode)
+                    values.frombytes(zlib.decompress(f.read(length)))
+                    arrays[name] = values
+            baselines = [(idx, ts, datetime.strptime(dt, '%Y-%m-%d %H:%M:%S'))
+                         for idx, ts, dt in header['baselines']]
+            channel_index = ChannelIndex(header['channel_names'], arrays['channels'])
+            # 记录最近使用时间，供淘汰策略使用
+            os.utime(cache_path)
+            return arrays['offsets'], arrays['timestamps'], baselines, channel_index, header['timestamp_format']
+        except Exception as e:
+            print(f"读取索引缓存失败: {e}")
+            return None
+
+    def save(self, log_file, timestamps, baselines, channel_index, timestamp_format):
+        """写入缓存（先写临时文件再替换），随后执行淘汰"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            cache_path = self._cache_path(log_file.file_path)
+            blobs = [('offsets', log_file.offsets), ('timestamps', timestamps),
+                     ('channels', channel_index.codes)]
+            compressed = [(name, values.typecode, zlib.compress(values.tobytes(), 1))
+                          for name, values in blobs]
+            header = {
+                'version': INDEX_CACHE_VERSION,
+                'byteorder': sys.byteorder,
+                'file_path': os.path.abspath(log_file.file_path),
+                'fingerprint': log_file.fingerprint(),
+                'baselines': [(idx, ts, dt.strftime('%Y-%m-%d %H:%M:%S')) for idx, ts, dt in baselines],
+                'channel_names': channel_index.names,
+                'timestamp_format': timestamp_format.name,
+                'arrays': [(name, typecode, len(data)) for name, typecode, data in compressed],
+            }
+            header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+            tmp_path = cache_path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(self.MAGIC)
+                f.write(struct.pack('<Q', len(header_bytes)))
+                f.write(header_bytes)
+                for _, _, data in compressed:
+                    f.write(data)
+            os.replace(tmp_path, cache_path)
+            self._evict()
+        except Exception as e:
+            print(f"写入索引缓存失败: {e}")
+
+    def _evict(self):
+        """缓存目录超过大小上限时，按最近使用时间删除最旧的缓存文件"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.lfidx'):
+                path = os.path.join(self.cache_dir, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                print(f"🧹 淘汰索引缓存: {path}")
+            except OSError as e:
+                print(f"删除索引缓存失败: {e}")
+
+
+def is_compressed_log(file_path):
+    return os.path.splitext(file_path)[1].lower() in COMPRESSED_LOG_READERS
+
+
+class DecompressedLogCache:
+    """压缩日志的解压缓存
+
+    .gz/.bz2/.xz 第一次打开时流式解压到缓存目录中的普通文件，之后 mmap、行索引缓存、
+    字节级搜索和多进程搜索都直接使用这个文件，跳转到任意行不需要从头解压。标准库的
+    解压器不能从流中间的位置恢复解压，因此不保存压缩流内部的检查点，而是保存整个解压
+    结果。缓存文件名由原始文件的绝对路径、大小和修改时间决定，原始文件改变后自然失效；
+    总大小超过上限时按最近使用时间淘汰。
+    """
+
+    def __init__(self, cache_dir=DECOMPRESS_CACHE_DIR, max_bytes=DECOMPRESS_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def cache_path(self, file_path):
+        stat = os.stat(file_path)
+        identity = f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+        key = hashlib.sha1(identity.encode('utf-8', errors='ignore')).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.log")
+
+    def lookup(self, file_path):
+        """已解压过时返回缓存文件路径，否则返回 None"""
+        path = self.cache_path(file_path)
+        if not os.path.exists(path):
+            return None
+        os.utime(path)  # 记录最近使用时间，供淘汰策略使用
+        return path
+
+    def evict(self, keep=None):
+        """缓存目录超过大小上限时，按最近使用时间删除最旧的解压文件（keep 除外）"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.log'):
+                path = os.path.join(self.cache_dir, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if keep is not None and os.path.abspath(path) == os.path.abspath(keep):
+                continue
+            try:
+                os.remove(path)
+                total -= size
+                print(f"🧹 淘汰解压缓存: {path}")
+            except OSError as e:
+                print(f"删除解压缓存失败: {e}")
+
+
+class DecompressWorker(threading.Thread):
+    """后台解压线程：把压缩日志流式解压到 DecompressedLogCache，完成后由界面加载
+
+    先写入临时文件，完成后再改名，取消或出错时不会留下不完整的缓存。进度按已读取的
+    压缩字节计算。
+    """
+
+    def __init__(self, file_path, cache):
+        super().__init__(daemon=True)
+        self.file_path = file_path
+        self.cache = cache
+        self.output_path = cache.cache_path(file_path)
+        self.compressed_size = os.path.getsize(file_path)
+        self.compressed_read = 0
+        self.output_bytes = 0
+        self.cancel_event = threading.Event()
+        self.start_time = time.perf_counter()
+        self.elapsed = 0.0
+        self.finished = False
+        self.error = None
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def run(self):
+        tmp_path = self.output_path + '.tmp'
+        try:
+            os.makedirs(self.cache.cache_dir, exist_ok=True)
+            open_reader = COMPRESSED_LOG_READERS[os.path.splitext(self.file_path)[1].lower()]
+            with open(self.file_path, 'rb') as raw, open_reader(raw) as reader, open(tmp_path, 'wb') as out:
+                while not self.cancel_event.is_set():
+                    data = reader.read(DECOMPRESS_CHUNK_SIZE)
+                    if not data:
+                        break
+                    out.write(data)
+                    self.output_bytes += len(data)
+                    self.compressed_read = raw.tell()
+            if self.cancel_event.is_set():
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, self.output_path)
+                self.cache.evict(keep=self.output_path)
+        except Exception as e:
+            self.error = e
+            try:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            except OSError:
+                pass
+        finally:
+            self.elapsed = time.perf_counter() - self.start_time
+            self.finished = True
+
+    def progress(self):
+        """(已读取压缩数据的比例, 解压输出 字节/秒)"""
+        elapsed = max(time.perf_counter() - self.start_time, 1e-6)
+        fraction = self.compressed_read / self.compressed_size if self.compressed_size else 1.0
+        return fraction, self.output_bytes / elapsed
+
+
+class FileLoadWorker(threading.Thread):
+    """后台文件加载线程
+
+    分块为 LineIndexedFile 建立行偏移索引，同时解析本块每行的时间戳与 [Cxx]
+    通道标签并扫描基准行。时间戳格式未指定时，在第一个数据块建立索引后用开头的
+    若干行自动检测。若索引缓存命中则直接采用缓存结果。最后在本线程中推算逐行绝对
+    时间索引（LineTimeIndex），界面只需采用。进度通过属性暴露给界面轮询；cancel()
+    后在下一个数据块边界停止。
+    """
+
+    def __init__(self, log_file, timestamp_format=None, index_cache=None):
+        super().__init__(daemon=True)
+        self.log_file = log_file
+        self.timestamp_format = timestamp_format
+        self.index_cache = index_cache
+        self.cache_hit = False
+        self.line_timestamps = array('d')  # 每行的相对时间戳，无时间戳为 NaN
+        self.time_baselines = []  # [(line_idx, base_ts, base_dt), ...]
+        self.channel_index = ChannelIndex()
+        self.line_time_index = None  # 逐行绝对时间（加载结束后在本线程中推算）
+        self.time_index_seconds = 0.0
+        self.cancel_event = threading.Event()
+        self.start_time = time.perf_counter()
+        self.elapsed = 0.0
+        self.finished = False
+        self.error = None
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def run(self):
+        try:
+            log_file = self.log_file
+            cached = self.index_cache.load(log_file) if self.index_cache is not None else None
+            if cached is not None:
+                offsets, self.line_timestamps, self.time_baselines, self.channel_index, format_name = cached
+                self.timestamp_format = create_timestamp_format(format_name, log_file)
+                log_file.adopt_index(offsets)
+                self.cache_hit = True
+            else:
+                self._build_index()
+            # 缓存命中时同样需要推算；取消时按已建立索引的部分推算
+            time_index_start = time.perf_counter()
+            self.line_time_index = LineTimeIndex(self.line_timestamps, self.time_baselines)
+            self.time_index_seconds = time.perf_counter() - time_index_start
+        except Exception as e:
+            self.error = e
+        finally:
+            self.elapsed = time.perf_counter() - self.start_time
+            self.finished = True
+
+    def _build_index(self):
+        """分块建立行索引并解析每块的时间戳、通道标签与校时点，完整建立后写入索引缓存"""
+        log_file = self.log_file
+        while not log_file.index_complete and not self.cancel_event.is_set():
+            chunk_start = log_file.indexed_bytes
+            first_line = len(log_file)
+            log_file.index_next_chunk()
+            if self.timestamp_format is None:
+                sample = list(log_file.iter_lines(0, min(len(log_file), TIMESTAMP_DETECT_SAMPLE_LINES)))
+                self.timestamp_format = detect_timestamp_format(sample, log_file)
+                print(f"🕐 时间戳格式: {self.timestamp_format.label}")
+            self._scan_line_fields(chunk_start, log_file.indexed_bytes, len(log_file) - first_line)
+            self._scan_baselines(chunk_start, log_file.indexed_bytes)
+            self.elapsed = time.perf_counter() - self.start_time
+
+        if self.index_cache is not None and not self.cancel_event.is_set():
+            self.index_cache.save(log_file, self.line_timestamps, self.time_baselines, self.channel_index,
+                                  self.timestamp_format)
+
+    def _scan_line_fields(self, start, end, line_count):
+        """解析 [start, end) 字节范围内每一行的时间戳与通道标签"""
+        timestamps, tags = self.timestamp_format.scan_line_fields(self.log_file._buffer, start, end, line_count)
+        self.line_timestamps.extend(timestamps)
+        self.channel_index.extend(tags)
+
+    def _scan_baselines(self, start, end):
+        """扫描 [start, end) 字节范围内的基准行"""
+        self.time_baselines.extend(self.timestamp_format.find_baselines(self.log_file, start, end))
+
+    def progress(self):
+        """返回 (完成比例, 字节/秒, 行/秒)"""
+        total = self.log_file.file_size or 1
+        elapsed = max(self.elapsed, time.perf_counter() - self.start_time, 1e-6)
+        return (self.log_file.indexed_bytes / total,
+                self.log_file.indexed_bytes / elapsed,
+                len(self.log_file) / elapsed)
+
+
+# 时间戳解析：相对时间戳 [ssss.mmm] 与完整日期时间 YYYY/MM/DD HH:MM:SS（按优先级排列）
+_RELATIVE_TIMESTAMP_RE = re.compile(r'\[(\d+\.\d+)\]')
+_DATETIME_PATTERNS = (
+    re.compile(r'\[(\d{4}/\d{2}/\d{2}\s+\d{2}:\d{2}:\d{2})\]'),  # [2025/07/22 18:20:15]，可有多个空格
+    re.compile(r'TIME\[0\]\s*\[(\d{4}/\d{2}/\d{2}\s+\d{2}:\d{2}:\d{2})\]'),  # TIME[0] 后的时间
+    re.compile(r'(\d{4}/\d{2}/\d{2}\s+\d{2}:\d{2}:\d{2})'),  # 没有方括号
+)
+
+# 日期时间字符串 -> datetime 缓存的条目上限
+TIMESTAMP_MEMO_SIZE = 4096
+
+
+class LogTimestampParser:
+    """预编译的日志时间戳解析器
+
+    parse(line) 的返回值与原 parse_log_timestamp 相同：
+    (timestamp_float, datetime_obj, has_time_info, is_time_baseline)。
+    - 行首就是 [ddddd.ddd] 时按位置切片直接 float()，否则才用预编译正则查找
+    - 行中没有 '/' 就不可能有日期，跳过日期正则
+    - 日期字符串按固定偏移切片转换为整数构造 datetime，不走 strptime；结果按字符串
+      缓存，同一秒内的多行和重复的 TIME[0] 校时行直接命中
+    parse_block(lines) 一次解析一批行，返回逐行相对时间戳数组和日期时间列表。
+    """
+
+    def __init__(self, memo_size=TIMESTAMP_MEMO_SIZE):
+        self.memo_size = memo_size
+        self._datetime_memo = {}
+
+    def parse_datetime(self, text):
+        """'YYYY/MM/DD HH:MM:SS'（日期与时间之间可有多个空白）-> datetime，无效日期返回 None"""
+        memo = self._datetime_memo
+        dt = memo.get(text, memo)
+        if dt is not memo:
+            return dt
+        try:
+            dt = datetime(int(text[0:4]), int(text[5:7]), int(text[8:10]),
+                          int(text[-8:-6]), int(text[-5:-3]), int(text[-2:]))
+        except ValueError:
+            dt = None
+        if len(memo) >= self.memo_size:
+            memo.clear()
+        memo[text] = dt
+        return dt
+
+    def parse_relative(self, line):
+        """行中第一个 [ddddd.ddd] 相对时间戳，没有返回 None"""
+        if line.startswith('['):
+            end = line.find(']', 1)
+            if end > 0:
+                integer, dot, fraction = line[1:end].partition('.')
+                if dot and integer.isdigit() and fraction.isdigit() and integer.isascii() and fraction.isascii():
+                    return float(line[1:end])
+        match = _RELATIVE_TIMESTAMP_RE.search(line)
+        return float(match.group(1)) if match else None
+
+    def parse(self, line):
+        timestamp_float = self.parse_relative(line)
+        datetime_obj = None
+        if '/' in line:
+            for pattern in _DATETIME_PATTERNS:
+                match = pattern.search(line)
+                if match:
+                    datetime_obj = self.parse_datetime(match.group(1))
+                    if datetime_obj is not None:
+                        break
+        has_time_info = timestamp_float is not None or datetime_obj is not None
+        return timestamp_float, datetime_obj, has_time_info, "TIME[0]" in line
+
+    def parse_block(self, lines):
+        """解析一批行，返回 (相对时间戳 array('d')，没有为 NaN；日期时间列表，没有为 None)"""
+        parse_relative = self.parse_relative
+        parse_datetime = self.parse_datetime
+        patterns = _DATETIME_PATTERNS
+        timestamps = array('d')
+        datetimes = []
+        for line in lines:
+            ts = parse_relative(line)
+            timestamps.append(math.nan if ts is None else ts)
+            dt = None
+            if '/' in line:
+                for pattern in patterns:
+                    match = pattern.search(line)
+                    if match:
+                        dt = parse_datetime(match.group(1))
+                        if dt is not None:
+                            break
+            datetimes.append(dt)
+        return timestamps, datetimes
+
+
+def benchmark_timestamp_parsers(lines):
+    """对同一批行比较原始逐模式解析（每次调用重新查找正则 + strptime）与编译解析器的耗时
+    返回 [(解析器名称, 耗时秒, 有时间信息的行数), ...]
+    """
+    def legacy_parse(line):
+        # 与改造前 parse_log_timestamp 相同的写法
+        timestamp_float = None
+        datetime_obj = None
+        has_time_info = False
+        timestamp_match = re.search(r'\[(\d+\.\d+)\]', line)
+        if timestamp_match:
+            timestamp_float = float(timestamp_match.group(1))
+            has_time_info = True
+        datetime_patterns = [
+            r'\[(\d{4}/\d{2}/\d{2}\s+\d{2}:\d{2}:\d{2})\]',
+            r'TIME\[0\]\s*\[(\d{4}/\d{2}/\d{2}\s+\d{2}:\d{2}:\d{2})\]',
+            r'(\d{4}/\d{2}/\d{2}\s+\d{2}:\d{2}:\d{2})',
+        ]
+        for pattern in datetime_patterns:
+            datetime_match = re.search(pattern, line)
+            if datetime_match:
+                try:
+                    datetime_obj = datetime.strptime(datetime_match.group(1), '%Y/%m/%d %H:%M:%S')
+                    has_time_info = True
+                    break
+                except ValueError:
+                    continue
+        return timestamp_float, datetime_obj, has_time_info, "TIME[0]" in line
+
+    parser = LogTimestampParser()
+
+    def count_block(block):
+        timestamps, datetimes = block
+        return sum(1 for ts, dt in zip(timestamps, datetimes) if ts == ts or dt is not None)
+
+    runners = [
+        ("原始逐模式解析", lambda: sum(1 for line in lines if legacy_parse(line)[2])),
+        ("编译解析器", lambda: sum(1 for line in lines if parser.parse(line)[2])),
+        ("编译解析器(批量)", lambda: count_block(parser.parse_block(lines))),
+    ]
+    report = []
+    for name, runner in runners:
+        start = time.perf_counter()
+        count = runner()
+        report.append((name, time.perf_counter() - start, count))
+    return report
+
+
+# 绝对时间格式的"相对时间戳"是相对这一时刻的秒数（本地时间，不含时区）
+NAIVE_EPOCH = datetime(1970, 1, 1)
+
+
+# 首尾偏移相同且跨度不超过这么多小时的时间段中不会有两次夏令时切换
+TIME_OFFSET_STABLE_HOURS = 24 * 30
+
+
+def local_utc_offset(hour):
+    """本地时间第 hour 个整点（相对 NAIVE_EPOCH）处本地时间与 UTC 的差（秒）
+    夏令时前后偏移不同，因此每个时刻要用它自己所在日期的偏移换算为 epoch 秒
+    """
+    try:
+        return hour * 3600 - (NAIVE_EPOCH + timedelta(hours=hour)).timestamp()
+    except (OSError, OverflowError, ValueError):
+        # Windows 上 1970 年附近的本地时间无法换算，使用标准时区偏移
+        return -time.timezone
+
+# 自动检测时间戳格式：采样的行数，以及最佳格式至少要能解析的行比例
+TIMESTAMP_DETECT_SAMPLE_LINES = 200
+TIMESTAMP_DETECT_MIN_SCORE = 0.1
+
+# 已注册的时间戳格式（名称 -> 类），按检测时的优先顺序排列
+TIMESTAMP_FORMATS = {}
+
+
+def register_timestamp_format(cls):
+    """注册时间戳格式插件（类装饰器）"""
+    TIMESTAMP_FORMATS[cls.name] = cls
+    return cls
+
+
+class TimestampFormat:
+    """时间戳格式插件基类
+
+    每种格式提供 parse_seconds(line)（行时间，秒），parse(line)（返回值同
+    parse_log_timestamp），以及加载时按字节批量解析的 scan_line_fields 和 find_baselines。
+    绝对时间格式把行时间换算为相对 NAIVE_EPOCH 的秒数作为逐行"相对时间戳"，并使用
+    第 0 行的一个虚拟校时点 (0, 0.0, NAIVE_EPOCH)，因此校时点表、时间列和时间窗口
+    都不需要区分格式。子类给出 line_regex（按行 findall，唯一分组为时间戳文本）。
+    """
+
+    name = None
+    label = None
+    line_regex = None
+
+    def __init__(self, log_file=None):
+        pass
+
+    def parse_seconds(self, line):
+        raise NotImplementedError
+
+    def parse(self, line):
+        seconds = self.parse_seconds(line)
+        if seconds is None:
+            return None, None, False, False
+        return seconds, NAIVE_EPOCH + timedelta(seconds=seconds), True, False
+
+    def score(self, lines):
+        """样本行中能解析出时间的比例"""
+        if not lines:
+            return 0.0
+        parse_seconds = self.parse_seconds
+        return sum(1 for line in lines if parse_seconds(line) is not None) / len(lines)
+
+    def scan_line_fields(self, buffer, start, end, line_count):
+        """[start, end) 字节范围内逐行的 (时间戳列表（无时间为 NaN）, 通道标签列表)"""
+        # findall 在以换行结尾的数据块末尾会多返回一个空匹配，只取实际行数
+        found = self.line_regex.findall(buffer, start, end)[:line_count]
+        nan = math.nan
+        parse_seconds = self.parse_seconds
+        timestamps = []
+        for token in found:
+            seconds = parse_seconds(token.decode('ascii')) if token else None
+            timestamps.append(nan if seconds is None else seconds)
+        tags = _LINE_CHANNEL_RE.findall(buffer, start, end)[:line_count]
+        return timestamps, tags
+
+    def find_baselines(self, log_file, start, end=None):
+        """[start, end) 字节范围内的校时点；绝对时间格式只有文件开头的虚拟校时点"""
+        return [(0, 0.0, NAIVE_EPOCH)] if start == 0 else []
+
+
+@register_timestamp_format
+class RelativeTimestampFormat(TimestampFormat):
+    """[ssss.mmm] 相对时间戳 + TIME[0] [YYYY/MM/DD HH:MM:SS] 校时行（本工具原有的格式）"""
+
+    name = "relative_time0"
+    label = "[ssss.mmm] + TIME[0] 校时"
+
+    def __init__(self, log_file=None):
+        self.parser = LogTimestampParser()
+
+    def parse_seconds(self, line):
+        return self.parser.parse_relative(line)
+
+    def parse(self, line):
+        return self.parser.parse(line)
+
+    def scan_line_fields(self, buffer, start, end, line_count):
+        found = _LINE_FIELDS_RE.findall(buffer, start, end)[:line_count]
+        nan = math.nan
+        return [float(ts) if ts else nan for ts, _ in found], [tag for _, tag in found]
+
+    def find_baselines(self, log_file, start, end=None):
+        """直接在原始字节上定位 TIME[0] 所在行，只解码这些行"""
+        candidates = list(log_file.find_lines_containing(b"TIME[0]", start, end))
+        timestamps, datetimes = self.parser.parse_block([log_file.get_line(idx) for idx in candidates])
+        return [(idx, ts, dt) for idx, ts, dt in zip(candidates, timestamps, datetimes)
+                if ts == ts and dt is not None]
+
+
+_ISO_TIMESTAMP_RE = re.compile(r'(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2}):(\d{2})(?:[.,](\d{1,9}))?')
+
+
+@register_timestamp_format
+class IsoTimestampFormat(TimestampFormat):
+    """ISO-8601: 2025-07-22T19:15:02.123（T 或空格分隔；时区后缀忽略，按写入的本地时间显示）"""
+
+    name = "iso8601"
+    label = "ISO-8601"
+    line_regex = re.compile(rb'^(?:[^\n]*?(\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d{1,9})?))?[^\n]*',
+                            re.M)
+
+    def __init__(self, log_file=None):
+        self._memo = {}
+
+    def parse_seconds(self, line):
+        match = _ISO_TIMESTAMP_RE.search(line)
+        if match is None:
+            return None
+        key = match.group(0)[:19]
+        seconds = self._memo.get(key)
+        if seconds is None:
+            try:
+                dt = datetime(*map(int, match.group(1, 2, 3, 4, 5, 6)))
+            except ValueError:
+                return None
+            if len(self._memo) >= TIMESTAMP_MEMO_SIZE:
+                self._memo.clear()
+            seconds = self._memo[key] = (dt - NAIVE_EPOCH).total_seconds()
+        fraction = match.group(7)
+        return seconds + float('0.' + fraction) if fraction else seconds
+
+
+_SYSLOG_MONTHS = {name: i for i, name in enumerate(
+    ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'), 1)}
+_SYSLOG_TIMESTAMP_RE = re.compile(r'^(?:<\d{1,3}>)?([A-Z][a-z]{2}) {1,2}(\d{1,2}) (\d{2}):(\d{2}):(\d{2})')
+
+
+@register_timestamp_format
+class SyslogTimestampFormat(TimestampFormat):
+    """syslog: 行首 Mon DD HH:MM:SS（可带 <PRI>），年份取文件的修改时间"""
+
+    name = "syslog"
+    label = "syslog (Mon DD HH:MM:SS)"
+    line_regex = re.compile(rb'^(?:(?:<\d{1,3}>)?([A-Z][a-z]{2} {1,2}\d{1,2} \d{2}:\d{2}:\d{2}))?[^\n]*', re.M)
+
+    def __init__(self, log_file=None):
+        try:
+            self.year = datetime.fromtimestamp(os.path.getmtime(log_file.source_path)).year
+        except (AttributeError, OSError, TypeError):
+            self.year = datetime.now().year
+        self._memo = {}
+
+    def parse_seconds(self, line):
+        match = _SYSLOG_TIMESTAMP_RE.match(line)
+        if match is None:
+            return None
+        key = match.group(0)
+        seconds = self._memo.get(key)
+        if seconds is None:
+            month = _SYSLOG_MONTHS.get(match.group(1))
+            if month is None:
+                return None
+            try:
+                dt = datetime(self.year, month, *map(int, match.group(2, 3, 4, 5)))
+            except ValueError:
+                return None
+            if len(self._memo) >= TIMESTAMP_MEMO_SIZE:
+                self._memo.clear()
+            seconds = self._memo[key] = (dt - NAIVE_EPOCH).total_seconds()
+        return seconds
+
+
+_EPOCH_MS_RE = re.compile(r'^\[?(\d{13})(?!\d)')
+
+
+@register_timestamp_format
+class EpochMillisFormat(TimestampFormat):
+    """行首的 13 位 Unix 毫秒时间戳（可带 [），按本机时区换算为本地时间"""
+
+    name = "epoch_ms"
+    label = "Unix 毫秒时间戳"
+    line_regex = re.compile(rb'^(?:\[?(\d{13})(?!\d))?[^\n]*', re.M)
+
+    def __init__(self, log_file=None):
+        self._hour_offsets = {}
+
+    def _local_seconds(self, epoch):
+        # 本地时间与 UTC 的差按小时缓存（夏令时切换都在整点）
+        hour = int(epoch // 3600)
+        offset = self._hour_offsets.get(hour)
+        if offset is None:
+            offset = (datetime.fromtimestamp(hour * 3600) - NAIVE_EPOCH).total_seconds() - hour * 3600
+            self._hour_offsets[hour] = offset
+        return epoch + offset
+
+    def parse_seconds(self, line):
+        match = _EPOCH_MS_RE.match(line)
+        if match is None:
+            return None
+        return self._local_seconds(int(match.group(1)) / 1000)
+
+
+def create_timestamp_format(name, log_file=None):
+    """按名称创建时间戳格式（未知名称使用原有的相对时间戳格式）"""
+    return TIMESTAMP_FORMATS.get(name, RelativeTimestampFormat)(log_file)
+
+
+def detect_timestamp_format(sample_lines, log_file=None):
+    """用文件开头的样本行为每种已注册格式打分，选出能解析最多行的格式
+    得分相同按注册顺序；都低于 TIMESTAMP_DETECT_MIN_SCORE 时使用原有格式
+    """
+    best, best_score = None, TIMESTAMP_DETECT_MIN_SCORE
+    for cls in TIMESTAMP_FORMATS.values():
+        candidate = cls(log_file)
+        score = candidate.score(sample_lines)
+        if score > best_score or (best is None and score >= best_score):
+            best, best_score = candidate, score
+    return best if best is not None else RelativeTimestampFormat(log_file)
+
+
+class TimeBaselineTable:
+    """TIME[0] 校时点表
+
+    校时点的行号、相对时间戳、完整日期时间存为按行号升序的平行数组。lookup 用
+    bisect 在 O(log n) 内找到某行适用的校时点（行之前最近的；文件开头尚无校时点
+    的行使用第一个）。datetimes / absolute_times 一次推算一组升序行的时间：按校时
+    区间分段，每进入一个新区间才做一次二分查找。
+    """
+
+    def __init__(self, baselines=()):
+        baselines = list(baselines)
+        self.line_idxs = array('Q', (idx for idx, _, _ in baselines))
+        self.base_ts = array('d', (ts for _, ts, _ in baselines))
+        self.base_dts = [dt for _, _, dt in baselines]
+
+    def __len__(self):
+        return len(self.line_idxs)
+
+    def segment_of(self, line_idx):
+        """该行适用的校时点序号；没有校时点时返回 -1"""
+        if not self.line_idxs:
+            return -1
+        return max(0, bisect_right(self.line_idxs, line_idx) - 1)
+
+    def lookup(self, line_idx):
+        """返回 (baseline_line_idx, base_ts, base_dt) 或 None"""
+        seg = self.segment_of(line_idx)
+        if seg < 0:
+            return None
+        return self.line_idxs[seg], self.base_ts[seg], self.base_dts[seg]
+
+    def is_baseline(self, line_idx):
+        i = bisect_left(self.line_idxs, line_idx)
+        return i < len(self.line_idxs) and self.line_idxs[i] == line_idx
+
+    def _segments(self, line_indexes):
+        """对升序行号逐个给出所在校时区间的序号"""
+        line_idxs = self.line_idxs
+        count = len(line_idxs)
+        seg = -1
+        next_boundary = -1
+        for i in line_indexes:
+            if i >= next_boundary:
+                seg = self.segment_of(i)
+                next_boundary = line_idxs[seg + 1] if seg + 1 < count else math.inf
+            yield i, seg
+
+    def datetimes(self, line_indexes, line_timestamps):
+        """升序行号（0-based）对应的完整日期时间列表；没有相对时间戳或没有校时点的行为 None"""
+        if not self.line_idxs:
+            return [None] * len(line_indexes)
+        base_ts = self.base_ts
+        base_dts = self.base_dts
+        known = len(line_timestamps)
+        result = []
+        for i, seg in self._segments(line_indexes):
+            ts = line_timestamps[i] if i < known else math.nan
+            if ts != ts:
+                result.append(None)
+            else:
+                result.append(base_dts[seg] + timedelta(seconds=ts - base_ts[seg]))
+        return result
+
+    def absolute_times(self, line_timestamps, first_line=0):
+        """第 first_line 行起全部行的绝对时间（epoch 秒，array('d')，无法推算为 NaN）
+        每行先推算出本地时间，再按该行所在整点的 UTC 偏移换算（偏移按整点缓存）
+        """
+        count = len(line_timestamps)
+        if not self.line_idxs:
+            return array('d', [math.nan]) * max(0, count - first_line)
+        times = array('d')
+        hour_offsets = {}
+        starts = [0] + list(self.line_idxs[1:]) + [count]
+        for seg, (start, end) in enumerate(zip(starts, starts[1:])):
+            start = max(start, first_line)
+            if start >= end:
+                continue
+            # 本段的行相对 NAIVE_EPOCH 的本地秒数 = ts + local_base
+            local_base = (self.base_dts[seg] - NAIVE_EPOCH).total_seconds() - self.base_ts[seg]
+            local_times = [ts + local_base for ts in line_timestamps[start:end]]
+            known = [t for t in local_times if t == t]
+            if not known:
+                times.extend(local_times)
+                continue
+            lo_hour, hi_hour = min(known) // 3600, max(known) // 3600
+            for hour in (lo_hour, hi_hour):
+                if hour not in hour_offsets:
+                    hour_offsets[hour] = local_utc_offset(int(hour))
+            if hour_offsets[lo_hour] == hour_offsets[hi_hour] and hi_hour - lo_hour <= TIME_OFFSET_STABLE_HOURS:
+                # 本段不跨夏令时切换（常见情况）：整段使用同一个偏移
+                offset = hour_offsets[lo_hour]
+                times.extend([t - offset for t in local_times])  # NaN 保持为 NaN
+                continue
+            for hour in {t // 3600 for t in known}:
+                if hour not in hour_offsets:
+                    hour_offsets[hour] = local_utc_offset(int(hour))
+            get_offset = hour_offsets.get
+            times.extend([t - get_offset(t // 3600, 0.0) for t in local_times])
+        return times
+
+
+class LineTimeIndex:
+    """逐行绝对时间索引
+
+    由逐行相对时间戳 [ssss.mmm] 和 TIME[0] 校时点一次性算出每行的绝对时间
+    （epoch 秒，array('d')，无法推算的行为 NaN），推算规则与 calculate_time_info
+    相同：使用行之前最近的校时点，文件开头尚无校时点的行使用第一个校时点。
+    校时可能让时间回退，因此另外保存前缀最大值与后缀最小值两条单调包络，
+    用二分查找得到时间窗口必然所在的行范围。
+    """
+
+    def __init__(self, line_timestamps, baselines):
+        times = TimeBaselineTable(baselines).absolute_times(line_timestamps)
+        self.times = times
+        # NaN 不参与包络：前缀最大值中视为 -inf，后缀最小值中视为 +inf
+        self._prefix_max = array('d', accumulate((-math.inf if t != t else t for t in times), max))
+        suffix_min = array('d', accumulate((math.inf if t != t else t for t in reversed(times)), min))
+        suffix_min.reverse()
+        self._suffix_min = suffix_min
+
+    def extend(self, line_timestamps, baselines, first_line):
+        """跟随模式：丢弃 first_line 行起的旧值，追加这些行新算出的绝对时间
+        first_line 之前行适用的校时点不能改变（新的校时点都在 first_line 之后）
+        """
+        del self.times[first_line:]
+        del self._prefix_max[first_line:]
+        del self._suffix_min[first_line:]
+        new_times = TimeBaselineTable(baselines).absolute_times(line_timestamps, first_line)
+        self.times.extend(new_times)
+        last_max = self._prefix_max[-1] if self._prefix_max else -math.inf
+        self._prefix_max.extend(accumulate((-math.inf if t != t else t for t in new_times), max, initial=last_max))
+        del self._prefix_max[first_line]  # accumulate 的初始值
+        suffix_min = array('d', accumulate((math.inf if t != t else t for t in reversed(new_times)), min))
+        suffix_min.reverse()
+        # 旧行的后缀最小值还要与新行取最小；通常时间递增，循环立即结束
+        new_min = suffix_min[0] if suffix_min else math.inf
+        old = self._suffix_min
+        i = len(old) - 1
+        while i >= 0 and old[i] > new_min:
+            old[i] = new_min
+            i -= 1
+        old.extend(suffix_min)
+
+    def __len__(self):
+        return len(self.times)
+
+    @property
+    def has_times(self):
+        return bool(self._prefix_max) and self._prefix_max[-1] != -math.inf
+
+    @property
+    def merge_keys(self):
+        """多文件按时间归并时每行的排序键：前缀最大值（单调不减，没有时间的行沿用前一行）"""
+        return self._prefix_max
+
+    def line_range(self, start_time, end_time):
+        """时间在 [start_time, end_time] 内的行必然位于返回的 [lo, hi) 行范围中"""
+        lo = bisect_left(self._prefix_max, start_time)
+        hi = bisect_right(self._suffix_min, end_time)
+        return lo, max(lo, hi)
+
+    def first_date(self):
+        """第一个有时间的行的日期（只写时分秒的时间窗口用它补全日期）"""
+        for t in self.times:
+            if t == t:
+                return datetime.fromtimestamp(t).date()
+        return None
+
+    def in_window(self, line_idx, start_time, end_time):
+        """行时间在窗口内，或该行没有时间（如多行日志的续行）"""
+        t = self.times[line_idx] if line_idx < len(self.times) else math.nan
+        return t != t or start_time <= t <= end_time
+
+
+# 时间窗口输入支持的格式（只有时分秒时日期取自第一个 TIME[0] 校时点）
+TIME_WINDOW_FORMATS = ('%Y/%m/%d %H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y/%m/%d %H:%M', '%Y-%m-%d %H:%M')
+TIME_WINDOW_TIME_FORMATS = ('%H:%M:%S', '%H:%M')
+
+
+def parse_time_window_value(text, default_date=None):
+    """解析时间窗口的一端，返回 (datetime, 是否只给出了时分秒)；空输入返回 (None, False)"""
+    text = text.strip()
+    if not text:
+        return None, False
+    for fmt in TIME_WINDOW_FORMATS:
+        try:
+            return datetime.strptime(text, fmt), False
+        except ValueError:
+            continue
+    for fmt in TIME_WINDOW_TIME_FORMATS:
+        try:
+            parsed = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        if default_date is None:
+            raise ValueError(f"只有时分秒时需要 TIME[0] 校时点确定日期: {text}")
+        return datetime.combine(default_date, parsed.time()), True
+    raise ValueError(f"无法识别的时间: {text} (支持 YYYY/MM/DD HH:MM:SS 或 HH:MM:SS)")
+
+
+# 三元组索引：每个数据块包含的行数，以及出现在超过该比例数据块中的"常见三元组"
+# （过滤效果很差，不保存倒排表）
+TRIGRAM_BLOCK_LINES = 256
+TRIGRAM_COMMON_RATIO = 0.5
+
+# 正则量词：{m} / {m,} / {,n} / {m,n}，可带惰性 ? 或占有 + 后缀
+_REGEX_BRACE_QUANTIFIER_RE = re.compile(r'\{(\d*)(,?)(\d*)\}[?+]?')
+
+
+def _skip_regex_class(pattern, i):
+    """i 指向 '['，返回字符类结束 ']' 之后的位置"""
+    i += 1
+    if i < len(pattern) and pattern[i] == '^':
+        i += 1
+    if i < len(pattern) and pattern[i] == ']':
+        i += 1  # 开头的 ] 是普通字符
+    while i < len(pattern) and pattern[i] != ']':
+        i += 2 if pattern[i] == '\\' else 1
+    return i + 1
+
+
+def _skip_regex_group(pattern, i):
+    """i 指向 '('，返回配对 ')' 之后的位置"""
+    depth = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\':
+            i += 2
+            continue
+        if c == '[':
+            i = _skip_regex_class(pattern, i)
+            continue
+        if c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return i
+
+
+def _skip_regex_escape(pattern, i):
+    """i 指向 '\\'，返回 (转义表示的普通字符或 None, 转义之后的位置)"""
+    c = pattern[i + 1]
+    if not c.isalnum():
+        return c, i + 2  # \. \[ \\ 等标点转义就是字符本身
+    i += 2
+    if c == 'x':
+        i += 2
+    elif c == 'u':
+        i += 4
+    elif c == 'U':
+        i += 8
+    elif c == 'N':
+        i = pattern.find('}', i) + 1
+    elif c.isdigit():
+        while i < len(pattern) and pattern[i].isdigit():
+            i += 1  # 反向引用或八进制转义
+    return None, i
+
+
+def _parse_regex_quantifier(pattern, i):
+    """返回 (量词之后的位置, 是否有量词, 是否允许出现 0 次)"""
+    if i >= len(pattern):
+        return i, False, False
+    c = pattern[i]
+    if c in '*+?':
+        end = i + 1
+        if end < len(pattern) and pattern[end] in '?+':
+            end += 1
+        return end, True, c != '+'
+    if c == '{':
+        m = _REGEX_BRACE_QUANTIFIER_RE.match(pattern, i)
+        if m and (m.group(1) or m.group(3)):
+            return m.end(), True, not m.group(1) or int(m.group(1)) == 0
+    return i, False, False
+
+
+def extract_regex_literals(pattern):
+    """提取正则匹配成功时必然出现在行中的字面量片段
+
+    只做保守分析：分组、字符类、元字符和可选字符都视为断点，分组内容不参与；
+    顶层出现 | 或者使用内联标志（可能改变大小写/空白语义）时无法确定，返回 []。
+    pattern 须已能被 re.compile 编译。
+    """
+    literals = []
+    run = []
+
+    def flush():
+        if run:
+            literals.append(''.join(run))
+            run.clear()
+
+    i = 0
+    n = len(pattern)
+    while i < n:
+        c = pattern[i]
+        char = None
+        if c == '\\':
+            char, i = _skip_regex_escape(pattern, i)
+        elif c == '[':
+            i = _skip_regex_class(pattern, i)
+        elif c == '(':
+            if pattern.startswith('(?', i) and pattern[i + 2:i + 3] not in (':', '=', '!', '<', 'P', '#', '('):
+                return []  # (?i) / (?x) 等内联标志
+            i = _skip_regex_group(pattern, i)
+        elif c == '|':
+            return []
+        elif c in '.^$':
+            i += 1
+        else:
+            char = c
+            i += 1
+        i, quantified, optional = _parse_regex_quantifier(pattern, i)
+        if char is not None and not optional:
+            run.append(char)
+        if char is None or quantified:
+            flush()
+    flush()
+    return literals
+
+
+class TrigramIndex:
+    """块级三元组(trigram)倒排索引
+
+    以 TRIGRAM_BLOCK_LINES 行为一个数据块，记录每个 3 字节片段出现在哪些数据块中。
+    查询时先用关键字（正则则用 extract_regex_literals 提取的字面量）的三元组求出
+    候选数据块，再只对候选块中的行用匹配器验证，结果与全量扫描一致。
+
+    - 索引建立在按 ASCII 转小写的原始字节上；含非 ASCII 字符的数据块额外加入
+      Unicode 小写形式的三元组，因此区分/不区分大小写的查询都能使用
+    - 倒排表保存为数据块编号的 array（块数不超过 65536 时每项 2 字节），出现在
+      过半数据块中的常见三元组不保存倒排表，查询时视为不能缩小范围
+    - 不能严格按 UTF-8 解码的数据块（解码时会丢弃字节）总是作为候选
+    """
+
+    def __init__(self, log_file, block_lines=TRIGRAM_BLOCK_LINES):
+        self.log_file = log_file
+        self.block_lines = block_lines
+        self.line_count = 0  # 已建立索引的行数
+        self.block_count = 0
+        self.postings = {}  # 三元组(bytes) -> 数据块编号 array
+        self.common_trigrams = set()
+        self.non_ascii_blocks = []  # 含非 ASCII 字符的数据块
+        self.undecodable_blocks = []  # 不能严格解码的数据块，查询时总是候选
+        self.build_seconds = 0.0
+        self.size_bytes = 0
+
+    def build(self, cancel_event=None):
+        """扫描整个文件建立索引；cancel_event 被设置时返回 False"""
+        start_time = time.perf_counter()
+        log_file = self.log_file
+        buffer = log_file._buffer
+        offsets = log_file.offsets
+        encoding = log_file.encoding
+        line_count = len(log_file)
+        block_lines = self.block_lines
+        lists = {}
+        for block, first in enumerate(range(0, line_count, block_lines)):
+            if cancel_event is not None and cancel_event.is_set():
+                return False
+            raw = buffer[offsets[first]:offsets[min(first + block_lines, line_count)]]
+            text = raw.lower()
+            grams = set(zip(text, text[1:], text[2:]))
+            if not raw.isascii():
+                self.non_ascii_blocks.append(block)
+                try:
+                    folded = raw.decode(encoding).lower().encode(encoding)
+                    grams.update(zip(folded, folded[1:], folded[2:]))
+                except UnicodeError:
+                    self.undecodable_blocks.append(block)
+            for gram in grams:
+                blocks = lists.get(gram)
+                if blocks is None:
+                    lists[gram] = blocks = []
+                blocks.append(block)
+            if block % 64 == 0:
+                time.sleep(0)  # 让出 GIL，保持界面响应
+
+        self.block_count = -(-line_count // block_lines)
+        self.line_count = line_count
+        typecode = 'H' if self.block_count <= 0x10000 else 'I'
+        common_limit = self.block_count * TRIGRAM_COMMON_RATIO
+        size = 0
+        for gram, blocks in lists.items():
+            key = bytes(gram)
+            if len(blocks) > common_limit:
+                self.common_trigrams.add(key)
+            else:
+                self.postings[key] = compact = array(typecode, blocks)
+                size += len(compact) * compact.itemsize
+        self.size_bytes = size + sys.getsizeof(self.postings) + len(self.postings) * 40
+        self.build_seconds = time.perf_counter() - start_time
+        return True
+
+    def truncate(self, line_count):
+        """跟随模式：第 line_count 行起的内容变了，这些行改为总是扫描"""
+        self.line_count = min(self.line_count, line_count)
+
+    def _literal_blocks(self, literal):
+        """包含该字面量全部三元组的候选块集合；无法缩小范围返回 None"""
+        data = literal.encode(self.log_file.encoding, errors='ignore').lower()
+        candidates = None
+        for gram in sorted({data[i:i + 3] for i in range(len(data) - 2)},
+                           key=lambda g: len(self.postings.get(g, ())) if g not in self.common_trigrams else 1 << 62):
+            if gram in self.common_trigrams:
+                break  # 已按倒排表长度排序，之后都是常见三元组
+            blocks = self.postings.get(gram, ())
+            candidates = set(blocks) if candidates is None else candidates.intersection(blocks)
+            if not candidates:
+                return set()
+        return candidates
+
+    def candidate_blocks(self, matcher):
+        """根据匹配器求候选数据块（升序列表）；索引无法缩小范围时返回 None"""
+        if isinstance(matcher, AhoCorasickMatcher) and matcher.logic == "AND":
+            return None  # 各关键字命中计数需要完整扫描
+        if isinstance(matcher, QueryMatcher):
+            candidates = matcher.root.index_blocks(self, matcher.case_sensitive)
+            if candidates is None:
+                return None
+            candidates.update(self.undecodable_blocks)
+            return sorted(candidates)
+        per_keyword = []
+        for keyword in matcher._needles:
+            literals = extract_regex_literals(keyword) if matcher.use_regex else [keyword]
+            blocks = None
+            for literal in literals:
+                literal_blocks = self._literal_blocks(literal)
+                if literal_blocks is not None:
+                    blocks = literal_blocks if blocks is None else blocks & literal_blocks
+            if blocks is not None and matcher.use_regex and not matcher.case_sensitive:
+                # IGNORECASE 的 Unicode 大小写等价无法由字节三元组保证
+                blocks.update(self.non_ascii_blocks)
+            per_keyword.append(blocks)
+
+        if matcher.logic == "AND":
+            narrowed = [blocks for blocks in per_keyword if blocks is not None]
+            if not narrowed:
+                return None
+            candidates = set.intersection(*narrowed)
+        else:
+            if not per_keyword or any(blocks is None for blocks in per_keyword):
+                return None
+            candidates = set().union(*per_keyword)
+        candidates.update(self.undecodable_blocks)
+        return sorted(candidates)
+
+    def scan(self, matcher):
+        """用索引缩小范围后验证，返回 (结果列表, 验证的行数)；无法缩小范围时返回 None"""
+        blocks = self.candidate_blocks(matcher)
+        if blocks is None:
+            return None
+        # 相邻的候选块合并为连续的行范围
+        ranges = []
+        for block in blocks:
+            start = block * self.block_lines
+            end = min(start + self.block_lines, self.line_count)
+            if ranges and ranges[-1][1] == start:
+                ranges[-1][1] = end
+            else:
+                ranges.append([start, end])
+        if self.line_count < len(self.log_file):
+            ranges.append([self.line_count, len(self.log_file)])  # 索引之后新增的行
+
+        results = []
+        keyword_counts = None
+        scanned = 0
+        for start, end in ranges:
+            results.extend(matcher.scan_file(self.log_file, start, end))
+            scanned += end - start
+            counts = getattr(matcher, 'keyword_hit_counts', None)
+            if counts is not None:
+                keyword_counts = counts if keyword_counts is None else [a + b for a, b in zip(keyword_counts, counts)]
+        if keyword_counts is not None:
+            matcher.keyword_hit_counts = keyword_counts
+        elif hasattr(matcher, 'keyword_hit_counts'):
+            matcher.keyword_hit_counts = [0] * len(matcher.keywords)
+        return results, scanned
+
+
+class TrigramIndexBuilder(threading.Thread):
+    """在后台线程中为已加载完成的文件建立三元组索引"""
+
+    def __init__(self, log_file):
+        super().__init__(daemon=True)
+        self.index = TrigramIndex(log_file)
+        self.cancel_event = threading.Event()
+        self.finished = False
+        self.error = None
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            if not self.index.build(self.cancel_event):
+                self.index = None
+        except Exception as e:
+            self.error = e
+            self.index = None
+        finally:
+            self.finished = True
+
+
+class LoadedLog:
+    """多文件会话中的一个文件及其独立的行索引、逐行时间戳、校时点与通道索引
+
+    load() 在线程池中执行（压缩日志先解压），与单文件加载一样使用索引缓存。为控制内存，
+    不活跃文件的 mmap 可以被 release() 释放，索引数组保留，再次使用前 ensure_open()
+    重新映射。映射的打开与释放由每个文件的锁保护：后台线程用 pin()/unpin() 固定正在
+    读取的文件，release() 跳过被固定的文件；淘汰（evict_session_buffers）只在 Tk 主线程中进行。
+    """
+
+    def __init__(self, tab_id, source_path):
+        self.tab_id = tab_id
+        self.source_path = source_path
+        self.log_file = None
+        self.timestamp_format = None
+        self.line_timestamps = array('d')
+        self.time_baselines = []
+        self.line_time_index = None
+        self.channel_index = ChannelIndex()
+        self.cache_hit = False
+        self.load_seconds = 0.0
+        self.error = None
+        self.hit_count = None  # 最近一次全部文件搜索的命中数
+        self.last_used = 0.0
+        self._lock = threading.RLock()
+        self._pins = 0  # 正在读取映射的线程/窗口数，大于 0 时不释放
+
+    @property
+    def name(self):
+        return os.path.basename(self.source_path)
+
+    @property
+    def loaded(self):
+        return self.log_file is not None and self.error is None
+
+    @property
+    def mapped_bytes(self):
+        return self.log_file.file_size if self.log_file is not None and self.log_file.is_open else 0
+
+    def load(self, index_cache, decompress_cache):
+        start_time = time.perf_counter()
+        path = self.source_path
+        if is_compressed_log(path):
+            path = decompress_cache.lookup(path)
+            if path is None:
+                decompressor = DecompressWorker(self.source_path, decompress_cache)
+                decompressor.run()
+                if decompressor.error is not None:
+                    raise decompressor.error
+                path = decompressor.output_path
+        log_file = LineIndexedFile(path, build_index=False, source_path=self.source_path)
+        worker = FileLoadWorker(log_file, index_cache=index_cache)
+        worker.run()
+        if worker.error is not None:
+            log_file.close()
+            raise worker.error
+        self.timestamp_format = worker.timestamp_format or RelativeTimestampFormat()
+        self.line_timestamps = worker.line_timestamps
+        self.time_baselines = list(worker.time_baselines)
+        self.line_time_index = worker.line_time_index
+        self.channel_index = worker.channel_index
+        self.cache_hit = worker.cache_hit
+        self.log_file = log_file
+        self.last_used = time.monotonic()
+        self.load_seconds = time.perf_counter() - start_time
+        return self
+
+    def ensure_open(self):
+        """重新映射被淘汰的文件，并记录最近使用时间"""
+        with self._lock:
+            if not self.log_file.is_open:
+                self.log_file.reopen()
+                print(f"📂 重新映射: {self.name}")
+            self.last_used = time.monotonic()
+
+    def pin(self):
+        """映射并固定文件，unpin() 之前不会被 release() 释放（可在后台线程中调用）"""
+        with self._lock:
+            self.ensure_open()
+            self._pins += 1
+
+    def unpin(self):
+        with self._lock:
+            self._pins -= 1
+
+    @property
+    def pinned(self):
+        return self._pins > 0
+
+    def release(self):
+        """释放文件映射，返回是否已释放（被固定的文件不释放）"""
+        with self._lock:
+            if self._pins or self.log_file is None or not self.log_file.is_open:
+                return False
+            self.log_file.close()
+        print(f"🧹 释放文件映射: {self.name}")
+        return True
+
+    def label(self):
+        """会话文件列表中的显示文本"""
+        if self.error is not None:
+            return f"{self.name} (加载失败)"
+        if self.log_file is None:
+            return f"{self.name} (加载中)"
+        if self.hit_count is not None:
+            return f"{self.name} ({self.hit_count} 条)"
+        return f"{self.name} ({len(self.log_file):,} 行)"
+
+
+def evict_session_buffers(entries, keep=(), max_bytes=SESSION_MAX_MAPPED_BYTES):
+    """映射的文件总大小超过上限时，按最近使用时间释放 keep 以外的文件映射
+    只在 Tk 主线程中调用（界面读取文件时不会被释放）；被固定的文件不释放
+    """
+    total = sum(entry.mapped_bytes for entry in entries)
+    for entry in sorted(entries, key=lambda e: e.last_used):
+        if total <= max_bytes:
+            break
+        if entry in keep or entry.pinned or not entry.mapped_bytes:
+            continue
+        size = entry.mapped_bytes
+        if entry.release():
+            total -= size
+
+
+class SessionSearchWorker(threading.Thread):
+    """后台线程：在会话中的每个文件上依次执行同一个查询
+
+    matchers 为 [(LoadedLog, 该文件的匹配器), ...]（行号/时间条件依赖各自的逐行时间戳）。
+    扫描期间固定（必要时重新映射）该文件，不做淘汰：映射上限由界面轮询时在主线程中维持。
+    results 为 {tab_id: 命中行号 array('I')}；file_keys 为 {tab_id: 扫描开始时的
+    SearchResultCache.file_key()}，结果按它存入缓存（扫描的正是这么多行）。
+    """
+
+    def __init__(self, matchers):
+        super().__init__(daemon=True)
+        self.matchers = matchers
+        self.results = {}
+        self.file_keys = {}
+        self.files_done = 0
+        self.cancel_event = threading.Event()
+        self.start_time = time.perf_counter()
+        self.elapsed = 0.0
+        self.finished = False
+        self.error = None
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            for entry, matcher in self.matchers:
+                if self.cancel_event.is_set():
+                    break
+                entry.pin()
+                try:
+                    file_key = SearchResultCache.file_key(entry.log_file)
+                    results = matcher.scan_file(entry.log_file, 0, file_key[1])
+                finally:
+                    entry.unpin()
+                self.file_keys[entry.tab_id] = file_key
+                self.results[entry.tab_id] = array('I', (line_num for line_num, _ in results))
+                self.files_done += 1
+        except Exception as e:
+            self.error = e
+        finally:
+            self.elapsed = time.perf_counter() - self.start_time
+            self.finished = True
+
+
+class _SelectedMergeKeys:
+    """MergedTimeline 中一个文件所选行的排序键序列（按需取值，不复制数组）"""
+
+    __slots__ = ('keys', 'lines')
+
+    def __init__(self, keys, lines):
+        self.keys = keys
+        self.lines = lines
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __getitem__(self, index):
+        return self.keys[self.lines[index]]
+
+
+class MergedTimeline:
+    """多个会话文件按绝对时间 k 路归并后的只读行序列，不生成合并后的副本
+
+    每个文件的排序键取逐行绝对时间的前缀最大值（LineTimeIndex.merge_keys）：单调不减，
+    没有时间的续行跟随前一行，校时回退的行保持在原文件中的顺序；键相同时按文件顺序、行号。
+    在这个全序下，某文件第 j 行之前的合并行数等于其它各文件中排在它前面的行数之和（二分
+    查找），因此 seek(p) 可以对每个文件二分求出从合并位置 p 开始的游标，取第 [start, stop)
+    行时只用 heapq.merge 从这些游标起归并这几十行。
+    selections 为各文件参与归并的行（0-based 升序 array，None 为全部行），用于把各文件
+    的搜索命中同样按时间归并。元素为 (文件序号, 0-based 行号)。
+    """
+
+    def __init__(self, entries, selections=None):
+        self.entries = list(entries)
+        self.selections = list(selections) if selections is not None else [None] * len(self.entries)
+        self.keys = [entry.line_time_index.merge_keys if lines is None
+                     else _SelectedMergeKeys(entry.line_time_index.merge_keys, lines)
+                     for entry, lines in zip(self.entries, self.selections)]
+        self.lengths = [len(keys) for keys in self.keys]
+        self.total = sum(self.lengths)
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, _ = index.indices(self.total)
+            return self.rows(start, stop)
+        if index < 0:
+            index += self.total
+        if not 0 <= index < self.total:
+            raise IndexError("merged timeline index out of range")
+        return self.rows(index, index + 1)[0]
+
+    def _rank(self, file_idx, j):
+        """第 file_idx 个文件的第 j 个所选行在合并序列中的位置"""
+        key = self.keys[file_idx][j]
+        rank = j
+        for other, keys in enumerate(self.keys):
+            if other < file_idx:
+                rank += bisect_right(keys, key)
+            elif other > file_idx:
+                rank += bisect_left(keys, key)
+        return rank
+
+    def seek(self, position):
+        """合并位置 position 之前各文件已经出现的行数（即从 position 开始归并时的游标）"""
+        cursors = []
+        for file_idx, length in enumerate(self.lengths):
+            lo, hi = 0, length
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self._rank(file_idx, mid) < position:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            cursors.append(lo)
+        return cursors
+
+    def _stream(self, file_idx, cursor):
+        keys = self.keys[file_idx]
+        for j in range(cursor, self.lengths[file_idx]):
+            yield keys[j], file_idx, j
+
+    def rows(self, start, stop):
+        """合并序列第 [start, stop) 行：[(文件序号, 0-based 行号), ...]"""
+        start = max(0, start)
+        stop = min(stop, self.total)
+        if stop <= start:
+            return []
+        streams = [self._stream(file_idx, cursor) for file_idx, cursor in enumerate(self.seek(start))]
+        rows = []
+        for _, file_idx, j in islice(heapq.merge(*streams), stop - start):
+            lines = self.selections[file_idx]
+            rows.append((file_idx, j if lines is None else lines[j]))
+        return rows
+
+    def position_of(self, file_idx, line_idx):
+        """第 file_idx 个文件 line_idx 行（0-based）在合并序列中的位置，未被选中时返回 None"""
+        lines = self.selections[file_idx]
+        if lines is None:
+            j = line_idx
+        else:
+            j = bisect_left(lines, line_idx)
+            if j >= len(lines) or lines[j] != line_idx:
+                return None
+        if not 0 <= j < self.lengths[file_idx]:
+            return None
+        return self._rank(file_idx, j)
+
+
+class VirtualResultView:
+    """虚拟化的搜索结果视图
+
+    结果数据只有一份（MatchResults、结果列表或 MergedTimeline 等支持切片的序列），
+    Text 中只渲染视口内的行（每次渲染切片取一次），
+    前两行固定为标题和分隔线；滚动条按结果总数映射，滚动时重新渲染可见行，
+    渲染后调用 on_render 只对这几十行做关键字高亮。
+    """
+
+    HEADER_LINES = 2
+
+    def __init__(self, parent, format_rows, on_render=None):
+        self.format_rows = format_rows
+        self.on_render = on_render
+        self.results = None
+        self.header = ""
+        self.message = ""
+        self.top = 0
+        self.selected = None
+        self.text = tk.Text(parent, height=15, width=50, wrap=tk.NONE)
+        self.scrollbar = tk.Scrollbar(parent, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.text.tag_configure("selected_result",
+            background="#316AC5",  # 蓝色背景
+            foreground="#FFFFFF")  # 白色文字
+        self.text.config(state=tk.DISABLED)  # 设置为只读
+        self._line_height = None
+        self._rendered_rows = None
+        # Text 自身只装得下可见行，滚轮和窗口大小变化都由视图接管
+        self.text.bind('<MouseWheel>', self._on_mouse_wheel)
+        self.text.bind('<Button-4>', lambda e: self.scroll(-3))
+        self.text.bind('<Button-5>', lambda e: self.scroll(3))
+        self.text.bind('<Configure>', self._on_configure)
+
+    def visible_rows(self):
+        """视口能显示的结果行数（不含标题，多算一行部分可见的行）"""
+        if self._line_height is None:
+            self._line_height = max(1, tkfont.Font(font=self.text.cget('font')).metrics('linespace'))
+        height = self.text.winfo_height()
+        if height <= 1:
+            rows = int(self.text.cget('height'))
+        else:
+            rows = height // self._line_height + 1
+        return max(1, rows - self.HEADER_LINES)
+
+    def set_results(self, results, header):
+        """显示新的结果序列（之后 results 原地追加时调用 rows_appended）"""
+        self.results = results
+        self.header = header
+        self.top = 0
+        self.selected = None
+        self.render()
+
+    def set_header(self, header):
+        self.header = header
+        self.render()
+
+    def show_message(self, message):
+        """不显示结果，只显示一段说明文字"""
+        self.results = None
+        self.message = message
+        self.top = 0
+        self.selected = None
+        self.render()
+
+    def rows_appended(self):
+        """结果序列增长后：视口未填满时补画新行，否则只更新滚动条"""
+        if self._rendered_rows is not None and self._rendered_rows < self.visible_rows():
+            self.render()
+        else:
+            self._update_scrollbar()
+
+    def select(self, index):
+        """选中第 index 条结果并滚动到可见"""
+        self.selected = index
+        self.see(index)
+
+    def see(self, index):
+        rows = self.visible_rows() - 1  # 最后一行可能只露出一部分
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + max(1, rows):
+            self.top = index - max(1, rows) + 1
+        self.render()
+
+    def index_at(self, y):
+        """窗口 y 坐标处的结果序号，不在结果行上时返回 None"""
+        if not self.results:
+            return None
+        line = int(self.text.index(f"@0,{y}").split('.')[0])
+        index = self.top + line - self.HEADER_LINES - 1
+        if line > self.HEADER_LINES and index < len(self.results):
+            return index
+        return None
+
+    def yview(self, *args):
+        """滚动条回调：moveto 比例 / scroll n units|pages"""
+        if not self.results:
+            return
+        if args[0] == 'moveto':
+            self.top = int(float(args[1]) * len(self.results))
+            self.render()
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            if args[2] == 'pages':
+                step *= max(1, self.visible_rows() - 1)
+            self.scroll(step)
+
+    def scroll(self, rows):
+        if self.results:
+            self.top += rows
+            self.render()
+        return "break"
+
+    def _on_mouse_wheel(self, event):
+        return self.scroll(-3 if event.delta > 0 else 3)
+
+    def _on_configure(self, event):
+        if self.results and self._rendered_rows != self.visible_rows():
+            self.render()
+
+    def render(self):
+        """重新渲染视口内的结果行"""
+        text = self.text
+        text.config(state=tk.NORMAL)
+        text.delete("1.0", tk.END)
+        if self.results is None:
+            text.insert("1.0", self.message)
+            self._rendered_rows = None
+        else:
+            rows = self.visible_rows()
+            total = len(self.results)
+            self.top = max(0, min(self.top, total - rows + 1))
+            end = min(total, self.top + rows)
+            lines = self.format_rows(self.results[self.top:end])
+            text.insert("1.0", self.header + "\n" + "=" * 40 + "\n" + "\n".join(lines))
+            if self.selected is not None and self.top <= self.selected < end:
+                line = self.selected - self.top + self.HEADER_LINES + 1
+                text.tag_add("selected_result", f"{line}.0", f"{line}.end")
+            self._rendered_rows = rows
+            if self.on_render is not None and lines:
+                self.on_render()
+        text.config(state=tk.DISABLED)
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        total = len(self.results) if self.results else 0
+        if total == 0:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            rows = self.visible_rows()
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + rows) / total))
+
+
 class LogFilterApp:
     """
     日志筛选应用程序主类 - 超级现代化版本
@@ -213,8 +3426,8 @@ class LogFilterApp:
         self.file_content = []
         self.filtered_results = []
         self.keyword_history = []
-        self.tabs = {}
-        self.current_tab_id = None
+        self.tabs = {}  # 多文件会话: tab_id -> LoadedLog（按打开顺序）
+        self.current_tab_id = None  # 当前显示的会话文件
         self.history_file = "search_history.json"  # 历史记录文件
         self.bookmarks_file = "bookmarks.json"  # 书签文件
         self.bookmarks = []  # 书签列表
@@ -229,6 +3442,7 @@ class LogFilterApp:
         self.use_regex = False  # 是否使用正则表达式
         self.multiple_keywords = []  # 多关键字搜索
         self.current_keywords = []  # 当前搜索的关键词列表，用于高亮
+        self.current_matcher = None  # 当前搜索编译后的 KeywordMatcher
         
         # 时间相关变量
         self.base_timestamp = None  # 基准时间戳 (如 03277.850)
@@ -237,6 +3451,64 @@ class LogFilterApp:
         self.has_time_baseline = False  # 是否找到TIME[0]基准行
         # 时间基准列表: [(line_idx, base_ts, base_dt), ...] - 支持多个TIME[0]校时点
         self.time_baselines = []
+
+        # 多进程搜索进程池（首次并行搜索时创建）
+        self._search_pool = None
+        self.search_workers = os.cpu_count() or 1
+
+        # 后台文件加载线程（见 load_file）与行索引旁路缓存
+        self._load_worker = None
+        self.index_cache = IndexCache()
+        # 压缩日志的后台解压线程与解压缓存
+        self._decompress_worker = None
+        self.decompress_cache = DecompressedLogCache()
+
+        # 多文件会话的并行加载线程池、进行中的加载任务与全部文件搜索
+        self._session_pool = None
+        self._session_futures = {}
+        self._detached_loads = []  # 会话清除时仍在执行的加载任务，完成后在主线程中释放
+        self._merged_timeline_entries = []  # 打开的合并时间线窗口固定的会话文件（窗口关闭时释放）
+        self._session_search_worker = None
+        self.line_timestamps = array('d')  # 每行的相对时间戳，无时间戳为 NaN
+        self.baseline_table = TimeBaselineTable()  # time_baselines 的二分查找表
+        self.timestamp_format = RelativeTimestampFormat()  # 当前文件的时间戳格式（加载时自动检测）
+        self.line_time_index = None  # 逐行绝对时间（加载完成后计算），用于时间窗口搜索
+
+        # [Cxx] 通道索引与通道筛选；_search_results 为通道筛选之前的关键字结果
+        self.channel_index = ChannelIndex()
+        self.channel_include = set()
+        self.channel_exclude = set()
+        self._search_results = []
+
+        # 可选的三元组索引（文件加载完成后在后台建立）
+        self.trigram_index = None
+        self._trigram_builder = None
+
+        # 上下文窗口状态：目标行、可滚动范围与已渲染的行区间（见 show_context）
+        self._context_window = None
+        self._context_page_job = None
+        # 已格式化的上下文行（行号 -> 不含 >>> 标记的显示文本）及其有效条件，空闲预取队列
+        self._context_line_cache = OrderedDict()
+        self._context_cache_key = None
+        self._context_prefetch_ranges = []
+        self._context_prefetch_job = None
+
+        # 后台流式搜索线程（见 _start_search_worker）
+        self._search_worker = None
+
+        # 跟随模式（tail -f）：轮询定时器与当前轮询间隔
+        self._follow_job = None
+        self._follow_interval = FOLLOW_POLL_MS
+
+        # 搜索结果 LRU 缓存（按文件身份与规范化查询）
+        self.search_cache = SearchResultCache()
+
+        # 边输入边搜索：防抖定时器与上一次完成的查询
+        self._live_search_job = None
+        self._live_search_text = None
+        self._last_search_spec = None
+        self._last_search_scope = None
+        self._last_search_line_count = 0
         
         # 初始化主题 - 默认使用经典浅色主题
         self.current_theme = 'light'
@@ -322,6 +3594,13 @@ class LogFilterApp:
         # 时间显示切换按钮
         self.time_toggle_button = tk.Button(self.toolbar, text="⏰ 时间列", command=self.toggle_time_display)
         self.time_toggle_button.pack(side=tk.LEFT, padx=(0, 5))
+
+        # 多文件会话：切换当前显示的文件（括号中为全部文件搜索的命中数）
+        self.session_label = tk.Label(self.toolbar, text="📑 会话文件:")
+        self.session_label.pack(side=tk.LEFT, padx=(10, 5))
+        self.session_combo = ttk.Combobox(self.toolbar, width=36, state='disabled')
+        self.session_combo.pack(side=tk.LEFT, padx=(0, 5))
+        self.session_combo.bind('<<ComboboxSelected>>', self.on_session_file_selected)
         
         # 主题切换按钮
         self.theme_button = tk.Button(self.toolbar, text="🌙 暗黑", command=self.toggle_theme)
@@ -340,6 +3619,8 @@ class LogFilterApp:
             ('button', self.export_button),
             ('button', self.history_button),
             ('button', self.time_toggle_button),
+            ('label', self.session_label),
+            ('combobox', self.session_combo),
             ('button', self.theme_button),
             ('button', self.theme_menu_button)
         ])
@@ -357,6 +3638,8 @@ class LogFilterApp:
         self.keyword_combobox.pack(side=tk.LEFT, padx=(5, 5))
         self.keyword_combobox.bind('<Return>', lambda e: self.filter_logs())
         self.keyword_combobox.bind('<Button-1>', self.on_combobox_click)
+        self.keyword_combobox.bind('<KeyRelease>', self.on_keyword_typed)
+        self.keyword_combobox.bind('<<ComboboxSelected>>', self.on_keyword_typed)
         
         # 加载历史记录
         self.load_search_history()
@@ -381,18 +3664,32 @@ class LogFilterApp:
         # 清除按钮 - 一键清空关键字与筛选结果
         self.clear_button = tk.Button(self.search_frame, text="✖ 清除", command=self.clear_search)
         self.clear_button.pack(side=tk.LEFT, padx=(0, 5))
+
+        # 停止按钮 - 中止进行中的搜索并保留已找到的结果
+        self.stop_button = tk.Button(self.search_frame, text="⏹ 停止", command=self.stop_search)
+        self.stop_button.pack(side=tk.LEFT, padx=(0, 5))
         
         # 上下文范围控制
         tk.Label(self.search_frame, text="上下文:").pack(side=tk.LEFT, padx=(10, 0))
         
         self.context_var = tk.StringVar(value=str(self.context_range))
-        self.context_spinbox = tk.Spinbox(self.search_frame, from_=0, to=5000, width=6, 
+        self.context_spinbox = tk.Spinbox(self.search_frame, from_=0, to=10000000, width=8, 
                                          textvariable=self.context_var,
                                          command=self.update_context_range)
         self.context_spinbox.pack(side=tk.LEFT, padx=(5, 5))
         
         # 绑定键盘事件，实现实时更新
         self.context_var.trace('w', self.on_context_change)
+
+        # 时间窗口：只搜索该时间段内的行（留空表示不限）
+        tk.Label(self.search_frame, text="时间:").pack(side=tk.LEFT, padx=(10, 0))
+        self.time_from_entry = tk.Entry(self.search_frame, width=19)
+        self.time_from_entry.pack(side=tk.LEFT, padx=(5, 0))
+        tk.Label(self.search_frame, text="至").pack(side=tk.LEFT, padx=(3, 3))
+        self.time_to_entry = tk.Entry(self.search_frame, width=19)
+        self.time_to_entry.pack(side=tk.LEFT)
+        self.time_from_entry.bind('<Return>', lambda e: self.filter_logs())
+        self.time_to_entry.bind('<Return>', lambda e: self.filter_logs())
         
         # 搜索选项
         self.options_frame = tk.Frame(self.main_frame)
@@ -419,6 +3716,57 @@ class LogFilterApp:
         self.or_radio = tk.Radiobutton(self.options_frame, text="OR(任一匹配)", 
                                       variable=self.logic_var, value="OR")
         self.or_radio.pack(side=tk.LEFT, padx=(10, 0))
+        self.expr_radio = tk.Radiobutton(self.options_frame, text="表达式",
+                                        variable=self.logic_var, value=QUERY_LOGIC_EXPR)
+        self.expr_radio.pack(side=tk.LEFT, padx=(10, 0))
+
+        # 匹配引擎选择（普通文本搜索可使用 AC 自动机）
+        self.engine_var = tk.StringVar(value=MATCH_ENGINE_REGEX)
+        tk.Label(self.options_frame, text="匹配引擎:").pack(side=tk.LEFT, padx=(20, 5))
+        self.regex_engine_radio = tk.Radiobutton(self.options_frame, text="编译正则",
+                                                 variable=self.engine_var, value=MATCH_ENGINE_REGEX)
+        self.regex_engine_radio.pack(side=tk.LEFT)
+        self.ac_engine_radio = tk.Radiobutton(self.options_frame, text="AC自动机",
+                                              variable=self.engine_var, value=MATCH_ENGINE_AHO_CORASICK)
+        self.ac_engine_radio.pack(side=tk.LEFT, padx=(10, 0))
+        self.benchmark_button = tk.Button(self.options_frame, text="⏱ 引擎对比",
+                                          command=self.run_match_engine_benchmark)
+        self.benchmark_button.pack(side=tk.LEFT, padx=(10, 0))
+        self.channel_button = tk.Button(self.options_frame, text="📡 通道",
+                                        command=self.show_channel_filter)
+        self.channel_button.pack(side=tk.LEFT, padx=(10, 0))
+        self.search_all_button = tk.Button(self.options_frame, text="🔎 全部文件",
+                                           command=self.search_all_files)
+        self.search_all_button.pack(side=tk.LEFT, padx=(10, 0))
+        self.merged_timeline_button = tk.Button(self.options_frame, text="🧬 合并时间线",
+                                                command=self.show_merged_timeline)
+        self.merged_timeline_button.pack(side=tk.LEFT, padx=(10, 0))
+
+        # 多进程并行搜索（大文件时按字节范围分给多个进程）
+        self.parallel_var = tk.BooleanVar(value=False)
+        self.parallel_check = tk.Checkbutton(self.options_frame, text="多进程并行",
+                                             variable=self.parallel_var)
+        self.parallel_check.pack(side=tk.LEFT, padx=(10, 0))
+
+        # 三元组索引（加载完成后后台建立，重复搜索时先缩小候选范围）
+        self.trigram_var = tk.BooleanVar(value=False)
+        self.trigram_check = tk.Checkbutton(self.options_frame, text="三元组索引",
+                                            variable=self.trigram_var,
+                                            command=self.on_trigram_toggle)
+        self.trigram_check.pack(side=tk.LEFT, padx=(10, 0))
+
+        # 边输入边搜索（停止输入片刻后自动搜索）
+        self.live_search_var = tk.BooleanVar(value=True)
+        self.live_search_check = tk.Checkbutton(self.options_frame, text="边输入边搜索",
+                                                variable=self.live_search_var)
+        self.live_search_check.pack(side=tk.LEFT, padx=(10, 0))
+
+        # 跟随模式：只读取文件新追加的部分，并在新行上执行当前查询
+        self.follow_var = tk.BooleanVar(value=False)
+        self.follow_check = tk.Checkbutton(self.options_frame, text="跟随文件",
+                                           variable=self.follow_var,
+                                           command=self.on_follow_toggle)
+        self.follow_check.pack(side=tk.LEFT, padx=(10, 0))
         
         # 创建左右分割面板
         self.paned_window = tk.PanedWindow(self.main_frame, orient=tk.HORIZONTAL)
@@ -434,34 +3782,13 @@ class LogFilterApp:
         self.result_display_frame = tk.Frame(self.left_frame)
         self.result_display_frame.pack(fill=tk.BOTH, expand=True)
         
-        # 结果列表
-        self.result_listbox = tk.Listbox(self.result_display_frame, height=15)
-        self.result_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        self.result_listbox.bind('<<ListboxSelect>>', self.on_result_select)
-        
-        # 使用Text组件替代Listbox以支持高亮
-        self.result_text = tk.Text(self.result_display_frame, height=15, width=50, wrap=tk.NONE)
-        self.result_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        # 虚拟化结果视图：Text 只渲染可见行，滚动条按结果总数映射（支持高亮）
+        self.result_view = VirtualResultView(self.result_display_frame, self._format_result_rows,
+                                             on_render=self.highlight_result_keywords)
+        self.result_text = self.result_view.text
+        self.result_scrollbar = self.result_view.scrollbar
         self.result_text.bind('<Button-1>', self.on_result_text_click)
         self.result_text.bind('<Button-3>', self.on_result_text_right_click)  # 右键菜单
-        self.result_text.config(state=tk.DISABLED)  # 设置为只读
-        
-        # 默认显示Text组件，隐藏Listbox
-        self.result_listbox.pack_forget()
-        self.use_text_display = True  # 标记使用Text显示
-        
-        # 添加可拖拽的垂直滚动条到搜索结果区域
-        self.result_scrollbar = tk.Scrollbar(self.result_display_frame, orient=tk.VERTICAL)
-        self.result_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        # 连接滚动条与Text组件
-        self.result_text.config(yscrollcommand=self.result_scrollbar.set)
-        self.result_scrollbar.config(command=self.result_text.yview)
-        
-        # 为Listbox也配置滚动条（备用）
-        self.listbox_scrollbar = tk.Scrollbar(self.result_display_frame, orient=tk.VERTICAL)
-        self.result_listbox.config(yscrollcommand=self.listbox_scrollbar.set)
-        self.listbox_scrollbar.config(command=self.result_listbox.yview)
         
         # 右侧：上下文内容显示
         self.right_frame = tk.Frame(self.paned_window)
@@ -472,6 +3799,8 @@ class LogFilterApp:
         # 上下文显示区域
         self.context_text = scrolledtext.ScrolledText(self.right_frame, height=15)
         self.context_text.pack(fill=tk.BOTH, expand=True)
+        # 上下文只渲染目标行附近的窗口，滚动到边缘时再分页补充（见 _on_context_scroll）
+        self.context_text.config(yscrollcommand=self._on_context_scroll)
         
         # 绑定鼠标事件，实现选中文本高亮相同内容
         self.context_text.bind("<Button-1>", self.on_text_click)
@@ -482,15 +3811,28 @@ class LogFilterApp:
         self.theme_widgets.extend([
             ('frame', self.search_frame),
             ('combobox', self.keyword_combobox),
+            ('entry', self.time_from_entry),
+            ('entry', self.time_to_entry),
             ('button', self.search_button),
             ('button', self.clear_button),
+            ('button', self.stop_button),
             ('frame', self.options_frame),
             ('checkbutton', self.case_check),
             ('checkbutton', self.regex_check),
             ('radiobutton', self.and_radio),
             ('radiobutton', self.or_radio),
+            ('radiobutton', self.expr_radio),
+            ('radiobutton', self.regex_engine_radio),
+            ('radiobutton', self.ac_engine_radio),
+            ('button', self.benchmark_button),
+            ('button', self.channel_button),
+            ('button', self.search_all_button),
+            ('button', self.merged_timeline_button),
+            ('checkbutton', self.parallel_check),
+            ('checkbutton', self.trigram_check),
+            ('checkbutton', self.live_search_check),
+            ('checkbutton', self.follow_check),
             ('text', self.context_text),
-            ('listbox', self.result_listbox),
             ('text', self.result_text)
         ])
     
@@ -521,45 +3863,31 @@ class LogFilterApp:
             # 如果输入无效，恢复到之前的值
             self.context_var.set(str(self.context_range))
     
-    def on_result_select(self, event):
-        """处理结果列表选择事件"""
-        selection = self.result_listbox.curselection()
-        if selection:
-            index = selection[0]
-            self.selected_line_index = index
-            self.show_context(index)
-            if hasattr(self, 'status_label') and self.filtered_results:
-                self.status_label.config(text=f"匹配 {index + 1}/{len(self.filtered_results)}")
-    
     def show_context(self, result_index, preserve_view=False):
-        """显示选中结果的上下文 - 优化：右侧每行都严格用左侧当前选中行的完整日期时间+时间戳差值推算，强制显示完整日期时间格式"""
+        """显示选中结果的上下文 - 右侧每行都用该行对应的 TIME[0] 基准+时间戳差值推算完整日期时间
+
+        只渲染目标行前后 CONTEXT_WINDOW_LINES 行，滚动到边缘时按页补充；
+        context_range 只是可以滚动到的范围上限，因此每次切换的开销与它无关。
+        """
         if not self.filtered_results or result_index >= len(self.filtered_results):
             return
 
         line_num, _ = self.filtered_results[result_index]
 
-        # 保存视图位置
-        current_scroll_fraction = None
-        target_line_relative_pos = None
-        if preserve_view:
+        # 保存视图位置：记录当前视口顶端对应的文件行，重建后滚回同一行
+        keep_top_idx = None
+        if preserve_view and self._context_window is not None:
             try:
-                scroll_info = self.context_text.yview()
-                current_scroll_fraction = scroll_info[0]
-                content = self.context_text.get(1.0, tk.END)
-                lines = content.split('\n')
-                total_lines = len([l for l in lines if l.strip()])
-                for i, line in enumerate(lines):
-                    if line.startswith('>>>'):
-                        target_line_relative_pos = i / max(1, total_lines - 1)
-                        break
+                top_line = int(self.context_text.index("@0,0").split('.')[0])
+                keep_top_idx = self._context_window['start'] + top_line - 1
             except Exception as e:
                 print(f"保存视图状态失败: {e}")
 
-        # 计算上下文范围
-        start_line = max(0, line_num - 1 - self.context_range)
-        end_line = min(len(self.file_content), line_num + self.context_range)
-
-        # 获取左侧当前选中行的原始日志行号、数字时间戳、完整日期时间
+        # 可滚动范围（context_range 为上限）与首次渲染的窗口
+        bound_lo = max(0, line_num - 1 - self.context_range)
+        bound_hi = min(len(self.file_content), line_num + self.context_range)
+        start_line = max(bound_lo, line_num - 1 - CONTEXT_WINDOW_LINES)
+        end_line = min(bound_hi, line_num + CONTEXT_WINDOW_LINES)
 
         # 使用预扫描的基准列表，支持前向/后向最近基准查找
         # 若 current_left_log_line_idx 存在则以其为锚点；否则以当前目标行为锚点
@@ -568,34 +3896,116 @@ class LogFilterApp:
         else:
             anchor_idx = line_num - 1
 
-        base_ts, base_dt, base_idx = None, None, None
-        anchor_base = self._get_baseline_for_line_idx(anchor_idx) if hasattr(self, '_get_baseline_for_line_idx') else None
-        if anchor_base is not None:
-            base_idx, base_ts, base_dt = anchor_base
-        else:
+        anchor_base = self._get_baseline_for_line_idx(anchor_idx)
+        if anchor_base is None and 0 <= anchor_idx < len(self.file_content):
             # 兜底：尝试解析锚点行本身
-            if 0 <= anchor_idx < len(self.file_content):
-                ts, dt, _, _ = self.parse_log_timestamp(self.file_content[anchor_idx].rstrip())
-                base_ts, base_dt, base_idx = ts, dt, anchor_idx
-        debug_info = f"[调试] result_index={result_index}, line_num={line_num}, anchor_idx={anchor_idx}, base_idx={base_idx}, base_ts={base_ts}, base_dt={base_dt}"
-        print(debug_info)
+            ts, dt, _, _ = self.parse_log_timestamp(self.file_content.get_line(anchor_idx).rstrip())
+            if ts is not None and dt is not None:
+                anchor_base = (anchor_idx, ts, dt)
+        print(f"[调试] result_index={result_index}, line_num={line_num}, anchor_idx={anchor_idx}, "
+              f"base={anchor_base}, 窗口=[{start_line + 1}, {end_line}], 范围=[{bound_lo + 1}, {bound_hi}]")
+
+        # 新目标已在当前渲染的窗口内：只移动 >>> 标记和目标行高亮并滚动，不重建
+        window = self._context_window
+        if (not preserve_view and window is not None
+                and window['start'] < line_num <= window['end']
+                and self._context_key(anchor_base) == self._context_cache_key):
+            self._move_context_target(line_num, bound_lo, bound_hi)
+            self._schedule_context_prefetch(result_index)
+            return
 
-        # 清空上下文显示区域
+        self._context_window = {
+            'target': line_num,
+            'bound_lo': bound_lo,
+            'bound_hi': bound_hi,
+            'start': start_line,
+            'end': end_line,
+            'anchor_base': anchor_base,
+        }
+
+        # 一次插入整个窗口
         self.context_text.delete(1.0, tk.END)
-        target_line_index = None
-        context_lines = []
-        for i in range(start_line, end_line):
-            line_content = self.file_content[i].rstrip()
-            line_number = i + 1
+        self.context_text.insert(tk.END, "".join(self._format_context_lines(start_line, end_line)))
+        self.highlight_context_keywords()
+
+        target_line_index = line_num - start_line
+        if keep_top_idx is not None and start_line <= keep_top_idx < end_line:
+            self.context_text.yview(f"{keep_top_idx - start_line + 1}.0")
+        else:
+            self.context_text.see(f"{target_line_index}.0")
+        self._schedule_context_prefetch(result_index)
+
+    def _move_context_target(self, line_num, bound_lo, bound_hi):
+        """在已渲染的上下文窗口内把目标行移到 line_num"""
+        window = self._context_window
+        text = self.context_text
+        old_line = window['target'] - window['start']
+        new_line = line_num - window['start']
+        if window['start'] < window['target'] <= window['end']:
+            text.delete(f"{old_line}.0", f"{old_line}.3")
+            text.insert(f"{old_line}.0", "   ")
+        text.delete(f"{new_line}.0", f"{new_line}.3")
+        text.insert(f"{new_line}.0", ">>>")
+        text.tag_remove("target_line", "1.0", tk.END)
+        text.tag_add("target_line", f"{new_line}.0", f"{new_line}.end")
+        # 可滚动范围随目标移动；已渲染但超出新范围的行保留到被裁掉为止
+        window.update(target=line_num,
+                      bound_lo=min(bound_lo, window['start']),
+                      bound_hi=max(bound_hi, window['end']))
+        text.see(f"{new_line}.0")
+
+    def _format_context_lines(self, start, end):
+        """格式化文件中 [start, end) 行的上下文显示文本（目标行以 >>> 标记）"""
+        window = self._context_window
+        target_idx = window['target'] - 1
+        bodies = self._context_line_bodies(start, end, window['anchor_base'])
+        return [(">>> " if i == target_idx else "    ") + body
+                for i, body in enumerate(bodies, start)]
+
+    def _context_key(self, anchor_base):
+        """格式化结果的有效条件：时间列开关、基准数量；没有任何基准时还取决于锚点基准"""
+        return (self.show_time_column, len(self.time_baselines),
+                None if self.time_baselines else anchor_base)
+
+    def _context_line_bodies(self, start, end, fallback_base):
+        """[start, end) 行不含标记的显示文本，优先取缓存（LRU，上限 CONTEXT_LINE_CACHE_LINES 行）"""
+        cache = self._context_line_cache
+        key = self._context_key(fallback_base)
+        if key != self._context_cache_key:
+            cache.clear()
+            self._context_cache_key = key
+        missing = [i for i in range(start, end) if i not in cache]
+        if missing:
+            first, last = missing[0], missing[-1] + 1
+            # 整段行的绝对时间一次推算（逐行相对时间戳 + 校时点表）
+            if self.show_time_column:
+                datetimes = self.baseline_table.datetimes(range(first, last), self.line_timestamps)
+            else:
+                datetimes = [None] * (last - first)
+            for i, line_content, dt in zip(range(first, last), self.file_content.iter_lines(first, last), datetimes):
+                if i not in cache:
+                    cache[i] = self._format_context_body(i, line_content.rstrip(), fallback_base, dt)
+        bodies = []
+        for i in range(start, end):
+            cache.move_to_end(i)
+            bodies.append(cache[i])
+        while len(cache) > CONTEXT_LINE_CACHE_LINES:
+            cache.popitem(last=False)
+        return bodies
+
+    def _format_context_body(self, i, line_content, fallback_base, dt=None):
+        """第 i 行（0-based）的时间列 + 行号 + 内容；dt 为已推算出的该行时间"""
+        line_number = i + 1
+        if not self.show_time_column:
+            time_display = ""
+        elif dt is not None:
+            time_display = f"[{dt.strftime('%Y/%m/%d %H:%M:%S')}] "
+        else:
+            # 逐行时间戳尚未建立（加载中）或该行没有时间戳：解析该行
             ts, _, _, _ = self.parse_log_timestamp(line_content)
             # 每行使用该行对应的最近基准进行推算（支持多个 TIME[0]）
-            line_base = self._get_baseline_for_line_idx(i) if hasattr(self, '_get_baseline_for_line_idx') else None
-            if line_base is None and base_dt is not None and base_ts is not None:
-                line_base = (base_idx, base_ts, base_dt)
-            if not self.show_time_column:
-                time_display = ""
-            elif line_base is not None and ts is not None:
-                from datetime import timedelta
+            line_base = self._get_baseline_for_line_idx(i) or fallback_base
+            if line_base is not None and ts is not None:
                 try:
                     _, lb_ts, lb_dt = line_base
                     new_datetime = lb_dt + timedelta(seconds=(ts - lb_ts))
@@ -604,44 +4014,97 @@ class LogFilterApp:
                     time_display = "[---.---] "
             else:
                 time_display = "[---.---] "
-            if line_number == line_num:
-                line_display = f">>> {time_display}[{line_number:4d}] {line_content}\n"
-                target_line_index = len(context_lines) + 1
-            else:
-                line_display = f"    {time_display}[{line_number:4d}] {line_content}\n"
-            context_lines.append(line_display)
-            self.context_text.insert(tk.END, line_display)
+        return f"{time_display}[{line_number:4d}] {line_content}\n"
 
-        self.highlight_context_keywords()
+    def _schedule_context_prefetch(self, result_index):
+        """空闲时为上一条/下一条结果的上下文窗口预先格式化行，使键盘导航无需等待"""
+        if self._context_prefetch_job is not None:
+            self.root.after_cancel(self._context_prefetch_job)
+            self._context_prefetch_job = None
+        window = self._context_window
+        ranges = []
+        for neighbor in (result_index + 1, result_index - 1):
+            if 0 <= neighbor < len(self.filtered_results):
+                line_num = self.filtered_results.line_numbers[neighbor] \
+                    if isinstance(self.filtered_results, MatchResults) else self.filtered_results[neighbor][0]
+                lo = max(0, line_num - 1 - self.context_range, line_num - 1 - CONTEXT_WINDOW_LINES)
+                hi = min(len(self.file_content), line_num + self.context_range, line_num + CONTEXT_WINDOW_LINES)
+                if window is not None:
+                    # 已渲染的部分不需要预取
+                    if window['start'] <= lo < window['end']:
+                        lo = window['end']
+                    if window['start'] < hi <= window['end']:
+                        hi = window['start']
+                if lo < hi:
+                    ranges.append((lo, hi))
+        self._context_prefetch_ranges = ranges
+        if ranges:
+            self._context_prefetch_job = self.root.after_idle(self._prefetch_context_step)
 
-        # 恢复视图位置
-        if preserve_view and target_line_index:
-            try:
-                self.context_text.update_idletasks()
-                new_total_lines = len(context_lines)
-                if new_total_lines > 1:
-                    new_target_relative_pos = (target_line_index - 1) / max(1, new_total_lines - 1)
-                    if target_line_relative_pos is not None:
-                        visible_height = self.context_text.winfo_height()
-                        line_height = self.context_text.dlineinfo("1.0")
-                        if line_height:
-                            lines_per_view = visible_height / line_height[3]
-                            target_view_position = target_line_relative_pos * lines_per_view
-                            desired_scroll_top = max(0, (target_line_index - target_view_position) / new_total_lines)
-                            self.context_text.yview_moveto(desired_scroll_top)
-                        else:
-                            scroll_pos = max(0, new_target_relative_pos - 0.3)
-                            self.context_text.yview_moveto(scroll_pos)
-                    else:
-                        scroll_pos = max(0, new_target_relative_pos - 0.4)
-                        self.context_text.yview_moveto(scroll_pos)
-            except Exception as e:
-                print(f"恢复视图位置失败: {e}")
-                if target_line_index:
-                    self.context_text.see(f"{target_line_index}.0")
+    def _prefetch_context_step(self):
+        """每次空闲只格式化 CONTEXT_PREFETCH_STEP_LINES 行，剩余部分在下次空闲时继续"""
+        self._context_prefetch_job = None
+        window = self._context_window
+        if not self._context_prefetch_ranges or window is None:
+            return
+        lo, hi = self._context_prefetch_ranges.pop(0)
+        step_end = min(hi, lo + CONTEXT_PREFETCH_STEP_LINES)
+        self._context_line_bodies(lo, step_end, window['anchor_base'])
+        if step_end < hi:
+            self._context_prefetch_ranges.insert(0, (step_end, hi))
+        if self._context_prefetch_ranges:
+            self._context_prefetch_job = self.root.after_idle(self._prefetch_context_step)
+
+    def _on_context_scroll(self, first, last):
+        """上下文滚动回调：更新滚动条，接近窗口边缘时安排分页补充"""
+        self.context_text.vbar.set(first, last)
+        window = self._context_window
+        if window is None or self._context_page_job is not None:
+            return
+        first, last = float(first), float(last)
+        if (first < CONTEXT_EDGE_FRACTION and window['start'] > window['bound_lo']) or \
+           (last > 1 - CONTEXT_EDGE_FRACTION and window['end'] < window['bound_hi']):
+            self._context_page_job = self.root.after_idle(self._page_context)
+
+    def _page_context(self):
+        """在上下文窗口的顶端或底端补充一页行，超出上限时裁掉另一端，保持视图不跳动"""
+        self._context_page_job = None
+        window = self._context_window
+        if window is None:
+            return
+        text = self.context_text
+        first, last = text.yview()
+        top_line = int(text.index("@0,0").split('.')[0])
+        if first < CONTEXT_EDGE_FRACTION and window['start'] > window['bound_lo']:
+            new_start = max(window['bound_lo'], window['start'] - CONTEXT_PAGE_LINES)
+            added = window['start'] - new_start
+            text.insert("1.0", "".join(self._format_context_lines(new_start, window['start'])))
+            window['start'] = new_start
+            new_lines = (1, added)
+            top_line += added
+            rendered = window['end'] - window['start']
+            excess = rendered - CONTEXT_MAX_RENDERED_LINES
+            if excess > 0:
+                text.delete(f"{rendered - excess + 1}.0", tk.END)
+                window['end'] -= excess
+            text.yview(f"{top_line}.0")
+        elif last > 1 - CONTEXT_EDGE_FRACTION and window['end'] < window['bound_hi']:
+            new_end = min(window['bound_hi'], window['end'] + CONTEXT_PAGE_LINES)
+            text.insert(tk.END, "".join(self._format_context_lines(window['end'], new_end)))
+            added = new_end - window['end']
+            window['end'] = new_end
+            excess = (window['end'] - window['start']) - CONTEXT_MAX_RENDERED_LINES
+            if excess > 0:
+                text.delete("1.0", f"{excess + 1}.0")
+                window['start'] += excess
+                top_line -= excess
+            rendered = window['end'] - window['start']
+            new_lines = (rendered - added + 1, rendered)
+            text.yview(f"{max(1, top_line)}.0")
         else:
-            if target_line_index:
-                self.context_text.see(f"{target_line_index}.0")
+            return
+        # 只高亮新插入的行
+        self.highlight_context_keywords(*new_lines)
     
     def get_highlight_colors(self):
         """根据当前主题获取合适的高亮颜色"""
@@ -651,128 +4114,90 @@ class LogFilterApp:
         else:
             return COLOR_LIST
     
-    def highlight_context_keywords(self):
-        """在上下文中高亮关键字 - 增强版本"""
+    def _current_highlight_patterns(self):
+        """当前查询的高亮正则（来自编译好的匹配器）"""
+        if self.current_matcher is None or not self.current_keywords:
+            return []
+        return self.current_matcher.highlight_patterns
+
+    def _compute_widget_spans(self, widget, patterns, first_line=1, last_line=None):
+        """读取 widget 第 first_line 到 last_line 行的文本（一次 get），在 Python 中计算高亮区间"""
+        end_index = f"{last_line}.end" if last_line is not None else "end-1c"
+        lines = widget.get(f"{first_line}.0", end_index).split("\n")
+        return compute_highlight_spans(patterns, lines, first_line)
+
+    def _apply_keyword_spans(self, widget, spans, tag_prefix):
+        """每个关键字标签只调用一次 tag_add，返回高亮的区间数"""
+        color_list = self.get_highlight_colors()
+        count = 0
+        for pattern_idx, indices in spans.items():
+            tag_name = f"{tag_prefix}{pattern_idx}"
+            color = color_list[pattern_idx % len(color_list)]
+            widget.tag_configure(tag_name, background=color['bg'], foreground=color['fg'])
+            widget.tag_add(tag_name, *indices)
+            count += len(indices) // 2
+        return count
+
+    @staticmethod
+    def _remove_tags(widget, tag_prefix):
+        for tag_name in widget.tag_names():
+            if tag_name.startswith(tag_prefix):
+                widget.tag_remove(tag_name, "1.0", tk.END)
+
+    def highlight_context_keywords(self, first_line=1, last_line=None):
+        """在上下文中高亮关键字和目标行
+
+        高亮区间由匹配器的正则在 Python 中 finditer 得到（正则模式高亮实际匹配的内容），
+        每个标签一次 tag_add。first_line/last_line 指定只处理新分页插入的行。
+        """
         try:
-            # 获取当前搜索的关键词
-            if not hasattr(self, 'current_keywords') or not self.current_keywords:
-                return
-            
-            # 获取搜索选项 - 安全获取，避免在根窗口创建前出错
-            case_sensitive = False
-            try:
-                if hasattr(self, 'case_var') and self.case_var:
-                    case_sensitive = self.case_var.get()
-            except tk.TclError:
-                case_sensitive = False
-            
-            # 清除之前的高亮
-            self.context_text.tag_remove("highlight", "1.0", tk.END)
-            self.context_text.tag_remove("target_line", "1.0", tk.END)
-            
-            # 清除之前的关键词高亮标签
-            color_list = self.get_highlight_colors()
-            for i in range(len(color_list)):
-                self.context_text.tag_remove(f"keyword_{i}", "1.0", tk.END)
-            
-            # 高亮目标行（以>>>开头的行）
-            start_pos = "1.0"
-            while True:
-                pos = self.context_text.search(">>>", start_pos, tk.END)
-                if not pos:
-                    break
-                
-                # 高亮整行
-                line_start = f"{pos.split('.')[0]}.0"
-                line_end = f"{pos.split('.')[0]}.end"
-                self.context_text.tag_add("target_line", line_start, line_end)
-                start_pos = f"{int(pos.split('.')[0]) + 1}.0"
+            start_time = time.perf_counter()
+            text = self.context_text
+            if first_line == 1 and last_line is None:
+                # 清除之前的高亮
+                text.tag_remove("highlight", "1.0", tk.END)
+                text.tag_remove("target_line", "1.0", tk.END)
+                self._remove_tags(text, "keyword_")
+            
+            # 高亮目标行（>>> 行）：位置由上下文窗口直接算出
+            window = self._context_window
+            if window is not None and window['start'] < window['target'] <= window['end']:
+                target_line = window['target'] - window['start']
+                if first_line <= target_line and (last_line is None or target_line <= last_line):
+                    text.tag_add("target_line", f"{target_line}.0", f"{target_line}.end")
             
             # 高亮每个关键词（使用不同颜色）
-            for keyword_idx, keyword in enumerate(self.current_keywords):
-                if not keyword:
-                    continue
-                
-                color_idx = keyword_idx % len(color_list)
-                tag_name = f"keyword_{keyword_idx}"
-                
-                start_pos = "1.0"
-                while True:
-                    pos = self.context_text.search(keyword, start_pos, tk.END, 
-                                                  nocase=not case_sensitive)
-                    if not pos:
-                        break
-                    
-                    end_pos = f"{pos}+{len(keyword)}c"
-                    self.context_text.tag_add(tag_name, pos, end_pos)
-                    start_pos = end_pos
-                
-                # 配置关键词高亮样式
-                self.context_text.tag_configure(tag_name, 
-                    background=color_list[color_idx]['bg'], 
-                    foreground=color_list[color_idx]['fg'])
+            count = 0
+            patterns = self._current_highlight_patterns()
+            if patterns:
+                spans = self._compute_widget_spans(text, patterns, first_line, last_line)
+                count = self._apply_keyword_spans(text, spans, "keyword_")
             
             # 配置目标行高亮样式 - 根据主题调整
             if self.current_theme in ['dark', 'vscode_dark', 'github_dark', 'modern_dark']:
                 # 暗色主题下的目标行样式
-                self.context_text.tag_configure("target_line", 
+                text.tag_configure("target_line", 
                     background="#2D5A87",  # 深蓝色背景
                     foreground="#E6E6E6")  # 亮灰色文字
             else:
                 # 浅色主题下的目标行样式
-                self.context_text.tag_configure("target_line", 
+                text.tag_configure("target_line", 
                     background="#FFE4B5",  # 淡橙色背景
                     foreground="#8B4513")  # 深棕色文字
             
+            if patterns:
+                print(f"🎨 上下文高亮: {count} 处, 用时 {(time.perf_counter() - start_time) * 1000:.1f}ms")
+            
         except Exception as e:
             print(f"上下文高亮失败: {e}")
     
     def parse_log_timestamp(self, line):
-        """解析日志行的时间戳信息
+        """解析日志行的时间戳信息（使用当前文件检测出的时间戳格式）
         返回: (timestamp_float, datetime_obj, has_time_info, is_time_baseline)
         示例: [8948] [03277.850][C01]TIME[0] [2025/07/22 19:15:02] -> (3277.850, datetime_obj, True, True)
         """
         try:
-            timestamp_float = None
-            datetime_obj = None
-            has_time_info = False
-            is_time_baseline = False
-            
-            # 检查是否包含TIME[0]，这是时间基准行
-            if "TIME[0]" in line:
-                is_time_baseline = True
-            
-            # 解析时间戳 [xxxxx.xxx] 格式
-            timestamp_pattern = r'\[(\d+\.\d+)\]'
-            timestamp_match = re.search(timestamp_pattern, line)
-            if timestamp_match:
-                timestamp_float = float(timestamp_match.group(1))
-                has_time_info = True
-            
-            # 解析完整时间，支持多种格式
-            # 格式1: [2025/07/22 18:20:15] (单个空格)
-            # 格式2: [2025/07/22  18:20:15] (多个空格)
-            # 格式3: TIME[0] [2025/07/22 18:20:15] (TIME[0]后有空格)
-            datetime_patterns = [
-                r'\[(\d{4}/\d{2}/\d{2}\s+\d{2}:\d{2}:\d{2})\]',  # 原始模式
-                r'TIME\[0\]\s*\[(\d{4}/\d{2}/\d{2}\s+\d{2}:\d{2}:\d{2})\]',  # TIME[0]后的时间
-                r'(\d{4}/\d{2}/\d{2}\s+\d{2}:\d{2}:\d{2})',  # 没有方括号
-            ]
-            
-            for pattern in datetime_patterns:
-                datetime_match = re.search(pattern, line)
-                if datetime_match:
-                    datetime_str = datetime_match.group(1)
-                    try:
-                        datetime_obj = datetime.strptime(datetime_str, '%Y/%m/%d %H:%M:%S')
-                        has_time_info = True
-                        break
-                    except ValueError:
-                        # 如果格式不匹配，继续尝试下一个模式
-                        continue
-            
-            return timestamp_float, datetime_obj, has_time_info, is_time_baseline
-            
+            return self.timestamp_format.parse(line)
         except Exception as e:
             print(f"时间解析失败: {e}")
             return None, None, False, False
@@ -819,15 +4244,19 @@ class LogFilterApp:
         """预扫描整个文件，构建所有 TIME[0] 基准列表。
         结果存入 self.time_baselines = [(line_idx, base_ts, base_dt), ...] (按 line_idx 升序)
         """
-        self.time_baselines = []
+        baselines = []
         try:
-            for idx, line in enumerate(self.file_content or []):
-                if "TIME[0]" not in line:
-                    continue
-                ts, dt, _, is_base = self.parse_log_timestamp(line)
-                if is_base and ts is not None and dt is not None:
-                    self.time_baselines.append((idx, ts, dt))
+            if self.file_content:
+                baselines = self.timestamp_format.find_baselines(self.file_content, 0)
+        except Exception as e:
+            print(f"构建时间基准失败: {e}")
+        self._apply_time_baselines(baselines)
 
+    def _apply_time_baselines(self, baselines):
+        """设置时间基准列表（按 line_idx 升序）并同步相关状态"""
+        self.time_baselines = baselines
+        self.baseline_table = TimeBaselineTable(baselines)
+        try:
             self.has_time_baseline = len(self.time_baselines) > 0
             if self.has_time_baseline:
                 # 同时设置首个基准，以保持对旧代码的兼容
@@ -846,17 +4275,7 @@ class LogFilterApp:
         优先返回行之前的最近基准；若不存在则返回行之后的最近基准；都没有返回 None。
         返回 (baseline_line_idx, base_ts, base_dt) 或 None。
         """
-        if not self.time_baselines:
-            return None
-        prev_base = None
-        next_base = None
-        for b in self.time_baselines:
-            if b[0] <= line_idx:
-                prev_base = b
-            else:
-                next_base = b
-                break
-        return prev_base if prev_base is not None else next_base
+        return self.baseline_table.lookup(line_idx)
     
     def reset_time_baseline(self):
         """重置时间基准"""
@@ -897,8 +4316,9 @@ class LogFilterApp:
                 title="选择日志文件",
                 initialdir=initial_dir,
                 filetypes=[
-                    ("所有日志文件", "*.log;*.txt;*.out;*.err"),
+                    ("所有日志文件", "*.log;*.txt;*.out;*.err;*.gz;*.bz2;*.xz"),
                     ("日志文件", "*.log"),
+                    ("压缩日志", "*.gz;*.bz2;*.xz"),
                     ("文本文件", "*.txt"),
                     ("输出文件", "*.out"),
                     ("错误文件", "*.err"),
@@ -917,6 +4337,8 @@ class LogFilterApp:
     
     def filter_logs(self):
         """筛选日志 - 增强版本，支持逗号分隔多关键词"""
+        # 回车/F5 立即搜索，取消待执行或进行中的实时搜索
+        self.cancel_live_search()
         keyword_input = self.keyword_entry.get().strip()
         
         print(f"🔍 开始搜索，原始输入: '{keyword_input}'")
@@ -946,81 +4368,547 @@ class LogFilterApp:
                 else:
                     self.time_toggle_button.config(text="⏰ 时间列 (无基准)")
             
-            # 获取搜索选项
-            case_sensitive = self.case_var.get()
-            use_regex = self.regex_var.get()
-            search_logic = self.logic_var.get()  # 获取AND/OR选择
-            
-            # 解析多关键词（逗号分隔）
-            keywords = [k.strip() for k in keyword_input.split(',') if k.strip()]
-            if not keywords:
-                messagebox.showwarning("警告", "请输入有效的关键字")
-                return
-            
-            # 调试信息
-            print(f"🔍 搜索关键词: {keywords}")
-            print(f"📋 关键词数量: {len(keywords)}")
+            search_logic = self.logic_var.get()  # 获取AND/OR/表达式选择
+
+            # 解析多关键词（逗号分隔）；表达式模式下整段输入为查询表达式
+            if search_logic != QUERY_LOGIC_EXPR:
+                keywords = [k.strip() for k in keyword_input.split(',') if k.strip()]
+                if not keywords:
+                    messagebox.showwarning("警告", "请输入有效的关键字")
+                    return
+                # 调试信息
+                print(f"🔍 搜索关键词: {keywords}")
+                print(f"📋 关键词数量: {len(keywords)}")
             print(f"🔗 搜索逻辑: {search_logic}")
             
+            # 一次性编译查询，避免逐行逐关键字重复 re.search / lower
+            try:
+                matcher = self._create_matcher(keyword_input)
+            except re.error as e:
+                messagebox.showerror("正则表达式错误", f"正则表达式语法错误: {e}")
+                return
+            except QuerySyntaxError as e:
+                messagebox.showerror("查询表达式错误", f"查询表达式语法错误: {e}")
+                return
+            except ValueError as e:
+                messagebox.showerror("时间窗口错误", str(e))
+                return
+
             # 存储当前搜索的关键词，用于高亮
-            self.current_keywords = keywords
-            
-            # 筛选包含关键字的行
-            self.filtered_results = []
-            
-            for i, line in enumerate(self.file_content):
-                line_content = line.strip()
-                found = False
-                
-                if use_regex:
-                    # 正则表达式搜索
-                    try:
-                        flags = 0 if case_sensitive else re.IGNORECASE
-                        if search_logic == "AND":
-                            found = all(re.search(keyword, line_content, flags) for keyword in keywords)
-                        else:  # OR
-                            found = any(re.search(keyword, line_content, flags) for keyword in keywords)
-                    except re.error as e:
-                        messagebox.showerror("正则表达式错误", f"正则表达式语法错误: {e}")
-                        return
+            self.current_keywords = matcher.keywords
+            self.current_matcher = matcher
+
+            # 筛选包含关键字的行（相同文件与查询的结果直接取自缓存）
+            search_start = time.perf_counter()
+            if self._restore_cached_search(matcher):
+                search_mode = "结果缓存命中"
+            else:
+                indexed = self.trigram_index.scan(matcher) if self.trigram_index is not None else None
+                if indexed is not None:
+                    self.filtered_results, scanned_lines = indexed
+                    search_mode = f"三元组索引, 验证 {scanned_lines}/{len(self.file_content)} 行"
+                elif self._should_search_in_parallel(matcher):
+                    line_numbers, keyword_counts = parallel_search(
+                        self.file_content, matcher, self._get_search_pool(), self.search_workers * 4)
+                    if keyword_counts is not None:
+                        matcher.keyword_hit_counts = keyword_counts
+                    get_line = self.file_content.get_line
+                    self.filtered_results = [(n, get_line(n - 1).strip()) for n in line_numbers]
+                    search_mode = f"{self.search_workers}进程并行"
                 else:
-                    # 普通文本搜索
-                    search_line = line_content if case_sensitive else line_content.lower()
-                    search_keywords = keywords if case_sensitive else [k.lower() for k in keywords]
-                    
-                    if search_logic == "AND":
-                        # 所有关键词都需要匹配
-                        found = all(search_keyword in search_line for search_keyword in search_keywords)
-                    else:  # OR
-                        # 任意一个关键词匹配即可
-                        found = any(search_keyword in search_line for search_keyword in search_keywords)
-                    
-                    # 调试信息
-                    if found:
-                        print(f"✅ 匹配第 {i+1} 行: {line_content[:50]}...")
-                    elif i < 5:  # 只显示前5行的调试信息
-                        if search_logic == "AND":
-                            missing_keywords = [k for k in search_keywords if k not in search_line]
-                            print(f"❌ 第 {i+1} 行不匹配，缺少关键词: {missing_keywords}")
-                        else:
-                            print(f"❌ 第 {i+1} 行不匹配，无任何关键词")
-                
-                if found:
-                    self.filtered_results.append((i + 1, line_content))
-            
-            print(f"🎯 总共找到 {len(self.filtered_results)} 条匹配结果")
-            
-            # 显示结果
-            self.display_results(keyword_input)
-            
-            # 更新状态
-            self.status_label.config(text=f"找到 {len(self.filtered_results)} 条匹配结果 (关键词: {len(keywords)}个, {search_logic}模式)")
+                    # 全文件扫描交给后台线程，结果分批显示
+                    self._start_search_worker(keyword_input, matcher, search_start, "单线程流式")
+                    self.add_to_search_history(keyword_input)
+                    return
+                self._store_cached_search(matcher)
+                search_mode = f"缓存未命中, {search_mode}"
+            search_elapsed = time.perf_counter() - search_start
+
+            self._show_search_results(keyword_input, matcher, search_mode, search_elapsed)
             
             # 添加到历史记录
             self.add_to_search_history(keyword_input)
             
         except Exception as e:
-            messagebox.showerror("错误", f"筛选失败: {str(e)}")
+            messagebox.showerror("错误", f"筛选失败: {str(e)}")
+
+    def _create_matcher(self, keyword_input, entry=None):
+        """按当前选项编译匹配器；表达式模式下按当前文件采样优化查询计划
+        entry 为会话中的其它文件（LoadedLog）时使用该文件的逐行时间戳与时间索引
+        语法错误以 re.error / QuerySyntaxError 抛出
+        """
+        if entry is None:
+            log_file, timestamps, time_index = self.file_content, self.line_timestamps, self.line_time_index
+        else:
+            log_file, timestamps, time_index = entry.log_file, entry.line_timestamps, entry.line_time_index
+        case_sensitive = self.case_var.get()
+        logic = self.logic_var.get()
+        if logic == QUERY_LOGIC_EXPR:
+            matcher = QueryMatcher(keyword_input, case_sensitive, timestamps)
+        else:
+            keywords = [k.strip() for k in keyword_input.split(',') if k.strip()]
+            matcher = create_keyword_matcher(keywords, case_sensitive, self.regex_var.get(), logic,
+                                             self.engine_var.get())
+        self._apply_time_window(matcher, time_index)
+        if isinstance(matcher, QueryMatcher):
+            if entry is not None:
+                entry.pin()  # 采样需要读取文件内容，被淘汰的文件临时重新映射
+                try:
+                    matcher.optimize(log_file)
+                finally:
+                    entry.unpin()
+            else:
+                matcher.optimize(log_file)
+            print(f"🧭 查询计划: {matcher.plan_text}")
+        return matcher
+
+    def _apply_time_window(self, matcher, time_index):
+        """把时间窗口输入转换为行范围限制（二分查找逐行绝对时间的包络）
+        输入无效时抛出 ValueError
+        """
+        if not hasattr(self, 'time_from_entry'):
+            return
+        from_text = self.time_from_entry.get()
+        to_text = self.time_to_entry.get()
+        if not from_text.strip() and not to_text.strip():
+            return
+        if time_index is None or not time_index.has_times:
+            raise ValueError("当前文件没有可识别的时间戳（或 TIME[0] 校时点），无法按时间筛选")
+        default_date = time_index.first_date()
+        start_dt, start_time_only = parse_time_window_value(from_text, default_date)
+        end_dt, end_time_only = parse_time_window_value(to_text, default_date)
+        if start_dt is not None and end_dt is not None and end_dt < start_dt and end_time_only:
+            end_dt += timedelta(days=1)  # 只写时分秒的窗口跨过午夜
+        start_time = start_dt.timestamp() if start_dt is not None else -math.inf
+        end_time = end_dt.timestamp() if end_dt is not None else math.inf
+        lo, hi = time_index.line_range(start_time, end_time)
+        matcher.restrict_lines(lo, hi, lambda idx: time_index.in_window(idx, start_time, end_time),
+                               ('time', start_time, end_time))
+        print(f"🕐 时间窗口 {start_dt} ~ {end_dt}: 扫描第 {lo + 1}-{hi} 行 (共 {hi - lo} 行)")
+
+    def _show_search_results(self, keyword_input, matcher, search_mode, search_elapsed, displayed=False):
+        """显示 self.filtered_results 并更新状态栏，记录本次查询供细化判断
+        displayed 为 True 时结果已由流式搜索逐批筛选并显示
+        """
+        self.current_keywords = matcher.keywords
+        self.current_matcher = matcher
+        self._last_search_spec = matcher.spec
+        self._last_search_scope = matcher.scope_key
+        self._last_search_line_count = len(self.file_content)
+        print(f"🎯 总共找到 {len(self.filtered_results)} 条匹配结果 ({search_mode}, 用时 {search_elapsed:.3f}s)")
+
+        if not displayed:
+            # 通道筛选：与关键字结果按逐行掩码求交（结果只保留行号，显示时再解码）
+            self._search_results = MatchResults.from_results(self.file_content, self.filtered_results)
+            self.filtered_results = self._apply_channel_filter(self._search_results)
+
+            # 显示结果
+            self.display_results(keyword_input)
+
+        # 更新状态
+        keywords = matcher.keywords
+        status_text = (f"找到 {len(self.filtered_results)} 条匹配结果 (关键词: {len(keywords)}个, {matcher.logic}模式, "
+                       f"{search_mode} {search_elapsed:.2f}s)")
+        cache = self.search_cache
+        status_text += (f" | 结果缓存: 命中 {cache.hits}/未命中 {cache.misses}, "
+                        f"{len(cache)} 条, {cache.total_bytes / 1024:.0f} KB")
+        if self.channel_include or self.channel_exclude:
+            status_text += f" | 通道筛选后保留 {len(self.filtered_results)}/{len(self._search_results)} 条"
+        if matcher.scope_key is not None and matcher.scope_key[0] == 'time':
+            lo, hi = matcher.line_bounds
+            status_text += f" | 时间窗口内 {hi - lo} 行"
+        if self.is_file_loading():
+            status_text += f" - 文件仍在加载，仅搜索了前 {len(self.file_content)} 行"
+        if isinstance(matcher, AhoCorasickMatcher):
+            # AC 自动机在同一次扫描中统计了每个关键字的命中行数
+            hit_summary = ", ".join(f"{k}×{c}" for k, c in zip(keywords, matcher.keyword_hit_counts))
+            print(f"📊 各关键字命中行数: {hit_summary}")
+            status_text += f" | 各关键字命中: {hit_summary}"
+        self.status_label.config(text=status_text)
+
+    def on_keyword_typed(self, event=None):
+        """关键字输入变化时重新开始防抖计时"""
+        if not self.live_search_var.get():
+            return
+        text = self.keyword_combobox.get().strip()
+        if text == self._live_search_text:
+            return  # 方向键、Shift 等不改变内容的按键
+        self.cancel_live_search()
+        self._live_search_text = text
+        self._live_search_job = self.root.after(LIVE_SEARCH_DEBOUNCE_MS, self.live_search)
+
+    def cancel_live_search(self):
+        """取消待执行的实时搜索以及进行中的流式搜索"""
+        if self._live_search_job is not None:
+            self.root.after_cancel(self._live_search_job)
+            self._live_search_job = None
+        self._cancel_search_worker()
+
+    def live_search(self):
+        """实时搜索：查询是上一次的细化时只在已有结果中筛选，否则分段扫描全文件"""
+        self._live_search_job = None
+        keyword_input = self.keyword_combobox.get().strip()
+        placeholder_text = "输入关键字，多个关键字用逗号分隔"
+        if (len(keyword_input) < LIVE_SEARCH_MIN_CHARS or keyword_input == placeholder_text or
+                not self.file_content):
+            return
+        if not any(k.strip() for k in keyword_input.split(',')):
+            return
+        try:
+            matcher = self._create_matcher(keyword_input)
+        except re.error as e:
+            # 输入过程中的正则/表达式往往暂时不完整，只在状态栏提示
+            self.status_label.config(text=f"⚠️ 正则表达式尚不完整: {e}")
+            return
+        except QuerySyntaxError as e:
+            self.status_label.config(text=f"⚠️ 查询表达式尚不完整: {e}")
+            return
+        except ValueError as e:
+            self.status_label.config(text=f"⚠️ {e}")
+            return
+
+        search_start = time.perf_counter()
+
+        if (is_query_refinement(self._last_search_spec, matcher.spec) and
+                self._last_search_scope == matcher.scope_key and
+                self._last_search_line_count == len(self.file_content)):
+            previous_count = len(self._search_results)
+            self.filtered_results = matcher.filter_results(self._search_results)
+            self._store_cached_search(matcher)
+            self._show_search_results(keyword_input, matcher, f"细化查询, 筛选上次 {previous_count} 条结果",
+                                      time.perf_counter() - search_start)
+            return
+
+        if self._restore_cached_search(matcher):
+            self._show_search_results(keyword_input, matcher, "结果缓存命中",
+                                      time.perf_counter() - search_start)
+            return
+
+        indexed = self.trigram_index.scan(matcher) if self.trigram_index is not None else None
+        if indexed is not None:
+            self.filtered_results, scanned_lines = indexed
+            self._store_cached_search(matcher)
+            self._show_search_results(keyword_input, matcher,
+                                      f"缓存未命中, 三元组索引, 验证 {scanned_lines}/{len(self.file_content)} 行",
+                                      time.perf_counter() - search_start)
+            return
+
+        self._start_search_worker(keyword_input, matcher, search_start, "实时搜索")
+
+    def _start_search_worker(self, keyword_input, matcher, search_start, search_mode):
+        """启动后台流式搜索，命中结果分批追加显示"""
+        self._cancel_search_worker()
+        self.current_keywords = matcher.keywords
+        self.current_matcher = matcher
+        self._last_search_spec = None  # 扫描完成前不能作为细化查询的基础
+        self._search_results = MatchResults(self.file_content)
+        self.filtered_results = MatchResults(self.file_content)
+        self._begin_streaming_display()
+        worker = SearchWorker(self.file_content, matcher)
+        worker.context = (keyword_input, search_start, search_mode)
+        self._search_worker = worker
+        worker.start()
+        self.root.after(SEARCH_POLL_MS, self._poll_search_worker, worker)
+
+    def is_searching(self):
+        """是否有流式搜索正在进行"""
+        return self._search_worker is not None and not self._search_worker.finished
+
+    def is_session_searching(self):
+        """是否有全部文件搜索正在进行"""
+        return self._session_search_worker is not None and not self._session_search_worker.finished
+
+    def _cancel_search_worker(self):
+        """放弃进行中的流式搜索（不保留结果，用于开始新的搜索或切换文件）"""
+        worker = self._search_worker
+        self._search_worker = None
+        if worker is not None and not worker.finished:
+            worker.cancel()
+            worker.join(timeout=2.0)
+
+    def stop_search(self):
+        """停止进行中的流式搜索，保留已找到的部分结果"""
+        worker = self._search_worker
+        if worker is None or worker.finished:
+            return False
+        worker.cancel()
+        worker.join(timeout=2.0)
+        self._finish_search_worker(worker)
+        return True
+
+    def _poll_search_worker(self, worker):
+        """取出后台线程送来的结果批次并追加显示（在 Tk 主线程中执行）"""
+        if worker is not self._search_worker:
+            return  # 已被取消或替换
+        self._drain_search_queue(worker)
+        if worker.finished:
+            self._finish_search_worker(worker)
+            return
+        scanned, total, lines_per_sec = worker.progress()
+        self.status_label.config(
+            text=f"🔎 搜索中: 已找到 {len(self.filtered_results):,} 条 | 已扫描 {scanned:,}/{total:,} 行 | "
+                 f"{lines_per_sec:,.0f} 行/s (⏹ 停止 / Esc 保留部分结果)")
+        self.root.after(SEARCH_POLL_MS, self._poll_search_worker, worker)
+
+    def _drain_search_queue(self, worker):
+        while True:
+            try:
+                batch = worker.results_queue.get_nowait()
+            except queue.Empty:
+                break
+            self._append_streamed_results(batch)
+
+    def _finish_search_worker(self, worker):
+        """流式搜索结束（完成或被停止）后的收尾工作"""
+        if worker is self._search_worker:
+            self._search_worker = None
+        self._drain_search_queue(worker)
+        keyword_input, search_start, search_mode = worker.context
+        if worker.error is not None:
+            print(f"筛选失败: {worker.error}")
+            messagebox.showerror("错误", f"筛选失败: {str(worker.error)}")
+            return
+        matcher = worker.matcher
+        if worker.keyword_counts is not None:
+            matcher.keyword_hit_counts = worker.keyword_counts
+        self._finish_streaming_display(keyword_input)
+
+        if worker.cancelled:
+            scanned, total, _ = worker.progress()
+            self.status_label.config(
+                text=f"⏹ 已停止搜索: 保留 {len(self.filtered_results):,} 条部分结果 (已扫描 {scanned:,}/{total:,} 行)")
+            print(f"⏹ 搜索已停止，保留 {len(self.filtered_results)} 条部分结果")
+            return
+
+        self._store_cached_search(matcher, self._search_results)
+        self._show_search_results(keyword_input, matcher, f"缓存未命中, {search_mode}",
+                                  time.perf_counter() - search_start, displayed=True)
+
+    def _begin_streaming_display(self):
+        """清空结果区，等待流式结果"""
+        self.result_view.set_results(self.filtered_results, "🔎 正在搜索...")
+        self._context_window = None
+        self.context_text.delete(1.0, tk.END)
+
+    def _append_streamed_results(self, batch):
+        """追加一批结果（先经过通道筛选）；第一批到达时立即选中第一条并显示上下文"""
+        self._search_results.extend(batch)
+        visible = self._apply_channel_filter(batch)
+        if not visible:
+            return
+        first_batch = not self.filtered_results
+        self.filtered_results.extend(visible)
+        self.result_view.rows_appended()
+        if first_batch:
+            self.selected_line_index = 0
+            self.show_context(0)
+            self.highlight_selected_result_line(0)
+
+    def _finish_streaming_display(self, keyword):
+        """流式显示结束：更新结果数标题并高亮关键字"""
+        if not self.filtered_results:
+            self.display_results(keyword)
+            return
+        self.result_view.set_header(f"找到 {len(self.filtered_results)} 条匹配结果:")
+
+    def _restore_cached_search(self, matcher):
+        """从结果缓存恢复 self.filtered_results，命中返回 True"""
+        if not isinstance(self.file_content, LineIndexedFile):
+            return False
+        cached = self.search_cache.lookup(self.file_content, matcher)
+        if cached is None:
+            return False
+        line_numbers, keyword_counts = cached
+        if keyword_counts is not None:
+            matcher.keyword_hit_counts = keyword_counts
+        self.filtered_results = MatchResults(self.file_content, line_numbers)
+        return True
+
+    def _store_cached_search(self, matcher, results=None):
+        """把结果（默认 self.filtered_results）的行号存入结果缓存"""
+        if results is None:
+            results = self.filtered_results
+        if isinstance(self.file_content, LineIndexedFile):
+            if isinstance(results, MatchResults):
+                line_numbers = results.line_numbers
+            else:
+                line_numbers = (n for n, _ in results)
+            self.search_cache.store(self.file_content, matcher, line_numbers)
+
+    def _apply_channel_filter(self, results):
+        """按通道包含/排除设置筛选结果（尚无通道信息的行保留）"""
+        if not (self.channel_include or self.channel_exclude):
+            return results
+        mask = self.channel_index.mask(self.channel_include, self.channel_exclude)
+        covered = len(mask)
+        if isinstance(results, MatchResults):
+            return MatchResults(results.log_file, [n for n in results.line_numbers
+                                                   if n > covered or mask[n - 1]])
+        return [result for result in results if result[0] > covered or mask[result[0] - 1]]
+
+    def refresh_channel_filter(self):
+        """通道设置改变后重新显示：有关键字结果时对其求交，否则直接列出所选通道的行
+        （只有排除项时列出其余全部行）
+        """
+        if self.current_matcher is not None:
+            self.filtered_results = self._apply_channel_filter(self._search_results)
+            label = self.keyword_entry.get().strip()
+            self.display_results(label)
+            self.status_label.config(
+                text=f"通道筛选: 保留 {len(self.filtered_results)}/{len(self._search_results)} 条结果")
+            return
+        if self.channel_include:
+            # 没有关键字搜索：由倒排表合并出所选通道的全部行
+            line_indexes = sorted(idx for name in self.channel_include - self.channel_exclude
+                                  for idx in self.channel_index.lines_for(name))
+            self.filtered_results = MatchResults(self.file_content, (idx + 1 for idx in line_indexes))
+            label = "通道: " + ", ".join(sorted(self.channel_include))
+        elif self.channel_exclude:
+            # 只有排除项：由逐行掩码列出其余全部行（尚无通道信息的行保留）
+            mask = self.channel_index.mask(exclude=self.channel_exclude)
+            covered = len(mask)
+            line_numbers = array('I', compress(range(1, covered + 1), mask))
+            line_numbers.extend(range(covered + 1, len(self.file_content) + 1))
+            self.filtered_results = MatchResults(self.file_content, line_numbers)
+            label = "通道: 排除 " + ", ".join(sorted(self.channel_exclude))
+        else:
+            return
+        self.current_keywords = []
+        self.display_results(label)
+        self.status_label.config(text=f"{label} - 共 {len(self.filtered_results)} 行")
+
+    def show_channel_filter(self):
+        """通道筛选对话框：显示各通道的行数与当前结果中的条数，设置包含/排除"""
+        try:
+            counts = self.channel_index.line_counts()
+            if not counts:
+                messagebox.showinfo("通道", "当前文件没有 [Cxx] 通道信息（文件可能仍在加载）")
+                return
+
+            # 当前关键字结果中各通道的条数
+            codes = self.channel_index.codes
+            result_counts = {}
+            for line_num in (self._search_results.line_numbers if self._search_results else ()):
+                if line_num <= len(codes):
+                    code = codes[line_num - 1]
+                    result_counts[code] = result_counts.get(code, 0) + 1
+
+            channel_window = tk.Toplevel(self.root)
+            channel_window.title("📡 通道筛选")
+            channel_window.geometry("460x520")
+            channel_window.transient(self.root)
+
+            theme = self.get_current_theme()
+            channel_window.configure(bg=theme['bg'])
+
+            tk.Label(channel_window, text="每个通道选择: 不限 / 包含 / 排除（有包含项时只显示包含的通道）",
+                     bg=theme['bg'], fg=theme['fg']).pack(anchor=tk.W, padx=10, pady=5)
+
+            list_frame = tk.Frame(channel_window, bg=theme['bg'])
+            list_frame.pack(fill=tk.BOTH, expand=True, padx=10)
+            canvas = tk.Canvas(list_frame, bg=theme['bg'], highlightthickness=0)
+            scrollbar = tk.Scrollbar(list_frame, orient=tk.VERTICAL, command=canvas.yview)
+            rows_frame = tk.Frame(canvas, bg=theme['bg'])
+            rows_frame.bind('<Configure>', lambda e: canvas.configure(scrollregion=canvas.bbox('all')))
+            canvas.create_window((0, 0), window=rows_frame, anchor=tk.NW)
+            canvas.configure(yscrollcommand=scrollbar.set)
+            canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+            scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+            choices = {}
+            for row, (name, count) in enumerate(counts.items()):
+                code = self.channel_index.names.index(name)
+                state = "include" if name in self.channel_include else (
+                    "exclude" if name in self.channel_exclude else "any")
+                choices[name] = tk.StringVar(value=state)
+                text = f"{name}: {count:,} 行"
+                if self._search_results:
+                    text += f" (结果中 {result_counts.get(code, 0):,} 条)"
+                tk.Label(rows_frame, text=text, anchor=tk.W, width=30,
+                         bg=theme['bg'], fg=theme['fg']).grid(row=row, column=0, sticky=tk.W)
+                for column, (value, label) in enumerate((("any", "不限"), ("include", "包含"),
+                                                         ("exclude", "排除")), 1):
+                    tk.Radiobutton(rows_frame, text=label, variable=choices[name], value=value,
+                                   bg=theme['bg'], fg=theme['fg']).grid(row=row, column=column)
+
+            button_frame = tk.Frame(channel_window, bg=theme['bg'])
+            button_frame.pack(fill=tk.X, padx=10, pady=10)
+
+            def apply_channels():
+                self.channel_include = {name for name, var in choices.items() if var.get() == "include"}
+                self.channel_exclude = {name for name, var in choices.items() if var.get() == "exclude"}
+                print(f"📡 通道筛选: 包含 {sorted(self.channel_include)}, 排除 {sorted(self.channel_exclude)}")
+                self.refresh_channel_filter()
+
+            def reset_channels():
+                for var in choices.values():
+                    var.set("any")
+                apply_channels()
+
+            tk.Button(button_frame, text="✅ 应用", command=apply_channels).pack(side=tk.LEFT)
+            tk.Button(button_frame, text="↺ 重置", command=reset_channels).pack(side=tk.LEFT, padx=5)
+            tk.Button(button_frame, text="❌ 关闭", command=channel_window.destroy).pack(side=tk.LEFT)
+
+        except Exception as e:
+            messagebox.showerror("错误", f"打开通道筛选失败: {str(e)}")
+
+    def _should_search_in_parallel(self, matcher=None):
+        """是否使用多进程搜索：已勾选、文件足够大且是 mmap 后端
+        （time: 条件与时间窗口依赖主进程中的逐行时间，不能交给子进程）"""
+        try:
+            enabled = self.parallel_var.get()
+        except (AttributeError, tk.TclError):
+            return False
+        if getattr(matcher, 'uses_time', False) or getattr(matcher, 'line_filter', None) is not None:
+            return False
+        return (enabled and self.search_workers > 1 and
+                isinstance(self.file_content, LineIndexedFile) and
+                self.file_content.indexed_bytes >= PARALLEL_MIN_FILE_BYTES)
+
+    def _get_search_pool(self):
+        """获取（必要时创建）搜索进程池"""
+        if self._search_pool is None:
+            self._search_pool = ProcessPoolExecutor(max_workers=self.search_workers)
+            print(f"🧵 已创建搜索进程池: {self.search_workers} 个进程")
+        return self._search_pool
+
+    def run_match_engine_benchmark(self, sample_lines=200000):
+        """用当前文件的前若干行对比各匹配引擎（需输入关键字）与时间戳解析器的速度"""
+        keyword_input = self.keyword_entry.get().strip()
+        placeholder_text = "输入关键字，多个关键字用逗号分隔"
+        keywords = [k.strip() for k in keyword_input.split(',') if k.strip()] \
+            if keyword_input != placeholder_text else []
+        if not self.file_content:
+            messagebox.showwarning("警告", "请先打开文件")
+            return
+        try:
+            self.status_label.config(text="⏱ 正在对比匹配引擎与时间戳解析...")
+            self.root.update_idletasks()
+            lines = list(self.file_content.iter_lines(0, sample_lines))
+            sections = []
+            if keywords:
+                report = benchmark_match_engines(lines, keywords, self.case_var.get(), self.logic_var.get(),
+                                                 self.file_content)
+                baseline = report[0][1] or 1e-9
+                detail = "\n".join(
+                    f"{name}: {seconds:.3f}s, {len(lines) / max(seconds, 1e-9):,.0f} 行/s, "
+                    f"匹配 {count} 行, 相对原始循环 {baseline / max(seconds, 1e-9):.2f}x"
+                    for name, seconds, count in report)
+                sections.append(f"匹配引擎 ({len(keywords)} 个关键字):\n{detail}")
+            # 时间戳解析：上下文与结果列表的时间列逐行调用
+            report = benchmark_timestamp_parsers(lines)
+            baseline = report[0][1] or 1e-9
+            detail = "\n".join(
+                f"{name}: {seconds:.3f}s, {len(lines) / max(seconds, 1e-9):,.0f} 行/s, "
+                f"有时间 {count} 行, 相对原始解析 {baseline / max(seconds, 1e-9):.2f}x"
+                for name, seconds, count in report)
+            sections.append(f"时间戳解析:\n{detail}")
+            detail = "\n\n".join(sections)
+            print(f"⏱ 性能对比 ({len(lines)} 行):\n{detail}")
+            self.status_label.config(text=f"⏱ 性能对比完成 ({len(lines)} 行)")
+            messagebox.showinfo("性能对比", f"样本: {len(lines)} 行\n\n{detail}")
+        except Exception as e:
+            messagebox.showerror("错误", f"引擎对比失败: {str(e)}")
 
     def clear_search(self):
         """清空关键字与筛选结果（保留已加载文件）"""
@@ -1031,13 +4919,16 @@ class LogFilterApp:
                 self.keyword_combobox.config(foreground='gray')
             except Exception:
                 pass
+            self.cancel_live_search()
+            self._live_search_text = None
+            self._last_search_spec = None
+            self._search_results = []
             self.filtered_results = []
             self.current_keywords = []
+            self.current_matcher = None
             self.selected_line_index = None
-            self.result_listbox.delete(0, tk.END)
-            self.result_text.config(state=tk.NORMAL)
-            self.result_text.delete(1.0, tk.END)
-            self.result_text.config(state=tk.DISABLED)
+            self.result_view.show_message("")
+            self._context_window = None
             self.context_text.delete(1.0, tk.END)
             if hasattr(self, 'status_label'):
                 self.status_label.config(text="已清空搜索")
@@ -1053,21 +4944,9 @@ class LogFilterApp:
             current = self.selected_line_index if self.selected_line_index is not None else -1
             new_idx = (current + direction) % total
             self.selected_line_index = new_idx
-            # 同步 Listbox 选择
-            try:
-                self.result_listbox.selection_clear(0, tk.END)
-                self.result_listbox.selection_set(new_idx)
-                self.result_listbox.see(new_idx)
-            except Exception:
-                pass
             self.show_context(new_idx)
+            # 选中并滚动到该行（虚拟视图只重画可见行）
             self.highlight_selected_result_line(new_idx)
-            # 自动滚动 result_text 到选中行
-            try:
-                actual_line = new_idx + 3
-                self.result_text.see(f"{actual_line}.0")
-            except Exception:
-                pass
             if hasattr(self, 'status_label'):
                 self.status_label.config(text=f"匹配 {new_idx + 1}/{total}")
         except Exception as e:
@@ -1081,9 +4960,15 @@ class LogFilterApp:
             self.root.bind('<F5>', lambda e: self.filter_logs())
             self.root.bind('<Control-Down>', lambda e: self.navigate_result(1))
             self.root.bind('<Control-Up>', lambda e: self.navigate_result(-1))
-            # Esc 在焦点位于 keyword_combobox 时清空输入
+            # Esc 优先取消后台加载、停止进行中的搜索；否则在焦点位于 keyword_combobox 时清空输入
             def on_escape(event):
                 try:
+                    if self.is_file_loading():
+                        self.cancel_file_load()
+                        return
+                    if self.is_searching():
+                        self.stop_search()
+                        return
                     if self.root.focus_get() is self.keyword_combobox or \
                        (hasattr(self.keyword_combobox, 'winfo_name') and
                         self.root.focus_get() and
@@ -1096,11 +4981,8 @@ class LogFilterApp:
             print(f"快捷键绑定失败: {e}")
 
     def display_results(self, keyword):
-        """显示筛选结果 - 增强版本，支持关键字高亮"""
-        # 清空之前的结果
-        self.result_listbox.delete(0, tk.END)
-        self.result_text.config(state=tk.NORMAL)
-        self.result_text.delete(1.0, tk.END)
+        """显示筛选结果 - 虚拟化视图只渲染并高亮可见的行"""
+        self._context_window = None
         self.context_text.delete(1.0, tk.END)
         
         if not self.filtered_results:
@@ -1111,97 +4993,55 @@ class LogFilterApp:
 2. 是否区分大小写
 3. 文件是否包含相关内容"""
             
-            self.result_listbox.insert(tk.END, no_result_msg)
-            self.result_text.insert(tk.END, no_result_msg + "\n\n" + detail_msg)
+            self.result_view.show_message(no_result_msg + "\n\n" + detail_msg)
             self.context_text.insert(tk.END, detail_msg)
-            self.result_text.config(state=tk.DISABLED)
             
             # 更新状态栏
             self.status_label.config(text=f"未找到匹配结果 - 关键词: {keyword}")
             return
         
-        # 显示找到的结果数量
-        result_count_msg = f"找到 {len(self.filtered_results)} 条匹配结果:\n" + "="*40 + "\n"
-        self.result_text.insert(tk.END, result_count_msg)
+        # 显示找到的结果数量；结果数据只有 filtered_results 一份
+        self.result_view.set_results(self.filtered_results, f"找到 {len(self.filtered_results)} 条匹配结果:")
         
-        # 在结果列表中显示所有匹配的行
-        for i, (line_num, line_content) in enumerate(self.filtered_results):
-            if self.show_time_column and self.has_time_baseline:
-                # 只有在有TIME[0]基准时才显示计算的时间
+        # 默认选中第一个结果
+        self.selected_line_index = 0
+        self.show_context(0)
+        self.highlight_selected_result_line(0)
+
+    def _format_result_rows(self, rows):
+        """结果列表中若干行 [(行号, 内容), ...] 的显示文本；时间列一次推算整组行"""
+        previews = [f"[{line_num:4d}] {line_content[:200]}{'...' if len(line_content) > 200 else ''}"
+                    for line_num, line_content in rows]
+        if not (self.show_time_column and self.has_time_baseline):
+            # 不显示时间信息或没有基准的原始格式
+            return previews
+        # 只有在有TIME[0]基准时才显示计算的时间
+        table = self.baseline_table
+        datetimes = table.datetimes([line_num - 1 for line_num, _ in rows], self.line_timestamps)
+        formatted = []
+        for (line_num, line_content), preview, dt in zip(rows, previews, datetimes):
+            if dt is None:
                 time_info = self.calculate_time_info(line_content, line_num)
-                
-                # 为listbox添加内容（保持兼容性）
-                display_text = f"{time_info} [{line_num:4d}] {line_content[:200]}{'...' if len(line_content) > 200 else ''}"
-                self.result_listbox.insert(tk.END, display_text)
-                
-                # 为Text组件添加内容，添加行号以便点击识别
-                self.result_text.insert(tk.END, f"{display_text}\n")
+            elif table.is_baseline(line_num - 1):
+                time_info = f"[{dt.strftime('%Y/%m/%d %H:%M:%S')}] (基准)"
             else:
-                # 不显示时间信息或没有基准的原始格式
-                display_text = f"[{line_num:4d}] {line_content[:200]}{'...' if len(line_content) > 200 else ''}"
-                self.result_listbox.insert(tk.END, display_text)
-                
-                # 为Text组件添加内容，添加行号以便点击识别
-                self.result_text.insert(tk.END, f"{display_text}\n")
-        
-        # 高亮搜索结果中的关键字（在设置为只读之前）
-        self.highlight_result_keywords()
-        
-        # 设置为只读
-        self.result_text.config(state=tk.DISABLED)
-        
-        # 默认选中第一个结果
-        if self.filtered_results:
-            self.result_listbox.selection_set(0)
-            self.selected_line_index = 0
-            self.show_context(0)
-            self.highlight_selected_result_line(0)
+                time_info = f"[{dt.strftime('%Y/%m/%d %H:%M:%S')}]"
+            formatted.append(f"{time_info} {preview}")
+        return formatted
 
     def highlight_result_keywords(self):
-        """高亮搜索结果中的关键字"""
+        """高亮搜索结果中的关键字（结果视图每次渲染后调用，只处理可见的行）"""
         try:
-            if not hasattr(self, 'current_keywords') or not self.current_keywords:
+            self._remove_tags(self.result_text, "result_keyword_")
+            patterns = self._current_highlight_patterns()
+            if not patterns:
                 return
             
-            # 获取搜索选项 - 安全获取，避免在根窗口创建前出错
-            case_sensitive = False
-            try:
-                if hasattr(self, 'case_var') and self.case_var:
-                    case_sensitive = self.case_var.get()
-            except tk.TclError:
-                case_sensitive = False
-            
             # 暂时设置为可编辑状态
             self.result_text.config(state=tk.NORMAL)
-            
-            # 清除之前的关键词高亮标签
-            color_list = self.get_highlight_colors()
-            for i in range(len(color_list)):
-                self.result_text.tag_remove(f"result_keyword_{i}", "1.0", tk.END)
-            
-            # 高亮每个关键词（使用不同颜色）
-            for keyword_idx, keyword in enumerate(self.current_keywords):
-                if not keyword:
-                    continue
-                
-                color_idx = keyword_idx % len(color_list)
-                tag_name = f"result_keyword_{keyword_idx}"
-                
-                start_pos = "1.0"
-                while True:
-                    pos = self.result_text.search(keyword, start_pos, tk.END, 
-                                                 nocase=not case_sensitive)
-                    if not pos:
-                        break
-                    
-                    end_pos = f"{pos}+{len(keyword)}c"
-                    self.result_text.tag_add(tag_name, pos, end_pos)
-                    start_pos = end_pos
-                
-                # 配置关键词高亮样式
-                self.result_text.tag_configure(tag_name, 
-                    background=color_list[color_idx]['bg'], 
-                    foreground=color_list[color_idx]['fg'])
+            spans = self._compute_widget_spans(self.result_text, patterns,
+                                               first_line=VirtualResultView.HEADER_LINES + 1)
+            self._apply_keyword_spans(self.result_text, spans, "result_keyword_")
             
             # 恢复为只读状态
             self.result_text.config(state=tk.DISABLED)
@@ -1952,7 +5792,7 @@ class LogFilterApp:
         try:
             search_window = tk.Toplevel(self.root)
             search_window.title("🔍+ 高级搜索")
-            search_window.geometry("500x400")
+            search_window.geometry("500x480")
             search_window.transient(self.root)
             search_window.grab_set()
             
@@ -1965,6 +5805,13 @@ class LogFilterApp:
             
             keywords_text = tk.Text(search_window, height=8, width=50)
             keywords_text.pack(padx=10, pady=5, fill=tk.BOTH, expand=True)
+
+            # 排除关键字（如心跳日志），与上面的条件一起编译为一个查询表达式
+            tk.Label(search_window, text="排除关键字 (每行一个):",
+                    bg=theme['bg'], fg=theme['fg']).pack(anchor=tk.W, padx=10, pady=5)
+
+            exclude_text = tk.Text(search_window, height=3, width=50)
+            exclude_text.pack(padx=10, pady=5, fill=tk.X)
             
             # 搜索选项
             options_frame = tk.Frame(search_window, bg=theme['bg'])
@@ -1984,9 +5831,10 @@ class LogFilterApp:
             
             def do_advanced_search():
                 keywords = [k.strip() for k in keywords_text.get(1.0, tk.END).split('\n') if k.strip()]
+                excludes = [k.strip() for k in exclude_text.get(1.0, tk.END).split('\n') if k.strip()]
                 if keywords:
-                    self.advanced_filter_logs(keywords, logic_var.get())
                     search_window.destroy()
+                    self.advanced_filter_logs(keywords, logic_var.get(), excludes)
             
             tk.Button(button_frame, text="🔍 搜索", command=do_advanced_search).pack(side=tk.LEFT)
             tk.Button(button_frame, text="❌ 取消", command=search_window.destroy).pack(side=tk.LEFT, padx=5)
@@ -1994,45 +5842,21 @@ class LogFilterApp:
         except Exception as e:
             messagebox.showerror("错误", f"打开高级搜索失败: {str(e)}")
     
-    def advanced_filter_logs(self, keywords, logic="OR"):
-        """高级多关键字筛选"""
+    def advanced_filter_logs(self, keywords, logic="OR", excludes=()):
+        """高级多关键字筛选：组合为查询表达式后走与主搜索相同的流程"""
         if not self.file_content:
             messagebox.showwarning("警告", "请先打开文件")
             return
         
         try:
-            self.filtered_results = []
-            # 安全获取搜索选项，避免在根窗口创建前出错
-            case_sensitive = False
-            try:
-                if hasattr(self, 'case_var') and self.case_var:
-                    case_sensitive = self.case_var.get()
-            except tk.TclError:
-                case_sensitive = False
-            
-            for i, line in enumerate(self.file_content):
-                line_content = line.strip()
-                search_line = line_content if case_sensitive else line_content.lower()
-                
-                if logic == "AND":
-                    # 所有关键字都必须包含
-                    found = all(
-                        (k if case_sensitive else k.lower()) in search_line 
-                        for k in keywords
-                    )
-                else:  # OR
-                    # 任一关键字包含即可
-                    found = any(
-                        (k if case_sensitive else k.lower()) in search_line 
-                        for k in keywords
-                    )
-                
-                if found:
-                    self.filtered_results.append((i + 1, line_content))
-            
-            # 显示结果
-            self.display_results(", ".join(keywords))
-            self.status_label.config(text=f"找到 {len(self.filtered_results)} 条匹配结果 ({logic})")
+            query = f" {logic} ".join(_quote_query_text(k) for k in keywords)
+            if excludes:
+                query = f"({query}) AND NOT ({' OR '.join(_quote_query_text(k) for k in excludes)})"
+            self.logic_var.set(QUERY_LOGIC_EXPR)
+            self.keyword_combobox.set(query)
+            self.keyword_combobox.config(foreground='black')
+            self._live_search_text = query  # 避免再次触发实时搜索
+            self.filter_logs()
             
         except Exception as e:
             messagebox.showerror("错误", f"高级搜索失败: {str(e)}")
@@ -2362,6 +6186,7 @@ class LogFilterApp:
                     f.write(f"匹配数量: {len(self.filtered_results)}\n")
                     f.write("=" * 50 + "\n\n")
                     
+                    # 通过文件后端按行号读取原文，只解码导出的行
                     for line_num, line_content in self.filtered_results:
                         f.write(f"[第{line_num}行] {line_content}\n")
                 
@@ -2400,16 +6225,13 @@ class LogFilterApp:
             if len(selected_text) < 2:
                 return
             
-            # 搜索并高亮所有匹配的文本
-            start_pos = "1.0"
-            while True:
-                pos = self.context_text.search(selected_text, start_pos, tk.END)
-                if not pos:
-                    break
-                
-                end_pos = f"{pos}+{len(selected_text)}c"
-                self.context_text.tag_add("selected_highlight", pos, end_pos)
-                start_pos = end_pos
+            # 在 Python 中找出所有出现位置，一次 tag_add 完成高亮
+            start_time = time.perf_counter()
+            spans = self._compute_widget_spans(self.context_text, [re.compile(re.escape(selected_text))])
+            indices = spans.get(0, [])
+            if indices:
+                self.context_text.tag_add("selected_highlight", *indices)
+            print(f"🎨 选中文本高亮: {len(indices) // 2} 处, 用时 {(time.perf_counter() - start_time) * 1000:.1f}ms")
             
             # 配置高亮样式（使用醒目的颜色）
             self.context_text.tag_configure("selected_highlight", 
@@ -2449,14 +6271,12 @@ class LogFilterApp:
     def on_result_text_click(self, event):
         """处理结果文本点击事件"""
         try:
-            # 获取点击位置
-            click_pos = self.result_text.index(tk.INSERT)
-            line_num = int(click_pos.split('.')[0])
-            
-            # 计算实际结果索引（减去标题行和分隔符行）
-            result_index = line_num - 3  # -1 for title, -1 for separator, -1 for 1-based indexing
+            # 由点击位置换算结果序号（视图只渲染可见行，需加上视口起点）
+            result_index = self.result_view.index_at(event.y)
+            if result_index is None:
+                return
             
-            print(f"🖱️ 点击行: {line_num}, 计算索引: {result_index}")
+            print(f"🖱️ 点击结果: {result_index}")
             
             if 0 <= result_index < len(self.filtered_results):
                 self.selected_line_index = result_index
@@ -2471,24 +6291,9 @@ class LogFilterApp:
             print(f"结果文本点击处理失败: {e}")
 
     def highlight_selected_result_line(self, line_index):
-        """高亮选中的结果行"""
+        """高亮选中的结果行（滚动到可见）"""
         try:
-            # 清除之前的选中高亮
-            self.result_text.tag_remove("selected_result", "1.0", tk.END)
-            
-            # 计算实际行号（考虑标题行）
-            actual_line = line_index + 3  # +1 for title, +1 for separator, +1 for 1-based indexing
-            
-            # 高亮当前选中的行
-            line_start = f"{actual_line}.0"
-            line_end = f"{actual_line}.end"
-            self.result_text.tag_add("selected_result", line_start, line_end)
-            
-            # 配置选中行样式
-            self.result_text.tag_configure("selected_result", 
-                background="#316AC5",  # 蓝色背景
-                foreground="#FFFFFF")  # 白色文字
-                
+            self.result_view.select(line_index)
         except Exception as e:
             print(f"高亮选中结果行失败: {e}")
 
@@ -3020,15 +6825,26 @@ class LogFilterApp:
             files = self.root.tk.splitlist(event.data)
             print(f"📁 检测到拖拽文件: {files}")
             
-            if files:
-                # 取第一个文件
+            if len(files) > 1:
+                # 多个文件：支持的类型组成多文件会话并行加载
+                supported_extensions = ['.log', '.txt', '.out', '.err', '.csv'] + list(COMPRESSED_LOG_READERS)
+                log_files = [f for f in files if os.path.isfile(f) and
+                             os.path.splitext(f)[1].lower() in supported_extensions + ['']]
+                skipped = len(files) - len(log_files)
+                if skipped:
+                    print(f"⚠️ 跳过 {skipped} 个不支持或不存在的文件")
+                if log_files:
+                    self.open_files(log_files)
+                else:
+                    messagebox.showwarning("警告", "拖入的文件中没有支持的日志文件")
+            elif files:
                 file_path = files[0]
                 
                 # 检查文件是否存在
                 if os.path.exists(file_path):
                     # 检查文件类型
                     file_ext = os.path.splitext(file_path)[1].lower()
-                    supported_extensions = ['.log', '.txt', '.out', '.err', '.csv']
+                    supported_extensions = ['.log', '.txt', '.out', '.err', '.csv'] + list(COMPRESSED_LOG_READERS)
                     
                     if file_ext in supported_extensions or file_ext == '':
                         # 直接加载支持的文件类型
@@ -3309,8 +7125,9 @@ class LogFilterApp:
                 title="快速选择日志文件",
                 initialdir=initial_dir,
                 filetypes=[
-                    ("所有日志文件", "*.log;*.txt;*.out;*.err"),
+                    ("所有日志文件", "*.log;*.txt;*.out;*.err;*.gz;*.bz2;*.xz"),
                     ("日志文件", "*.log"),
+                    ("压缩日志", "*.gz;*.bz2;*.xz"),
                     ("文本文件", "*.txt"),
                     ("输出文件", "*.out"),
                     ("错误文件", "*.err"),
@@ -3333,7 +7150,7 @@ class LogFilterApp:
             if folder_path:
                 # 扫描文件夹中的日志文件
                 log_files = []
-                for ext in ['.log', '.txt', '.out', '.err']:
+                for ext in ['.log', '.txt', '.out', '.err'] + list(COMPRESSED_LOG_READERS):
                     for file in os.listdir(folder_path):
                         if file.lower().endswith(ext):
                             log_files.append(os.path.join(folder_path, file))
@@ -3360,7 +7177,9 @@ class LogFilterApp:
             # 文件列表
             tk.Label(file_window, text="请选择要打开的文件:", font=('Arial', 10, 'bold')).pack(pady=5)
             
-            listbox = tk.Listbox(file_window, height=12)
+            tk.Label(file_window, text="(按住 Ctrl / Shift 可多选，多个文件并行加载为会话)",
+                     fg='gray').pack()
+            listbox = tk.Listbox(file_window, height=12, selectmode=tk.EXTENDED)
             listbox.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
             
             # 添加文件到列表
@@ -3376,13 +7195,18 @@ class LogFilterApp:
             def open_selected():
                 selection = listbox.curselection()
                 if selection:
-                    file_path = files[selection[0]]
+                    selected = [files[i] for i in selection]
                     file_window.destroy()
-                    self.load_file(file_path)
+                    self.open_files(selected)
                 else:
-                    messagebox.showwarning("警告", "请选择一个文件")
+                    messagebox.showwarning("警告", "请选择至少一个文件")
+
+            def open_all():
+                file_window.destroy()
+                self.open_files(files)
             
             tk.Button(button_frame, text="打开", command=open_selected).pack(side=tk.LEFT, padx=5)
+            tk.Button(button_frame, text="全部打开", command=open_all).pack(side=tk.LEFT, padx=5)
             tk.Button(button_frame, text="取消", command=file_window.destroy).pack(side=tk.LEFT, padx=5)
             
             # 双击打开
@@ -3407,57 +7231,863 @@ class LogFilterApp:
             print(f"添加文件访问提示失败: {e}")
     
     def load_file(self, file_path):
-        """统一的文件加载方法"""
+        """统一的文件加载方法 - 在后台线程中建立索引，界面保持可用"""
         try:
             # 检查文件是否存在
             if not os.path.exists(file_path):
                 messagebox.showerror("错误", f"文件不存在: {file_path}")
                 return
-            
+
+            # 打开新文件时取消仍在进行的加载和索引构建（之后会关闭旧文件的 mmap）
+            self.cancel_file_load(quiet=True)
+            self.cancel_trigram_build()
+            self._cancel_search_worker()
+            self.trigram_index = None
+
+            # 打开单个文件时结束多文件会话
+            self._clear_session()
+
+            # 压缩日志先在后台解压到缓存（已解压过则直接使用缓存文件）
+            index_path = file_path
+            if is_compressed_log(file_path):
+                index_path = self.decompress_cache.lookup(file_path)
+                if index_path is None:
+                    self._start_decompress(file_path)
+                    return
+                print(f"🗜 使用已解压的缓存: {index_path}")
+
             # 保存当前文件路径
             self.current_file_path = file_path
-            
-            # 读取文件内容
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
-                self.file_content = file.readlines()
 
-            # 预扫描构建时间基准列表（支持文件中任意位置的 TIME[0]）
+            # 建立 mmap 行偏移索引（不再把整个文件读成字符串列表），索引在后台逐块构建
+            new_content = LineIndexedFile(index_path, build_index=False, source_path=file_path)
+            self._close_content(self.file_content)
+            self.file_content = new_content
+            self.cancel_live_search()
+            self._last_search_spec = None
+            self._search_results = []
+            self.filtered_results = []
+            self.current_matcher = None
+            self.selected_line_index = None
             self.reset_time_baseline()
-            self._build_time_baselines()
-            if hasattr(self, 'time_toggle_button'):
-                if self.has_time_baseline:
-                    self.time_toggle_button.config(text="⏰ 时间列")
-                else:
-                    self.time_toggle_button.config(text="⏰ 时间列 (无基准)")
+            self.time_baselines = []
+            self.baseline_table = TimeBaselineTable()
+            self.line_timestamps = array('d')
+            self.line_time_index = None
+            self.channel_index = ChannelIndex()
+            self._context_window = None
+            self._context_line_cache.clear()
+            self._context_cache_key = None
 
-            # 添加到最近文件
-            self.add_to_recent_files(file_path)
-            
-            # 更新状态
-            file_name = os.path.basename(file_path)
-            self.status_label.config(text=f"✅ 已加载: {file_name} ({len(self.file_content)} 行)")
-            
             # 清空搜索结果和上下文显示（保持搜索功能不变）
-            self.result_listbox.delete(0, tk.END)
-            self.result_text.config(state=tk.NORMAL)
-            self.result_text.delete(1.0, tk.END)
+            file_name = os.path.basename(file_path)
             self.context_text.delete(1.0, tk.END)
-            
+
             # 显示提示信息
-            welcome_msg = f"📁 已成功加载文件: {file_name}\n💡 请输入关键字进行搜索..."
-            self.result_listbox.insert(tk.END, welcome_msg)
-            self.result_text.insert(tk.END, welcome_msg)
+            welcome_msg = f"📁 正在加载文件: {file_name}\n💡 加载过程中即可输入关键字搜索已读取的部分 (Esc 取消加载)..."
+            self.result_view.show_message(welcome_msg)
             self.context_text.insert(tk.END, welcome_msg)
-            self.result_text.config(state=tk.DISABLED)
-            
-            print(f"✅ 文件加载成功: {file_path}")
-            
+
+            # 启动后台加载线程并轮询进度
+            self.timestamp_format = RelativeTimestampFormat()
+            self._load_worker = FileLoadWorker(new_content, index_cache=self.index_cache)
+            self._load_worker.start()
+            self.root.after(100, self._poll_file_load, self._load_worker)
+
+            print(f"⏳ 开始后台加载: {file_path}")
+
         except Exception as e:
             print(f"文件加载失败: {e}")
             messagebox.showerror("错误", f"加载文件失败: {str(e)}")
 
+    def _start_decompress(self, file_path):
+        """启动后台解压，完成后重新调用 load_file 加载解压结果"""
+        worker = DecompressWorker(file_path, self.decompress_cache)
+        self._decompress_worker = worker
+        worker.start()
+        message = f"🗜 正在解压: {os.path.basename(file_path)}\n💡 解压完成后自动加载，下次打开直接使用解压缓存 (Esc 取消)..."
+        self.result_view.show_message(message)
+        self.context_text.delete(1.0, tk.END)
+        self.context_text.insert(tk.END, message)
+        print(f"🗜 开始后台解压: {file_path} -> {worker.output_path}")
+        self.root.after(100, self._poll_decompress, worker)
+
+    def _poll_decompress(self, worker):
+        """定时刷新解压进度（在 Tk 主线程中执行）"""
+        if worker is not self._decompress_worker:
+            return  # 已被取消或替换
+        file_name = os.path.basename(worker.file_path)
+        if not worker.finished:
+            fraction, bytes_per_sec = worker.progress()
+            self.status_label.config(
+                text=f"🗜 正在解压 {file_name}: {fraction * 100:.0f}% | 已解压 {worker.output_bytes / 1024 / 1024:,.0f} MB | "
+                     f"{bytes_per_sec / 1024 / 1024:.1f} MB/s (Esc 取消)")
+            self.root.after(100, self._poll_decompress, worker)
+            return
+        self._decompress_worker = None
+        if worker.error is not None:
+            print(f"解压失败: {worker.error}")
+            messagebox.showerror("错误", f"解压文件失败: {str(worker.error)}")
+            return
+        print(f"🗜 解压完成: {worker.output_bytes / 1024 / 1024:,.1f} MB, 用时 {worker.elapsed:.2f}s")
+        self.load_file(worker.file_path)
+
+    def cancel_decompress(self):
+        """取消进行中的解压"""
+        worker = self._decompress_worker
+        self._decompress_worker = None
+        if worker is None or worker.finished:
+            return False
+        worker.cancel()
+        worker.join(timeout=2.0)
+        self.status_label.config(text=f"⛔ 已取消解压: {os.path.basename(worker.file_path)}")
+        print(f"⛔ 解压已取消: {worker.file_path}")
+        return True
+
+    def is_file_loading(self):
+        """是否有文件正在后台解压或加载"""
+        if self._decompress_worker is not None and not self._decompress_worker.finished:
+            return True
+        return self._load_worker is not None and not self._load_worker.finished
+
+    def cancel_file_load(self, quiet=False):
+        """取消正在进行的后台解压或加载，已索引的部分仍可搜索"""
+        if self.cancel_decompress():
+            return True
+        worker = self._load_worker
+        if worker is None or worker.finished:
+            return False
+        worker.cancel()
+        # 等待当前数据块结束，避免关闭 mmap 时线程仍在读取
+        worker.join(timeout=2.0)
+        if not quiet:
+            self._finish_file_load(worker)
+        return True
+
+    def _poll_file_load(self, worker):
+        """定时刷新加载进度（在 Tk 主线程中执行）"""
+        if worker is not self._load_worker:
+            return  # 已被新的加载替换
+        if worker.finished:
+            self._finish_file_load(worker)
+            return
+
+        # 加载过程中同步检测出的时间戳格式和已找到的时间基准，支持部分搜索时显示时间
+        if worker.timestamp_format is not None:
+            self.timestamp_format = worker.timestamp_format
+        if len(worker.time_baselines) != len(self.time_baselines):
+            self.time_baselines = list(worker.time_baselines)
+            self.baseline_table = TimeBaselineTable(self.time_baselines)
+            self.has_time_baseline = len(self.time_baselines) > 0
+
+        fraction, bytes_per_sec, lines_per_sec = worker.progress()
+        file_name = os.path.basename(worker.log_file.source_path)
+        self.status_label.config(
+            text=f"⏳ 正在加载 {file_name}: {fraction * 100:.0f}% | "
+                 f"{bytes_per_sec / 1024 / 1024:.1f} MB/s | {lines_per_sec:,.0f} 行/s | "
+                 f"已索引 {len(worker.log_file):,} 行 (Esc 取消)")
+        self.root.after(100, self._poll_file_load, worker)
+
+    def _finish_file_load(self, worker):
+        """加载完成（或被取消）后的收尾工作"""
+        if worker is not self._load_worker:
+            return
+        self._load_worker = None
+        file_path = worker.log_file.source_path
+        file_name = os.path.basename(file_path)
+
+        if worker.error is not None:
+            print(f"文件加载失败: {worker.error}")
+            messagebox.showerror("错误", f"加载文件失败: {str(worker.error)}")
+            return
+
+        # 时间戳格式、时间基准列表（支持文件中任意位置的 TIME[0]）与逐行时间戳
+        if worker.timestamp_format is not None:
+            self.timestamp_format = worker.timestamp_format
+        self._apply_time_baselines(list(worker.time_baselines))
+        self.line_timestamps = worker.line_timestamps
+        self.line_time_index = worker.line_time_index  # 已在加载线程中推算
+        self.channel_index = worker.channel_index
+        print(f"🕐 已计算逐行绝对时间: {len(self.line_time_index)} 行, "
+              f"用时 {worker.time_index_seconds:.2f}s (后台)")
+        if hasattr(self, 'time_toggle_button'):
+            if self.has_time_baseline:
+                self.time_toggle_button.config(text="⏰ 时间列")
+            else:
+                self.time_toggle_button.config(text="⏰ 时间列 (无基准)")
+
+        line_count = len(self.file_content)
+        if worker.cancelled:
+            self.status_label.config(text=f"⛔ 已取消加载: {file_name} (已加载 {line_count} 行，可搜索已加载部分)")
+            print(f"⛔ 文件加载已取消: {file_path}")
+            return
+
+        # 添加到最近文件
+        self.add_to_recent_files(file_path)
+
+        # 更新状态
+        source = "索引缓存命中" if worker.cache_hit else "已建立索引"
+        self.status_label.config(text=f"✅ 已加载: {file_name} ({line_count} 行, {source}, "
+                                        f"时间格式: {self.timestamp_format.label}, 用时 {worker.elapsed:.2f}s)")
+
+        if self.trigram_var.get():
+            self.start_trigram_build()
+
+        if not self.filtered_results:
+            welcome_msg = f"📁 已成功加载文件: {file_name}\n💡 请输入关键字进行搜索..."
+            self.result_view.show_message(welcome_msg)
+            self.context_text.delete(1.0, tk.END)
+            self.context_text.insert(tk.END, welcome_msg)
+
+        print(f"✅ 文件加载成功: {file_path}")
+
+    def on_trigram_toggle(self):
+        """勾选/取消三元组索引"""
+        if self.trigram_var.get():
+            if isinstance(self.file_content, LineIndexedFile) and not self.is_file_loading():
+                self.start_trigram_build()
+        else:
+            self.cancel_trigram_build()
+            self.trigram_index = None
+            print("🗂 已停用三元组索引")
+
+    def start_trigram_build(self):
+        """在后台为当前文件建立三元组索引"""
+        if self.trigram_index is not None or self._trigram_builder is not None:
+            return
+        if not isinstance(self.file_content, LineIndexedFile) or not self.file_content.index_complete:
+            return
+        self._trigram_builder = TrigramIndexBuilder(self.file_content)
+        self._trigram_builder.start()
+        self.status_label.config(text="🗂 正在后台建立三元组索引...")
+        self.root.after(200, self._poll_trigram_build, self._trigram_builder)
+
+    def cancel_trigram_build(self):
+        """取消正在建立的三元组索引"""
+        builder = self._trigram_builder
+        self._trigram_builder = None
+        if builder is not None and not builder.finished:
+            builder.cancel()
+            builder.join(timeout=2.0)
+
+    def _poll_trigram_build(self, builder):
+        """等待三元组索引建立完成（在 Tk 主线程中执行）"""
+        if builder is not self._trigram_builder:
+            return  # 已取消或被新的构建替换
+        if not builder.finished:
+            self.root.after(200, self._poll_trigram_build, builder)
+            return
+        self._trigram_builder = None
+        if builder.error is not None:
+            print(f"建立三元组索引失败: {builder.error}")
+            self.status_label.config(text=f"❌ 建立三元组索引失败: {builder.error}")
+            return
+        index = builder.index
+        if index is None:
+            return
+        self.trigram_index = index
+        message = (f"🗂 三元组索引已建立: {index.block_count} 个数据块, {len(index.postings)} 个三元组"
+                   f" (另有 {len(index.common_trigrams)} 个常见三元组), "
+                   f"约 {index.size_bytes / 1024 / 1024:.1f} MB, 用时 {index.build_seconds:.2f}s")
+        print(message)
+        self.status_label.config(text=message)
+
+    def open_files(self, file_paths):
+        """打开多个文件组成会话：在线程池中并行建立各自的索引与校时点"""
+        file_paths = list(dict.fromkeys(file_paths))
+        if len(file_paths) == 1:
+            self.load_file(file_paths[0])
+            return
+        try:
+            self.cancel_file_load(quiet=True)
+            self.cancel_trigram_build()
+            self._cancel_search_worker()
+            self.trigram_index = None
+            self._clear_session()
+            if self._session_pool is None:
+                self._session_pool = ThreadPoolExecutor(max_workers=SESSION_LOAD_WORKERS)
+            for n, file_path in enumerate(file_paths):
+                entry = LoadedLog(f"tab{n}", file_path)
+                self.tabs[entry.tab_id] = entry
+                future = self._session_pool.submit(entry.load, self.index_cache, self.decompress_cache)
+                self._session_futures[entry.tab_id] = future
+            self._update_session_combo()
+            message = f"📑 正在并行加载 {len(file_paths)} 个文件 ({SESSION_LOAD_WORKERS} 个线程)..."
+            self.result_view.show_message(message)
+            self.status_label.config(text=message)
+            print(message)
+            self.root.after(200, self._poll_session_load)
+        except Exception as e:
+            print(f"打开多个文件失败: {e}")
+            messagebox.showerror("错误", f"打开多个文件失败: {str(e)}")
+
+    def _poll_session_load(self):
+        """收集已完成的加载任务；第一个加载完成的文件立即显示"""
+        if not self._session_futures:
+            return  # 会话已被清除
+        for tab_id, future in list(self._session_futures.items()):
+            if not future.done():
+                continue
+            del self._session_futures[tab_id]
+            entry = self.tabs[tab_id]
+            error = future.exception()
+            if error is not None:
+                entry.error = error
+                print(f"文件加载失败: {entry.source_path}: {error}")
+                continue
+            source = "索引缓存命中" if entry.cache_hit else "已建立索引"
+            print(f"✅ 会话文件已加载: {entry.name} ({len(entry.log_file)} 行, {source}, "
+                  f"{len(entry.time_baselines)} 个校时点, 用时 {entry.load_seconds:.2f}s)")
+            if self.current_tab_id is None:
+                self.switch_to_file(tab_id)
+        self._update_session_combo()
+        done = len(self.tabs) - len(self._session_futures)
+        if self._session_futures:
+            self.status_label.config(text=f"⏳ 并行加载: 已完成 {done}/{len(self.tabs)} 个文件")
+            self.root.after(200, self._poll_session_load)
+            return
+        failed = sum(1 for entry in self.tabs.values() if entry.error is not None)
+        self._evict_session_buffers()
+        self.status_label.config(text=f"✅ 已加载 {len(self.tabs) - failed}/{len(self.tabs)} 个文件"
+                                      f"{f', {failed} 个失败' if failed else ''} (可在 📑 会话文件 中切换, 🔎 全部文件 同时搜索)")
+
+    def _clear_session(self):
+        """结束多文件会话并释放各文件的映射（当前显示的文件由调用方处理）"""
+        if not self.tabs:
+            return
+        self._cancel_session_search()
+        for tab_id, future in self._session_futures.items():
+            # 已在执行的加载任务无法取消，完成后在主线程中释放其映射
+            if not future.cancel():
+                self._detached_loads.append((future, self.tabs[tab_id]))
+        if self._detached_loads:
+            self.root.after(200, self._release_detached_loads)
+        self._session_futures = {}
+        for entry in self.tabs.values():
+            if entry.log_file is not None and entry.log_file is not self.file_content:
+                entry.release()
+        self.tabs = {}
+        self.current_tab_id = None
+        self._update_session_combo()
+
+    def _release_detached_loads(self):
+        """释放会话清除后才加载完成的文件"""
+        pending = []
+        for future, entry in self._detached_loads:
+            if not future.done():
+                pending.append((future, entry))
+            elif future.exception() is None:
+                entry.release()
+        self._detached_loads = pending
+        if pending:
+            self.root.after(200, self._release_detached_loads)
+
+    def _close_content(self, content):
+        """关闭不再显示的文件：属于会话或合并时间线窗口的文件通过其 LoadedLog 释放
+        （被窗口固定时跳过，窗口关闭时再释放），其余直接关闭
+        """
+        if not isinstance(content, LineIndexedFile):
+            return
+        for entry in list(self.tabs.values()) + self._merged_timeline_entries:
+            if entry.log_file is content:
+                entry.release()
+                return
+        content.close()
+
+    def _evict_session_buffers(self):
+        """在主线程中按 LRU 维持会话文件的映射上限（当前显示的文件与被固定的文件除外）"""
+        evict_session_buffers(list(self.tabs.values()), keep=(self.tabs.get(self.current_tab_id),))
+
+    def _update_session_combo(self):
+        if not hasattr(self, 'session_combo'):
+            return
+        entries = list(self.tabs.values())
+        self.session_combo.config(values=[entry.label() for entry in entries],
+                                  state='readonly' if entries else 'disabled')
+        if self.current_tab_id in self.tabs:
+            self.session_combo.current(list(self.tabs).index(self.current_tab_id))
+        elif not entries:
+            self.session_combo.set('')
+
+    def on_session_file_selected(self, event=None):
+        index = self.session_combo.current()
+        if 0 <= index < len(self.tabs):
+            tab_id = list(self.tabs)[index]
+            if tab_id != self.current_tab_id:
+                self.switch_to_file(tab_id)
+
+    def _store_session_state(self):
+        """把当前文件在跟随模式等操作中更新的时间信息写回会话"""
+        entry = self.tabs.get(self.current_tab_id)
+        if entry is not None and entry.log_file is self.file_content:
+            entry.timestamp_format = self.timestamp_format
+            entry.time_baselines = list(self.time_baselines)
+            entry.line_timestamps = self.line_timestamps
+            entry.line_time_index = self.line_time_index
+            entry.channel_index = self.channel_index
+
+    def switch_to_file(self, tab_id):
+        """显示会话中的另一个文件：直接换用它已建立的索引与校时点；输入框中有查询时重新搜索
+        （全部文件搜索过的查询从结果缓存取出）
+        """
+        entry = self.tabs.get(tab_id)
+        if entry is None or not entry.loaded:
+            return
+        try:
+            self.cancel_trigram_build()
+            self._cancel_search_worker()
+            self._cancel_session_search()  # 后台搜索可能会释放即将显示的文件的映射
+            self.cancel_live_search()
+            self.trigram_index = None
+            self._store_session_state()
+            entry.ensure_open()
+            evict_session_buffers(list(self.tabs.values()), keep=(entry,))
+
+            # 会话之前显示的单个文件（或上一个会话的文件）不属于会话，切换后关闭
+            old_content = self.file_content
+            if not any(e.log_file is old_content for e in self.tabs.values()):
+                self._close_content(old_content)
+
+            self.current_tab_id = tab_id
+            self.current_file_path = entry.source_path
+            self.file_content = entry.log_file
+            self.timestamp_format = entry.timestamp_format
+            self._apply_time_baselines(list(entry.time_baselines))
+            self.line_timestamps = entry.line_timestamps
+            self.line_time_index = entry.line_time_index
+            self.channel_index = entry.channel_index
+            self._last_search_spec = None
+            self._search_results = []
+            self.filtered_results = []
+            self.current_matcher = None
+            self.selected_line_index = None
+            self._context_window = None
+            self._context_line_cache.clear()
+            self._context_cache_key = None
+            self._update_session_combo()
+
+            keyword_input = self.keyword_entry.get().strip()
+            if keyword_input and keyword_input != "输入关键字，多个关键字用逗号分隔":
+                self.filter_logs()
+            else:
+                message = f"📑 {entry.name}: {len(entry.log_file):,} 行\n💡 请输入关键字进行搜索..."
+                self.result_view.show_message(message)
+                self.context_text.delete(1.0, tk.END)
+                self.context_text.insert(tk.END, message)
+                self.status_label.config(text=f"📑 当前文件: {entry.name} ({len(entry.log_file):,} 行, "
+                                              f"时间格式: {entry.timestamp_format.label})")
+            if self.trigram_var.get():
+                self.start_trigram_build()
+            print(f"📑 切换到: {entry.source_path}")
+        except Exception as e:
+            print(f"切换文件失败: {e}")
+            messagebox.showerror("错误", f"切换文件失败: {str(e)}")
+
+    def search_all_files(self):
+        """在会话的全部文件上执行当前查询，统计各文件命中数"""
+        keyword_input = self.keyword_entry.get().strip()
+        if not keyword_input or keyword_input == "输入关键字，多个关键字用逗号分隔":
+            messagebox.showwarning("警告", "请输入关键字")
+            return
+        entries = [entry for entry in self.tabs.values() if entry.loaded]
+        if not entries:
+            messagebox.showinfo("提示", "请先通过拖入多个文件或 📂 打开文件夹 建立多文件会话")
+            return
+        self._store_session_state()
+        try:
+            # 各文件在后台扫描时才映射，这里只有表达式查询的采样会临时映射文件
+            matchers = [(entry, self._create_matcher(keyword_input, entry)) for entry in entries]
+        except re.error as e:
+            messagebox.showerror("正则表达式错误", f"正则表达式语法错误: {e}")
+            return
+        except QuerySyntaxError as e:
+            messagebox.showerror("查询表达式错误", f"查询表达式语法错误: {e}")
+            return
+        except ValueError as e:
+            messagebox.showerror("时间窗口错误", str(e))
+            return
+        self._cancel_session_search()
+        self._evict_session_buffers()
+        worker = SessionSearchWorker(matchers)
+        worker.context = keyword_input
+        self._session_search_worker = worker
+        worker.start()
+        self.status_label.config(text=f"🔎 正在搜索全部 {len(entries)} 个文件...")
+        self.root.after(SEARCH_POLL_MS, self._poll_session_search, worker)
+
+    def _cancel_session_search(self):
+        worker = self._session_search_worker
+        self._session_search_worker = None
+        if worker is not None and not worker.finished:
+            worker.cancel()
+            worker.join(timeout=2.0)
+
+    def _poll_session_search(self, worker):
+        if worker is not self._session_search_worker:
+            return
+        self._evict_session_buffers()  # 后台线程依次映射各文件，释放由主线程进行
+        if not worker.finished:
+            self.status_label.config(
+                text=f"🔎 正在搜索全部文件: 已完成 {worker.files_done}/{len(worker.matchers)} 个")
+            self.root.after(SEARCH_POLL_MS, self._poll_session_search, worker)
+            return
+        self._session_search_worker = None
+        if worker.error is not None:
+            print(f"全部文件搜索失败: {worker.error}")
+            messagebox.showerror("错误", f"全部文件搜索失败: {str(worker.error)}")
+            return
+        # 各文件的结果存入结果缓存，切换到该文件时直接取出
+        for entry, matcher in worker.matchers:
+            line_numbers = worker.results.get(entry.tab_id)
+            if line_numbers is None:
+                continue
+            entry.hit_count = len(line_numbers)
+            self.search_cache.store(entry.log_file, matcher, line_numbers, worker.file_keys[entry.tab_id])
+        self._update_session_combo()
+        summary = ", ".join(f"{entry.name}: {entry.hit_count}" for entry, _ in worker.matchers
+                            if entry.hit_count is not None)
+        total = sum(len(numbers) for numbers in worker.results.values())
+        print(f"🔎 全部文件搜索完成: 共 {total} 条 ({summary}), 用时 {worker.elapsed:.2f}s")
+        if self.tabs.get(self.current_tab_id) is not None:
+            self.filter_logs()  # 当前文件的结果来自刚写入的缓存（同时记入搜索历史）
+        self.status_label.config(text=f"🔎 全部 {len(worker.results)} 个文件共 {total} 条 ({summary}) "
+                                      f"用时 {worker.elapsed:.2f}s")
+
+    def show_merged_timeline(self):
+        """合并时间线窗口：会话中的文件按绝对时间归并为一条带来源列的日志流
+
+        右侧是全部行的合并流（充当上下文），左侧是查询在各文件上的命中按同样的顺序归并
+        的结果；点击命中在合并流中定位。两边都只在渲染时归并可见的几十行。
+        合并流随时可能显示任意文件的行，因此窗口打开期间固定全部文件的映射（不受
+        SESSION_MAX_MAPPED_BYTES 淘汰），关闭时解除固定并在主线程中重新按上限淘汰。
+        """
+        self._store_session_state()
+        entries = [entry for entry in self.tabs.values() if entry.loaded]
+        if len(entries) < 2:
+            messagebox.showinfo("提示", "合并时间线需要至少两个已加载的会话文件"
+                                      "（拖入多个文件或在 📂 打开文件夹 中全部打开）")
+            return
+        pinned = []
+        try:
+            for entry in entries:
+                entry.pin()
+                pinned.append(entry)
+                self._merged_timeline_entries.append(entry)
+            timeline = MergedTimeline(entries)
+
+            merged_window = tk.Toplevel(self.root)
+            merged_window.title(f"🧬 合并时间线 - {len(entries)} 个文件, 共 {len(timeline):,} 行")
+            merged_window.geometry("1300x700")
+
+            theme = self.get_current_theme()
+            merged_window.configure(bg=theme['bg'])
+
+            query_frame = tk.Frame(merged_window, bg=theme['bg'])
+            query_frame.pack(fill=tk.X, padx=10, pady=5)
+            tk.Label(query_frame, text="查询:", bg=theme['bg'], fg=theme['fg']).pack(side=tk.LEFT)
+            query_entry = tk.Entry(query_frame, width=60)
+            query_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+            keyword_input = self.keyword_entry.get().strip()
+            if keyword_input and keyword_input != "输入关键字，多个关键字用逗号分隔":
+                query_entry.insert(0, keyword_input)
+
+            untimed = [entry.name for entry in entries if not entry.line_time_index.has_times]
+            status_text = f"🧬 {len(entries)} 个文件按绝对时间合并 (查询使用主窗口的匹配选项与时间窗口)"
+            if untimed:
+                status_text += f" ⚠️ 没有可识别时间的文件排在最前: {', '.join(untimed)}"
+            status = tk.Label(merged_window, text=status_text, anchor=tk.W, bg=theme['bg'], fg=theme['fg'])
+            status.pack(fill=tk.X, padx=10)
+
+            paned = tk.PanedWindow(merged_window, orient=tk.HORIZONTAL)
+            paned.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+            hits_frame = tk.Frame(paned)
+            stream_frame = tk.Frame(paned)
+            paned.add(hits_frame, width=560)
+            paned.add(stream_frame)
+
+            name_width = min(24, max(len(entry.name) for entry in entries))
+            state = {'patterns': [], 'worker': None, 'hits': None}
+
+            def format_rows(rows):
+                return self._format_merged_rows(entries, rows, name_width)
+
+            def highlight(view):
+                self._remove_tags(view.text, "merged_keyword_")
+                if state['patterns']:
+                    spans = self._compute_widget_spans(view.text, state['patterns'],
+                                                       first_line=VirtualResultView.HEADER_LINES + 1)
+                    self._apply_keyword_spans(view.text, spans, "merged_keyword_")
+
+            hits_view = VirtualResultView(hits_frame, format_rows, on_render=lambda: highlight(hits_view))
+            stream_view = VirtualResultView(stream_frame, format_rows, on_render=lambda: highlight(stream_view))
+            stream_view.set_results(timeline, f"🧬 合并流: {len(entries)} 个文件, 共 {len(timeline):,} 行")
+            hits_view.show_message("💡 输入查询后点击 🔍 搜索合并流，各文件的命中按时间合并显示\n"
+                                   "点击命中在右侧合并流中定位")
+
+            def on_hit_click(event):
+                index = hits_view.index_at(event.y)
+                if index is None or state['hits'] is None:
+                    return
+                hits_view.select(index)
+                file_idx, line_idx = state['hits'][index]
+                position = timeline.position_of(file_idx, line_idx)
+                if position is None:
+                    return
+                # 命中行放在合并流视口的中间，前后是其它文件同一时刻附近的行
+                stream_view.selected = position
+                stream_view.top = max(0, position - stream_view.visible_rows() // 2)
+                stream_view.render()
+                status.config(text=f"📍 {entries[file_idx].name} 第 {line_idx + 1} 行 → "
+                                   f"合并流第 {position + 1:,}/{len(timeline):,} 行")
+
+            def on_stream_click(event):
+                index = stream_view.index_at(event.y)
+                if index is not None:
+                    stream_view.select(index)
+
+            hits_view.text.bind('<Button-1>', on_hit_click)
+            stream_view.text.bind('<Button-1>', on_stream_click)
+
+            def cancel_worker():
+                worker = state['worker']
+                state['worker'] = None
+                if worker is not None and not worker.finished:
+                    worker.cancel()
+                    worker.join(timeout=2.0)
+
+            def run_search(event=None):
+                query = query_entry.get().strip()
+                cancel_worker()
+                if not query:
+                    state['patterns'] = []
+                    state['hits'] = None
+                    hits_view.show_message("💡 请输入关键字")
+                    stream_view.render()
+                    return
+                try:
+                    matchers = [(entry, self._create_matcher(query, entry)) for entry in entries]
+                except re.error as e:
+                    messagebox.showerror("正则表达式错误", f"正则表达式语法错误: {e}", parent=merged_window)
+                    return
+                except QuerySyntaxError as e:
+                    messagebox.showerror("查询表达式错误", f"查询表达式语法错误: {e}", parent=merged_window)
+                    return
+                except ValueError as e:
+                    messagebox.showerror("时间窗口错误", str(e), parent=merged_window)
+                    return
+                worker = SessionSearchWorker(matchers)
+                worker.context = query
+                state['worker'] = worker
+                worker.start()
+                status.config(text=f"🔎 正在搜索 {len(entries)} 个文件...")
+                merged_window.after(SEARCH_POLL_MS, poll_search, worker)
+
+            def poll_search(worker):
+                if worker is not state['worker'] or not merged_window.winfo_exists():
+                    return
+                if not worker.finished:
+                    status.config(text=f"🔎 正在搜索: 已完成 {worker.files_done}/{len(worker.matchers)} 个文件")
+                    merged_window.after(SEARCH_POLL_MS, poll_search, worker)
+                    return
+                state['worker'] = None
+                if worker.error is not None:
+                    print(f"合并时间线搜索失败: {worker.error}")
+                    messagebox.showerror("错误", f"合并时间线搜索失败: {str(worker.error)}", parent=merged_window)
+                    return
+                selections = [array('I', (line_num - 1 for line_num in worker.results.get(entry.tab_id, ())))
+                              for entry in entries]
+                hits = MergedTimeline(entries, selections)
+                state['hits'] = hits
+                state['patterns'] = worker.matchers[0][1].highlight_patterns
+                summary = ", ".join(f"{entry.name}: {len(lines)}" for entry, lines in zip(entries, selections))
+                hits_view.set_results(hits, f"🔍 {worker.context}: 共 {len(hits):,} 条 ({summary})")
+                stream_view.render()
+                status.config(text=f"🔍 合并结果 {len(hits):,} 条, 用时 {worker.elapsed:.2f}s")
+                print(f"🧬 合并时间线搜索: {len(hits)} 条 ({summary}), 用时 {worker.elapsed:.2f}s")
+
+            tk.Button(query_frame, text="🔍 搜索合并流", command=run_search).pack(side=tk.LEFT)
+            query_entry.bind('<Return>', run_search)
+
+            def on_close():
+                cancel_worker()
+                merged_window.destroy()
+                self._unpin_merged_entries(pinned)
+
+            merged_window.protocol("WM_DELETE_WINDOW", on_close)
+            if query_entry.get().strip():
+                run_search()
+            print(f"🧬 合并时间线: {len(entries)} 个文件, {len(timeline):,} 行")
+        except Exception as e:
+            self._unpin_merged_entries(pinned)
+            print(f"打开合并时间线失败: {e}")
+            messagebox.showerror("错误", f"打开合并时间线失败: {str(e)}")
+
+    def _unpin_merged_entries(self, entries):
+        """合并时间线窗口关闭：解除固定；已不属于会话的文件（会话在窗口打开期间被清除）直接释放"""
+        session = list(self.tabs.values())
+        for entry in entries:
+            entry.unpin()
+            self._merged_timeline_entries.remove(entry)
+            if entry not in session and entry not in self._merged_timeline_entries and \
+                    entry.log_file is not self.file_content:
+                entry.release()
+        entries.clear()
+        self._evict_session_buffers()
+
+    @staticmethod
+    def _format_merged_rows(entries, rows, name_width):
+        """合并时间线中若干行 [(文件序号, 0-based 行号), ...] 的显示文本：来源、绝对时间、行号、内容
+        （文件映射由窗口固定，这里直接读取）
+        """
+        formatted = []
+        for file_idx, line_idx in rows:
+            entry = entries[file_idx]
+            t = entry.line_time_index.times[line_idx]
+            if t == t:
+                dt = datetime.fromtimestamp(t)
+                time_info = f"[{dt.strftime('%Y/%m/%d %H:%M:%S')}.{dt.microsecond // 1000:03d}]"
+            else:
+                time_info = "[" + "-" * 23 + "]"
+            line_content = entry.log_file.get_line(line_idx).strip()
+            preview = f"{line_content[:200]}{'...' if len(line_content) > 200 else ''}"
+            formatted.append(f"{entry.name[:name_width]:<{name_width}} {time_info} [{line_idx + 1:4d}] {preview}")
+        return formatted
+
+    def on_follow_toggle(self):
+        """勾选/取消跟随文件"""
+        if self._follow_job is not None:
+            self.root.after_cancel(self._follow_job)
+            self._follow_job = None
+        if self.follow_var.get():
+            self._follow_interval = FOLLOW_POLL_MS
+            self._follow_job = self.root.after(self._follow_interval, self._follow_file_step)
+            print("📡 已开启跟随文件")
+        else:
+            print("📡 已关闭跟随文件")
+
+    def _follow_file_step(self):
+        """跟随模式的一次轮询：文件没有变化时只做一次 os.stat"""
+        self._follow_job = None
+        if not self.follow_var.get():
+            return
+        log_file = self.file_content
+        grown = False
+        # 加载、流式搜索、全部文件搜索或索引构建进行中时跳过本次轮询，避免替换它们正在读取的 mmap
+        # 压缩日志映射的是解压缓存，不跟随
+        if (isinstance(log_file, LineIndexedFile) and log_file.index_complete and not self.is_file_loading()
+                and log_file.source_path == log_file.file_path
+                and not self.is_searching() and not self.is_session_searching()
+                and self._trigram_builder is None):
+            try:
+                grown = self._follow_file_growth(log_file)
+            except Exception as e:
+                print(f"跟随文件失败: {e}")
+        if grown:
+            self._follow_interval = FOLLOW_POLL_MS
+        else:
+            self._follow_interval = min(self._follow_interval * 2, FOLLOW_IDLE_POLL_MAX_MS)
+        self._follow_job = self.root.after(self._follow_interval, self._follow_file_step)
+
+    def _follow_file_growth(self, log_file):
+        """处理文件新追加的内容：扩展行索引、逐行时间戳、通道与校时点，并在新行上执行当前查询
+        文件有变化时返回 True
+        """
+        old_line_count = len(log_file)
+        old_size = log_file.file_size
+        first_line = log_file.refresh()
+        if first_line is None:
+            print(f"🔄 文件被截断或轮转，重新加载: {log_file.source_path}")
+            self.load_file(log_file.source_path)
+            return True
+        if log_file.file_size == old_size:
+            return False
+        line_count = len(log_file)
+        start_byte = log_file.offsets[first_line]
+        end_byte = log_file.file_size
+
+        if first_line == 0:
+            # 打开时文件为空，现在才能检测时间戳格式
+            sample = list(log_file.iter_lines(0, min(line_count, TIMESTAMP_DETECT_SAMPLE_LINES)))
+            self.timestamp_format = detect_timestamp_format(sample, log_file)
+        timestamp_format = self.timestamp_format
+        del self.line_timestamps[first_line:]
+        self.channel_index.truncate(first_line)
+        timestamps, tags = timestamp_format.scan_line_fields(log_file._buffer, start_byte, end_byte,
+                                                             line_count - first_line)
+        self.line_timestamps.extend(timestamps)
+        self.channel_index.extend(tags)
+
+        # 新到达的校时点只影响它之后的行；文件原来没有校时点时全部行都要重新推算
+        kept = [baseline for baseline in self.time_baselines if baseline[0] < first_line]
+        had_baselines = bool(kept)
+        added = timestamp_format.find_baselines(log_file, start_byte, end_byte)
+        if added or len(kept) != len(self.time_baselines):
+            self._apply_time_baselines(kept + added)
+        if self.line_time_index is None or (not had_baselines and self.time_baselines):
+            self.line_time_index = LineTimeIndex(self.line_timestamps, self.time_baselines)
+        else:
+            self.line_time_index.extend(self.line_timestamps, self.time_baselines, first_line)
+
+        if self.trigram_index is not None:
+            self.trigram_index.truncate(first_line)
+        if first_line < old_line_count:
+            self._context_line_cache.clear()
+
+        new_hits = self._follow_search(first_line, line_count)
+        message = f"📡 跟随: +{line_count - old_line_count} 行 (共 {line_count:,} 行)"
+        if new_hits is not None:
+            message += f", 新增 {new_hits} 条结果 (共 {len(self.filtered_results):,} 条)"
+        self.status_label.config(text=message)
+        return True
+
+    def _follow_search(self, first_line, line_count):
+        """在新行 [first_line, line_count) 上执行当前查询并追加结果，返回新增条数
+        没有可追加的查询结果时返回 None
+        """
+        matcher = self.current_matcher
+        if matcher is None or not isinstance(self._search_results, MatchResults):
+            return None
+        # 没有通道筛选时 filtered_results 与 _search_results 是同一个对象
+        shared = self.filtered_results is self._search_results
+        removed = self._search_results.truncate(first_line)
+        if not shared and isinstance(self.filtered_results, MatchResults):
+            removed = self.filtered_results.truncate(first_line)
+        self._refresh_time_window(matcher)
+        counts_before = getattr(matcher, 'keyword_hit_counts', None)
+        batch = matcher.scan_file(self.file_content, first_line, line_count)
+        counts = getattr(matcher, 'keyword_hit_counts', None)
+        if counts_before is not None and counts is not None and counts is not counts_before:
+            matcher.keyword_hit_counts = [a + b for a, b in zip(counts_before, counts)]
+        self._search_results.extend(batch)
+        visible = self._apply_channel_filter(batch)
+        if visible:
+            first_hits = len(self.filtered_results) == (len(visible) if shared else 0)
+            if not shared:
+                self.filtered_results.extend(visible)
+            if first_hits:
+                self.display_results(self.keyword_entry.get().strip())
+            else:
+                self.result_view.set_header(f"找到 {len(self.filtered_results)} 条匹配结果:")
+                self.result_view.rows_appended()
+        elif removed:
+            self.result_view.set_header(f"找到 {len(self.filtered_results)} 条匹配结果:")
+        self._last_search_line_count = line_count  # 结果覆盖了全部行，仍可作为细化查询的基础
+        return len(visible)
+
+    def _refresh_time_window(self, matcher):
+        """文件增长后按新的逐行时间重新计算时间窗口对应的行范围"""
+        scope = matcher.scope_key
+        if scope is None or scope[0] != 'time' or self.line_time_index is None:
+            return
+        _, start_time, end_time = scope
+        lo, hi = self.line_time_index.line_range(start_time, end_time)
+        matcher.line_bounds = matcher.root.line_bounds() if isinstance(matcher, QueryMatcher) else (0, None)
+        matcher.restrict_lines(lo, hi, matcher.line_filter, scope)
+
 def main():
     """主函数"""
+    # 打包为单文件可执行程序时，多进程搜索的子进程需要此调用
+    multiprocessing.freeze_support()
     print("🚀 启动超级现代化日志分析工具...")
     
     try: